@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import write_library_json
+from benchmarks.harness import measure
+from src.utils.collation import sort_key
+from src.utils.data_manager import DataManager
+
+SIZES = (10_000, 100_000)
+ROUNDS = 5
+PAGE = 48
+SORTS = ("title", "author", "last_read")
+
+
+# --- Cách cũ: mỗi lần bấm đọc lại cả thư viện ra dict, lọc rồi sắp toàn bộ ---
+
+def naive_page(manager, sort, author=None):
+    ebooks = [e for e in manager.load_ebooks() if not e.get("is_deleted")]
+    if author is not None:
+        ebooks = [e for e in ebooks if e.get("author") == author]
+    if sort == "title":
+        ebooks.sort(key=lambda e: sort_key(e.get("title") or e["filename"]))
+    elif sort == "author":
+        ebooks.sort(key=lambda e: (sort_key(e.get("author") or ""), sort_key(e.get("title") or "")))
+    else:
+        ebooks.sort(key=lambda e: e.get("last_read") or "", reverse=True)
+    return ebooks[:PAGE]
+
+
+def bench(tmp, size):
+    path = write_library_json(os.path.join(tmp, f"browse-{size}.json"), size)
+    manager = DataManager(path)
+    manager.preload()
+    names = manager.filenames("all")
+    author = manager.facet_counts("author")[0][0]
+    print(f"{size} books")
+    for sort in SORTS:
+        before = measure(f"naive.{sort}", lambda: naive_page(manager, sort), repeat=ROUNDS)["wall_s"]
+        start = time.perf_counter()
+        manager.query(sort=sort, limit=PAGE)
+        build = time.perf_counter() - start
+        # Sau một thay đổi: thứ tự sắp xếp được cập nhật tại chỗ, chỉ còn lọc lại theo view
+        after_change = measure(f"query.{sort}.after_edit", lambda _: manager.query(sort=sort, limit=PAGE),
+                               setup=lambda: manager._update(names[len(names) // 2],
+                                                             title=f"Renamed {time.perf_counter()}"),
+                               repeat=ROUNDS)["wall_s"]
+        scroll = measure(f"query.{sort}.next_page", lambda: manager.query(sort=sort, offset=10 * PAGE, limit=PAGE),
+                         repeat=ROUNDS)["wall_s"]
+        print(f"  sort {sort:9} full sort {before * 1000:8.2f} ms  first build {build * 1000:8.2f} ms  "
+              f"after edit {after_change * 1000:7.2f} ms  next page {scroll * 1000:6.3f} ms")
+    before = measure("naive.author", lambda: naive_page(manager, "title", author), repeat=ROUNDS)["wall_s"]
+    after = measure("query.author", lambda _: manager.query(sort="title", author=author, limit=PAGE),
+                    setup=lambda: manager._update(names[0], title=f"Renamed {time.perf_counter()}"),
+                    repeat=ROUNDS)["wall_s"]
+    print(f"  facet author      full scan {before * 1000:8.2f} ms  facet index {after * 1000:8.3f} ms  "
+          f"{before / after:7.1f}x")
+    start = time.perf_counter()
+    manager.facet_counts("author")
+    print(f"  facet_counts author {(time.perf_counter() - start) * 1000:.2f} ms")
+    manager.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="So sánh sắp xếp/lọc facet: sắp lại mỗi lần bấm và khoá sắp xếp dựng sẵn")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            bench(tmp, size)
+
+
+if __name__ == "__main__":
+    main()
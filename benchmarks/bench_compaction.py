@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import make_library
+from src.utils.compaction import Compactor
+from src.utils.data_manager import DataManager
+
+LIVE = 20_000
+DELETED = 80_000
+ROUNDS = 3
+
+
+def load_time(path):
+    best = None
+    for _ in range(ROUNDS):
+        manager = DataManager(path)
+        start = time.perf_counter()
+        manager.preload()
+        elapsed = time.perf_counter() - start
+        manager.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def store_size(path):
+    # SQLite ở chế độ WAL: tính cả file -wal
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def bench(tmp, name, live, deleted):
+    path = os.path.join(tmp, name)
+    library = make_library(live + deleted)
+    for ebook in library[live:]:
+        # Đã vào thùng rác từ lâu (quá hạn giữ)
+        ebook["is_deleted"] = True
+        ebook["deleted_at"] = "2000-01-01T00:00:00"
+    manager = DataManager(path)
+    manager.save_ebooks(library)
+    manager.close()
+    before_size = store_size(path)
+    before_load = load_time(path)
+
+    manager = DataManager(path)
+    start = time.perf_counter()
+    stats = Compactor(manager, os.path.join(tmp, "ebooks")).run()
+    compact_time = time.perf_counter() - start
+    manager.close()
+    after_size = store_size(path)
+    after_load = load_time(path)
+    print(f"{name:12} purged {stats['records']} records in {compact_time:.2f} s  "
+          f"size {before_size / 1024 / 1024:6.1f} MB -> {after_size / 1024 / 1024:6.1f} MB  "
+          f"load {before_load * 1000:7.1f} ms -> {after_load * 1000:7.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo kích thước và thời gian nạp thư viện trước/sau khi dọn thùng rác")
+    parser.add_argument("--live", type=int, default=LIVE)
+    parser.add_argument("--deleted", type=int, default=DELETED)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench(tmp, "library.json", args.live, args.deleted)
+        bench(tmp, "library.db", args.live, args.deleted)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import codecs
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import MB, make_paragraph
+from src.utils.text_encoding import detect_encoding, encode_text, iter_decoded
+
+SAMPLE_SIZES = (256, 1024, 4096, 64 * 1024)
+SAMPLES = 20
+BOOK_MB = 4
+# Câu đa dạng hơn bộ từ của generators để mẫu không chỉ gồm vài chục từ lặp lại
+_SENTENCES = (
+    "Ông lão đánh cá ngồi lặng im bên bờ biển, đợi những con sóng bạc đầu.",
+    "Cô giáo trẻ dạy các em nhỏ đọc thơ Nguyễn Du dưới gốc đa đầu làng.",
+    "Trời đã tối hẳn, đèn đường vàng vọt hắt bóng lên những mái ngói rêu phong.",
+    "Anh ấy hứa sẽ trở về trước Tết, nhưng chuyến tàu cuối năm bị hoãn.",
+    "Quyển sách cũ ố vàng vẫn nằm yên trên kệ, chờ một người đọc kiên nhẫn.",
+)
+
+# Tên thư mục trong corpus -> bảng mã kết quả mong đợi (BOM UTF-16 quyết định luôn thứ tự byte)
+EXPECTED = {
+    "utf-8": "utf-8",
+    "utf-8-sig": "utf-8",
+    "utf-16": "utf-16-le",
+    "utf-16-le": "utf-16-le",
+    "utf-16-be": "utf-16-be",
+    "cp1258": "cp1258",
+    "tcvn3": "tcvn3",
+    "vni": "vni",
+}
+
+
+def make_text(seed, size_chars):
+    parts = []
+    total = 0
+    i = seed
+    while total < size_chars:
+        part = make_paragraph(i, 30) + " " + _SENTENCES[i % len(_SENTENCES)] + "\n"
+        parts.append(part)
+        total += len(part)
+        i += 1
+    return "".join(parts)
+
+
+def encode(text, label):
+    if label == "utf-8-sig":
+        return codecs.BOM_UTF8 + text.encode("utf-8")
+    if label == "utf-16":
+        return codecs.BOM_UTF16_LE + text.encode("utf-16-le")
+    # TCVN3 không có chữ hoa mang dấu thanh: các chữ đó thành "?"
+    return encode_text(text, label, errors="replace")
+
+
+def synthetic_corpus(size):
+    # Mẫu được cắt theo từng kích thước ở bench_accuracy
+    return [
+        (label, encode(make_text(seed, size), label))
+        for label in EXPECTED
+        for seed in range(SAMPLES)
+    ]
+
+
+def load_corpus(corpus_dir):
+    # corpus/<bảng mã>/*.txt, ví dụ corpus/vni/truyen.txt
+    samples = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*", "*.txt"))):
+        label = os.path.basename(os.path.dirname(path)).lower()
+        if label not in EXPECTED:
+            continue
+        with open(path, "rb") as f:
+            samples.append((label, f.read()))
+    return samples
+
+
+def bench_accuracy(samples, sample_size):
+    correct = {}
+    total = {}
+    for label, data in samples:
+        detected = detect_encoding(data[:sample_size])
+        total[label] = total.get(label, 0) + 1
+        correct[label] = correct.get(label, 0) + (detected == EXPECTED[label])
+    overall = sum(correct.values()) / max(1, sum(total.values()))
+    detail = "  ".join(f"{label} {correct[label]}/{total[label]}" for label in total)
+    print(f"head {sample_size:>6} B  accuracy {overall:6.1%}  {detail}")
+
+
+def bench_decode(tmp, book_mb):
+    text = make_text(0, book_mb * MB)
+    for label in EXPECTED:
+        path = os.path.join(tmp, f"book-{label}.txt")
+        with open(path, "wb") as f:
+            f.write(encode(text, label))
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        chars = sum(len(chunk) for chunk in iter_decoded(path))
+        elapsed = time.perf_counter() - start
+        print(f"decode {label:10} {size / MB:7.2f} MB  {elapsed:.3f} s  {size / MB / elapsed:8.1f} MB/s  {chars} chars")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo độ chính xác đoán bảng mã và tốc độ giải mã TXT")
+    parser.add_argument("corpus", nargs="?", help="thư mục corpus/<bảng mã>/*.txt; bỏ trống để dùng dữ liệu tổng hợp")
+    parser.add_argument("--book-mb", type=int, default=BOOK_MB)
+    args = parser.parse_args(argv)
+
+    samples = load_corpus(args.corpus) if args.corpus else synthetic_corpus(max(SAMPLE_SIZES))
+    if not samples:
+        print("No samples found.")
+        return
+    for sample_size in SAMPLE_SIZES:
+        bench_accuracy(samples, sample_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_decode(tmp, args.book_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import datetime
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import write_library_json
+from benchmarks.harness import measure
+from src.utils.data_manager import DataManager
+
+SIZES = (10_000, 100_000)
+ROUNDS = 5
+VIEWS = ("all", "recent", "read", "favorite", "deleted")
+
+
+# --- Cách cũ: danh sách dict, mỗi bộ lọc duyệt lại toàn bộ và parse lại last_read ---
+
+def dict_filter(ebooks, view, days=7):
+    now = datetime.datetime.now()
+    result = []
+    for e in ebooks:
+        if e.get("is_deleted", False) != (view == "deleted"):
+            continue
+        if view == "read" and not e.get("is_read", False):
+            continue
+        if view == "favorite" and not e.get("is_favorite", False):
+            continue
+        if view == "recent":
+            if not e.get("last_read"):
+                continue
+            if (now - datetime.datetime.fromisoformat(e["last_read"])).days > days:
+                continue
+        result.append(e["filename"])
+    return result
+
+
+def dict_counts(ebooks):
+    return {view: len(dict_filter(ebooks, view)) for view in VIEWS}
+
+
+def allocated(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, after - before
+
+
+def bench(tmp, size):
+    path = write_library_json(os.path.join(tmp, f"records-{size}.json"), size)
+    manager = DataManager(path)
+    # Cả hai đều tính phần còn giữ lại sau khi đọc storage (kể cả chuỗi); bên Record gồm luôn các chỉ mục
+    ebooks, dict_bytes = allocated(manager.storage.load)
+    _, record_bytes = allocated(lambda: manager._build_index(manager.storage.load()))
+    manager._stamp = manager.storage.stamp()
+    print(f"{size} books  memory: dicts {dict_bytes / 1024 / 1024:7.1f} MB  "
+          f"records+indexes {record_bytes / 1024 / 1024:7.1f} MB  ({record_bytes / dict_bytes:.0%})")
+
+    for view in VIEWS:
+        before = measure(f"dict_filter.{view}", lambda: dict_filter(ebooks, view), repeat=ROUNDS)["wall_s"]
+        after = measure(f"filenames.{view}", lambda: manager.filenames(view), repeat=ROUNDS)["wall_s"]
+        assert dict_filter(ebooks, view) == manager.filenames(view), view
+        print(f"  filter {view:9} dicts {before * 1000:8.2f} ms  records {after * 1000:8.3f} ms  "
+              f"{before / after:7.1f}x")
+    before = measure("dict_counts", lambda: dict_counts(ebooks), repeat=ROUNDS)["wall_s"]
+    after = measure("counts", manager.counts, repeat=ROUNDS)["wall_s"]
+    # Số đếm từ cột cờ phải khớp với cách duyệt dict (kể cả thùng rác)
+    assert dict_counts(ebooks) == manager.counts(), manager.counts()
+    print(f"  counts           dicts {before * 1000:8.2f} ms  records {after * 1000:8.3f} ms  {before / after:7.1f}x")
+    manager.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="So sánh bộ nhớ và thời gian lọc: danh sách dict và Record gọn")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            bench(tmp, size)
+
+
+if __name__ == "__main__":
+    main()
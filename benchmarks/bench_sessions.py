@@ -0,0 +1,168 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import MB, make_library, write_epub, write_txt
+from src.components.main_content import MainContent
+from src.utils.content_cache import ContentCache
+from src.utils.data_manager import DataManager
+from src.utils.session import SessionLibrary
+from src.utils.task_runner import TaskRunner
+
+SESSIONS = 16
+OPENS = 20
+BOOKS = 8
+LIBRARY_SIZE = 2_000
+BOOK_MB = 1
+
+
+def make_server_dir(root, books, book_mb, library_size):
+    """Thư mục giống LIBRARY_ROOT của server: ebooks/ với vài sách thật và data/ với thư viện lớn."""
+    ebook_dir = os.path.join(root, "ebooks")
+    data_dir = os.path.join(root, "data")
+    os.makedirs(ebook_dir)
+    os.makedirs(data_dir)
+    library = make_library(library_size)
+    real = []
+    for i in range(books):
+        name = f"shared-{i}.epub" if i % 2 == 0 else f"shared-{i}.txt"
+        path = os.path.join(ebook_dir, name)
+        if name.endswith(".epub"):
+            write_epub(path, book_mb * MB)
+        else:
+            write_txt(path, book_mb * MB)
+        library.append({"filename": name, "title": name, "author": "Load test"})
+        real.append(name)
+    manager = DataManager(os.path.join(data_dir, "library.db"))
+    manager.save_ebooks(library)
+    manager.close()
+    return ebook_dir, data_dir, real
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def run_session(index, make_library_view, content_cache, ebook_dir, books, opens, latencies, errors, barrier):
+    rng = random.Random(index)
+    library = make_library_view()
+    runner = TaskRunner(max_workers=1)
+    try:
+        main_content = MainContent(library, content_cache, runner, load=False, ebook_dir=ebook_dir)
+        barrier.wait()
+        # Mỗi phiên dựng lưới riêng như khi trang vừa mở
+        library.preload()
+        main_content.update_grid()
+        for _ in range(opens):
+            file_name = rng.choice(books)
+            start = time.perf_counter()
+            position = library.get_position(file_name)
+            fingerprint = (library.get_ebook(file_name) or {}).get("fingerprint")
+            opened = main_content._open_book(os.path.join(ebook_dir, file_name), position, fingerprint)
+            latencies.append(time.perf_counter() - start)
+            library.set_position(file_name, rng.randrange(3), rng.randrange(1000))
+            main_content._discard_book(opened)
+    except Exception as e:
+        errors.append(f"session {index}: {e!r}")
+    finally:
+        runner.shutdown()
+
+
+def run(root, sessions, opens, shared):
+    ebook_dir = os.path.join(root, "ebooks")
+    data_dir = os.path.join(root, "data")
+    books = sorted(n for n in os.listdir(ebook_dir) if not n.startswith("."))
+    # Mỗi lần chạy bắt đầu với cache nội dung trống
+    cache_root = os.path.join(data_dir, "cache-shared" if shared else "cache-isolated")
+    shutil.rmtree(cache_root, ignore_errors=True)
+    db = os.path.join(data_dir, "library.db")
+
+    if shared:
+        shared_manager = DataManager(db)
+        shared_cache = ContentCache(cache_root)
+        managers = [shared_manager]
+
+        def make_library_view():
+            return SessionLibrary(shared_manager)
+
+        cache_for = lambda i: shared_cache
+    else:
+        # Cách cũ: mỗi phiên tự mở DataManager và cache riêng trên cùng các file
+        managers = []
+        lock = threading.Lock()
+
+        def make_library_view():
+            manager = DataManager(db)
+            with lock:
+                managers.append(manager)
+            return manager
+
+        cache_for = lambda i: ContentCache(os.path.join(cache_root, str(i)))
+
+    latencies = []
+    errors = []
+    barrier = threading.Barrier(sessions)
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(i, make_library_view, cache_for(i), ebook_dir, books, opens, latencies, errors, barrier),
+        )
+        for i in range(sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    for manager in managers:
+        manager.close()
+    return {
+        "mode": "shared" if shared else "isolated",
+        "wall_s": wall,
+        "opens": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mô phỏng N phiên web đồng thời cùng mở sách trên một server")
+    parser.add_argument("--sessions", type=int, default=SESSIONS)
+    parser.add_argument("--opens", type=int, default=OPENS, help="số lần mở sách mỗi phiên")
+    parser.add_argument("--books", type=int, default=BOOKS)
+    parser.add_argument("--book-mb", type=int, default=BOOK_MB)
+    parser.add_argument("--library-size", type=int, default=LIBRARY_SIZE)
+    parser.add_argument("--mode", choices=("shared", "isolated", "both"), default="both")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        make_server_dir(root, args.books, args.book_mb, args.library_size)
+        modes = (True, False) if args.mode == "both" else (args.mode == "shared",)
+        failed = False
+        for shared in modes:
+            row = run(root, args.sessions, args.opens, shared)
+            print(
+                f"{row['mode']:9} {args.sessions} sessions x {args.opens} opens  wall {row['wall_s']:.2f} s  "
+                f"open p50 {row['p50_ms']:.1f} ms  p95 {row['p95_ms']:.1f} ms  max {row['max_ms']:.1f} ms"
+            )
+            for error in row["errors"]:
+                print(f"  ERROR {error}")
+            failed = failed or bool(row["errors"])
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
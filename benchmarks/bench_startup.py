@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import write_library_json
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RUNS = 3
+SHELL_BUDGET_MS = 1500
+LIBRARY_SIZE = 10_000
+
+# Chạy trong một tiến trình mới để đo đúng cold start (import, dựng khung, nạp thư viện)
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import flet
+flet_done = time.perf_counter()
+import src.app
+from src.components.main_content import MainContent
+from src.components.sidebar import Sidebar
+from src.utils.data_manager import DataManager
+from src.utils.storage import migrate_json_to_sqlite
+from src.utils.task_runner import TaskRunner
+import_done = time.perf_counter()
+
+library_db = os.path.join("data", "library.db")
+storage = migrate_json_to_sqlite(os.path.join("data", "ebooks.json"), library_db)
+data_manager = DataManager(library_db, storage)
+runner = TaskRunner()
+main_content = MainContent(data_manager, None, runner, None, load=False)
+sidebar = Sidebar(data_manager, main_content, runner, load=False)
+shell_done = time.perf_counter()
+shell_wall = time.time()
+
+data_manager.preload()
+main_content.update_grid()
+sidebar.refresh()
+library_done = time.perf_counter()
+runner.shutdown()
+print(json.dumps({{
+    "flet_import_ms": (flet_done - start) * 1000,
+    "app_import_ms": (import_done - flet_done) * 1000,
+    "shell_ms": (shell_done - import_done) * 1000,
+    "library_ms": (library_done - shell_done) * 1000,
+    "shell_wall": shell_wall,
+    "heavy_modules": [m for m in ("ebooklib", "lxml", "src.utils.epub_book", "concurrent.futures.process")
+                      if m in sys.modules],
+}}))
+"""
+
+
+def run_once(workdir):
+    spawned = time.time()
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=ROOT)],
+        cwd=workdir,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    total_ms = (time.perf_counter() - started) * 1000
+    row = json.loads(output.strip().splitlines()[-1])
+    # Thời điểm khung giao diện sẵn sàng, tính từ lúc tạo tiến trình (gồm cả khởi động trình thông dịch)
+    row["shell_ready_ms"] = (row.pop("shell_wall") - spawned) * 1000
+    row["total_ms"] = total_ms
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo thời gian khởi động nguội của ứng dụng (không cần màn hình)")
+    parser.add_argument("--books", type=int, default=LIBRARY_SIZE)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--budget-ms", type=float, default=SHELL_BUDGET_MS,
+                        help="ngân sách cho tới khi khung giao diện sẵn sàng")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for _ in range(args.runs):
+        # Mỗi lần chạy dùng thư mục mới để có cả bước chuyển ebooks.json sang SQLite như lần chạy đầu
+        with tempfile.TemporaryDirectory() as workdir:
+            os.makedirs(os.path.join(workdir, "data"))
+            write_library_json(os.path.join(workdir, "data", "ebooks.json"), args.books)
+            rows.append(run_once(workdir))
+
+    best = min(rows, key=lambda r: r["shell_ready_ms"])
+    print(
+        f"{args.books} books  flet import {best['flet_import_ms']:.0f} ms  "
+        f"app import {best['app_import_ms']:.0f} ms  shell {best['shell_ms']:.0f} ms  "
+        f"shell ready {best['shell_ready_ms']:.0f} ms  library loaded +{best['library_ms']:.0f} ms"
+    )
+    if best["heavy_modules"]:
+        print(f"Loaded before first use: {', '.join(best['heavy_modules'])}")
+    if best["shell_ready_ms"] > args.budget_ms:
+        print(f"OVER BUDGET: shell ready in {best['shell_ready_ms']:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"Within budget ({args.budget_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import make_library
+from src.utils.data_manager import DataManager
+from src.utils.storage import JsonStorage, SQLiteStorage
+
+SIZES = (1_000, 10_000, 100_000)
+MUTATIONS = 100
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def bench_backend(name, make_storage, ebooks):
+    storage = make_storage()
+    save_time, _ = timed(lambda: storage.save(ebooks))
+
+    cold_load, _ = timed(lambda: DataManager(storage.path, make_storage()).count_all())
+
+    manager = DataManager(storage.path, storage)
+    manager.count_all()
+    step = max(1, len(ebooks) // MUTATIONS)
+    targets = [ebooks[i]["filename"] for i in range(0, len(ebooks), step)][:MUTATIONS]
+    # Tính cả lần flush cuối: mutation chỉ ghi journal, storage được ghi khi flush
+    mutate_time, _ = timed(lambda: ([manager.toggle_favorite(t) for t in targets], manager.flush()))
+
+    counters = (
+        manager.count_all,
+        manager.count_read,
+        manager.count_favorite,
+        manager.count_deleted,
+        manager.count_recently_read,
+    )
+    count_time, _ = timed(lambda: [c() for c in counters])
+
+    row = {
+        "backend": name,
+        "books": len(ebooks),
+        "save_s": save_time,
+        "cold_load_s": cold_load,
+        "mutation_ms": mutate_time / len(targets) * 1000,
+        "counters_ms": count_time * 1000,
+    }
+    storage.close()
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="So sánh backend JSON và SQLite của DataManager")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            ebooks = make_library(size)
+            json_path = os.path.join(tmp, f"ebooks-{size}.json")
+            db_path = os.path.join(tmp, f"library-{size}.db")
+            for row in (
+                bench_backend("json", lambda: JsonStorage(json_path), ebooks),
+                bench_backend("sqlite", lambda: SQLiteStorage(db_path), ebooks),
+            ):
+                print(
+                    f"{row['backend']:6} {row['books']:>7} books  "
+                    f"save {row['save_s']:.3f} s  cold load {row['cold_load_s']:.3f} s  "
+                    f"mutation {row['mutation_ms']:.2f} ms  counters {row['counters_ms']:.3f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
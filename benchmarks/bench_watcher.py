@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import write_txt
+from src.utils.content_cache import file_hash
+from src.utils.data_manager import DataManager
+from src.utils.importer import BookImporter, new_record
+from src.utils.library_watcher import LibraryWatcher, PollingSource, list_books, open_source
+
+LIBRARY_FILES = 5_000
+DROPS = 50
+FILE_BYTES = 16 * 1024
+QUIET = 0.5
+
+
+def make_library(root, files):
+    ebook_dir = os.path.join(root, "ebooks")
+    os.makedirs(ebook_dir)
+    records = []
+    for i in range(files):
+        name = f"book-{i}.txt"
+        with open(os.path.join(ebook_dir, name), "w", encoding="utf-8") as f:
+            f.write(f"Sách số {i}\n" * 64)
+        records.append(new_record(name))
+    manager = DataManager(os.path.join(root, "library.db"))
+    manager.save_ebooks(records)
+    return ebook_dir, manager
+
+
+def full_rescan(ebook_dir, manager):
+    # Cách "quét lại cả thư mục" để phát hiện thay đổi: liệt kê và hash mọi file
+    on_disk = list_books(ebook_dir)
+    for name in on_disk:
+        file_hash(os.path.join(ebook_dir, name))
+    registered = set(manager.filenames("all"))
+    return on_disk - registered, registered - on_disk
+
+
+def bench_source(root, ebook_dir, manager, label, factory, drops):
+    importer = BookImporter(manager, ebook_dir)
+    done = threading.Event()
+    batches = []
+
+    def on_change(result):
+        batches.append(result)
+        if sum(len(added) for added, _, _ in batches) >= drops:
+            done.set()
+
+    watcher = LibraryWatcher(importer, ebook_dir, on_change=on_change, quiet=QUIET, source_factory=factory)
+    watcher.start()
+    # Chờ lượt đối chiếu ban đầu xong
+    time.sleep(QUIET * 2)
+    batches.clear()
+    staging = os.path.join(root, f"staging-{label}")
+    os.makedirs(staging)
+    start = time.perf_counter()
+    for i in range(drops):
+        tmp = os.path.join(staging, f"{label}-{i}.txt")
+        write_txt(tmp, FILE_BYTES)
+        # Nội dung khác nhau, nếu không importer coi là sách trùng
+        with open(tmp, "a", encoding="utf-8") as f:
+            f.write(f"{label} {i}\n")
+        os.replace(tmp, os.path.join(ebook_dir, f"{label}-{i}.txt"))
+    written = time.perf_counter() - start
+    ok = done.wait(60)
+    elapsed = time.perf_counter() - start
+    watcher.stop()
+    print(f"{label:8} {drops} drops  written {written:.2f} s  in library after {elapsed:.2f} s  "
+          f"batches {len(batches)}  {'ok' if ok else 'TIMEOUT'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo độ trễ đồng bộ thư mục sách của LibraryWatcher so với quét lại toàn bộ")
+    parser.add_argument("--files", type=int, default=LIBRARY_FILES, help="số file có sẵn trong thư mục sách")
+    parser.add_argument("--drops", type=int, default=DROPS, help="số file chép thêm vào mỗi lượt")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as root:
+        ebook_dir, manager = make_library(root, args.files)
+        start = time.perf_counter()
+        full_rescan(ebook_dir, manager)
+        print(f"full rescan of {args.files} files: {time.perf_counter() - start:.2f} s")
+        bench_source(root, ebook_dir, manager, "inotify", open_source, args.drops)
+        bench_source(root, ebook_dir, manager, "polling", lambda d: PollingSource(d, interval=1.0), args.drops)
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import zipfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import make_chapter
+from src.utils.epub_book import EpubBook
+from src.utils.xhtml_converter import _expat_blocks, _html_blocks, blocks_to_text
+
+ROUNDS = 3
+SYNTHETIC_CHAPTERS = 40
+
+
+def load_corpus(corpus_dir):
+    chapters = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "**", "*.epub"), recursive=True)):
+        try:
+            with EpubBook(path) as book:
+                chapters.extend(book.read_item(c.href) for c in book.chapters)
+        except (KeyError, OSError, zipfile.BadZipFile, StopIteration) as e:
+            print(f"Error reading {path}: {e}")
+    return chapters
+
+
+def bench_parser(name, parse, chapters):
+    total = sum(len(c) for c in chapters)
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for data in chapters:
+            blocks_to_text(parse(data))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:10} {total / 1024 / 1024:8.2f} MB  {best:.3f} s  {total / 1024 / 1024 / best:8.1f} MB/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo tốc độ chuyển XHTML của chương EPUB thành block/văn bản")
+    parser.add_argument("corpus", nargs="?", help="thư mục chứa các file .epub; bỏ trống để dùng dữ liệu tổng hợp")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        chapters = load_corpus(args.corpus)
+    else:
+        chapters = [make_chapter(i) for i in range(SYNTHETIC_CHAPTERS)]
+    if not chapters:
+        print("No chapters found.")
+        return
+
+    bench_parser("expat", lambda data: _expat_blocks([data], ""), chapters)
+    bench_parser("htmlparser", lambda data: _html_blocks(data, ""), chapters)
+
+
+if __name__ == "__main__":
+    main()
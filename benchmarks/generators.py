@@ -0,0 +1,106 @@
+import datetime
+import json
+import os
+import zipfile
+
+MB = 1024 * 1024
+
+_WORDS = (
+    "người", "sách", "đọc", "trang", "chương", "mùa", "thu", "Hà", "Nội", "sông", "núi", "trăng",
+    "gió", "nhà", "phố", "đêm", "ngày", "câu", "chuyện", "thương", "nhớ", "xa", "về", "một",
+)
+
+
+def make_library(size):
+    now = datetime.datetime.now()
+    return [
+        {
+            "filename": f"book-{i:06d}.epub",
+            "title": f"Sách số {i}",
+            "author": f"Tác giả {i % 997}",
+            "is_read": i % 3 == 0,
+            "is_favorite": i % 7 == 0,
+            "is_deleted": i % 50 == 0,
+            "last_read": (now - datetime.timedelta(hours=i)).isoformat() if i % 2 else None,
+        }
+        for i in range(size)
+    ]
+
+
+def write_library_json(path, size):
+    # Cùng định dạng với ebooks.json mà ứng dụng ghi ra
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(make_library(size), f, indent=2, ensure_ascii=False)
+    return path
+
+
+def make_paragraph(seed, words=60):
+    return " ".join(_WORDS[(seed * 7 + i * 13) % len(_WORDS)] for i in range(words)).capitalize() + "."
+
+
+def write_txt(path, size_bytes):
+    written = 0
+    i = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        while written < size_bytes:
+            line = make_paragraph(i) + "\n\n"
+            f.write(line)
+            written += len(line.encode("utf-8"))
+            i += 1
+    return path
+
+
+def make_chapter(index, paragraphs=400):
+    body = "".join(
+        f"<p>Đoạn {i} của chương {index}: <b>chữ đậm</b> xen <i>chữ nghiêng</i>, "
+        f"&ldquo;{make_paragraph(index + i, 20)}&rdquo; và <a href=\"#n{i}\">chú thích</a>&nbsp;cuối đoạn.</p>\n"
+        for i in range(paragraphs)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Chương</title>'
+        "<style>p { margin: 0 }</style></head>"
+        f"<body><h1>Chương {index + 1}</h1>\n{body}</body></html>"
+    ).encode("utf-8")
+
+
+def write_epub(path, size_bytes, paragraphs=400):
+    """EPUB 3 tối giản có nav; số chương đủ để tổng XHTML (chưa nén) đạt size_bytes."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        z.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0"?><container version="1.0" '
+            'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            "</rootfiles></container>",
+        )
+        written = 0
+        count = 0
+        while written < size_bytes or count == 0:
+            chapter = make_chapter(count, paragraphs)
+            z.writestr(f"OEBPS/text/ch{count:04d}.xhtml", chapter)
+            written += len(chapter)
+            count += 1
+        items = "".join(
+            f'<item id="c{i}" href="text/ch{i:04d}.xhtml" media-type="application/xhtml+xml"/>'
+            for i in range(count)
+        )
+        spine = "".join(f'<itemref idref="c{i}"/>' for i in range(count))
+        links = "".join(f'<li><a href="text/ch{i:04d}.xhtml">Chương {i + 1}</a></li>' for i in range(count))
+        z.writestr(
+            "OEBPS/nav.xhtml",
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+            f'<body><nav epub:type="toc"><ol>{links}</ol></nav></body></html>',
+        )
+        z.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0" '
+            'unique-identifier="id"><metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="id">bench-{count}</dc:identifier>'
+            f"<dc:title>Sách tổng hợp {os.path.basename(path)}</dc:title>"
+            "<dc:creator>Tác giả</dc:creator><dc:language>vi</dc:language></metadata>"
+            f'<manifest>{items}<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" '
+            f'properties="nav"/></manifest><spine>{spine}</spine></package>',
+        )
+    return path
@@ -0,0 +1,67 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows không có module resource: bỏ qua số liệu RSS
+    resource = None
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS trả về byte, Linux trả về KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(name, fn, setup=None, repeat=3):
+    """Đo một trường hợp: thời gian tốt nhất qua `repeat` lần, rồi một lần chạy riêng có tracemalloc.
+
+    setup() (nếu có) chạy trước mỗi lần đo và không được tính giờ; giá trị nó trả về
+    được truyền cho fn.
+    """
+    best = None
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        gc.collect()
+        start = time.perf_counter()
+        fn(arg) if setup is not None else fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # tracemalloc làm chậm đáng kể nên được chạy tách khỏi các lần tính giờ
+    arg = setup() if setup is not None else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(arg) if setup is not None else fn()
+        snapshot_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        _, alloc_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "wall_s": best,
+        "alloc_peak_kb": alloc_peak // 1024,
+        "live_blocks": snapshot_blocks,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Trả về danh sách (tên, cũ, mới, tỉ lệ) của các trường hợp chậm hơn baseline quá threshold."""
+    old = {row["name"]: row for row in baseline.get("results", [])}
+    regressions = []
+    for row in results:
+        before = old.get(row["name"])
+        if before is None or not before["wall_s"]:
+            continue
+        ratio = row["wall_s"] / before["wall_s"]
+        if ratio > 1 + threshold:
+            regressions.append((row["name"], before["wall_s"], row["wall_s"], ratio))
+    return regressions
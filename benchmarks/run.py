@@ -0,0 +1,135 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generators import MB, make_library, write_epub, write_library_json, write_txt
+from benchmarks.harness import compare, measure
+from src.utils.data_manager import DataManager
+from src.utils.file_handler import FileHandler
+
+LIBRARY_SIZES = (1_000, 10_000)
+BOOK_SIZES_MB = (1, 10)
+THRESHOLD = 0.10
+
+
+def bench_data_manager(tmp, size):
+    path = write_library_json(os.path.join(tmp, f"ebooks-{size}.json"), size)
+    ebooks = make_library(size)
+    manager = DataManager(path)
+    manager.count_all()
+    return [
+        measure(f"datamanager.load[{size}]", lambda: DataManager(path).count_all()),
+        measure(f"datamanager.save[{size}]", lambda: manager.save_ebooks(ebooks)),
+        measure(f"datamanager.counts[{size}]", manager.counts),
+    ]
+
+
+def bench_components(tmp, size):
+    # Chỉ dựng cây control của Flet trong bộ nhớ, không cần cửa sổ hay trình duyệt
+    from src.components.main_content import MainContent
+    from src.components.sidebar import Sidebar
+
+    path = write_library_json(os.path.join(tmp, f"ui-{size}.json"), size)
+    manager = DataManager(path)
+    main_content = MainContent(manager)
+    sidebar = Sidebar(manager, main_content)
+    filenames = manager.filenames("all")
+
+    def cold_sidebar():
+        sidebar._book_tiles = {}
+        sidebar._tiles_revision = None
+
+    def cold_grid():
+        main_content._cards = {}
+
+    def touch_one():
+        manager.toggle_favorite(filenames[len(filenames) // 2])
+
+    results = [
+        measure(f"sidebar.update_ebook_list.cold[{size}]", lambda _: sidebar.update_ebook_list(), cold_sidebar),
+        measure(f"sidebar.update_ebook_list.one_changed[{size}]", lambda _: sidebar.update_ebook_list(), touch_one),
+        measure(f"main_content.update_grid.cold[{size}]", lambda _: main_content.update_grid(force=True), cold_grid),
+        measure(f"main_content.update_grid.one_changed[{size}]", lambda _: main_content.update_grid(), touch_one),
+    ]
+    main_content.task_runner.shutdown()
+    manager.close()
+    return results
+
+
+def bench_read_file(tmp, size_mb):
+    txt = write_txt(os.path.join(tmp, f"book-{size_mb}mb.txt"), size_mb * MB)
+    epub_path = write_epub(os.path.join(tmp, f"book-{size_mb}mb.epub"), size_mb * MB)
+    results = [measure(f"file_handler.read_file.txt[{size_mb}MB]", lambda: FileHandler.read_file(txt))]
+    try:
+        results.append(measure(
+            f"file_handler.read_file.epub[{size_mb}MB]", lambda: FileHandler.read_file(epub_path)
+        ))
+    except ImportError as e:
+        print(f"Skipping EPUB read_file benchmark: {e}")
+    return results
+
+
+def print_row(row):
+    rss = f"{row['peak_rss_kb'] / 1024:8.1f} MB" if row["peak_rss_kb"] is not None else "       n/a"
+    print(
+        f"{row['name']:50} {row['wall_s'] * 1000:10.2f} ms  "
+        f"alloc peak {row['alloc_peak_kb'] / 1024:8.1f} MB  rss peak {rss}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo các đường nóng của thư viện và reader trên dữ liệu tổng hợp")
+    parser.add_argument("--library-sizes", type=int, nargs="+", default=list(LIBRARY_SIZES))
+    parser.add_argument("--book-mb", type=int, nargs="+", default=list(BOOK_SIZES_MB))
+    parser.add_argument("--skip-ui", action="store_true", help="bỏ qua Sidebar/MainContent (không cần flet)")
+    parser.add_argument("--output", help="ghi kết quả ra file JSON")
+    parser.add_argument("--compare", help="file JSON kết quả cũ để phát hiện hồi quy")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="tỉ lệ chậm hơn cho phép (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.library_sizes:
+            rows = bench_data_manager(tmp, size)
+            if not args.skip_ui:
+                rows += bench_components(tmp, size)
+            for row in rows:
+                print_row(row)
+            results += rows
+        for size_mb in args.book_mb:
+            rows = bench_read_file(tmp, size_mb)
+            for row in rows:
+                print_row(row)
+            results += rows
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,114 @@
+import asyncio
 import sys
 import os
 import json
+import threading
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import flet as ft
 from src.components.sidebar import Sidebar
 from src.components.main_content import MainContent
+from src.utils.content_cache import ContentCache
+from src.utils.covers import CoverCache, CoverExtractor
 from src.utils.data_manager import DataManager
+from src.utils.importer import BookImporter
+from src.utils.library_watcher import LibraryWatcher
+from src.utils.search_index import SearchIndex
+from src.utils.session import SessionLibrary, SharedServices
+from src.utils.storage import migrate_json_to_sqlite
+from src.utils.task_runner import AsyncTaskRunner, TaskRunner
+from src.utils.ui_batcher import UpdateBatcher
+from src.utils import tracing
 
-EBOOK_DIR = "ebooks"
-DATA_DIR = "data"
+# Đường dẫn tuyệt đối để server web không phụ thuộc thư mục làm việc của từng phiên
+LIBRARY_ROOT = os.path.abspath(os.environ.get("EBOOK_LIBRARY_ROOT", "."))
+EBOOK_DIR = os.path.join(LIBRARY_ROOT, "ebooks")
+DATA_DIR = os.path.join(LIBRARY_ROOT, "data")
+WEB_PORT = int(os.environ.get("EBOOK_WEB_PORT", "8550"))
+PERF_REFRESH_SECONDS = 1.0
+PERF_ROWS = 12
 
 
-def main(page: ft.Page):
+def trace_page_updates(page):
+    # Mỗi lần gửi cây control xuống client đều đi qua page.update
+    original_update = page.update
+
+    def update(*controls):
+        with tracing.span("page.update", "flet", controls=len(controls)):
+            return original_update(*controls)
+
+    page.update = update
+
+
+def format_perf_summary():
+    stats = tracing.summary()
+    if not stats:
+        return "No spans recorded yet."
+    rows = sorted(stats.items(), key=lambda item: item[1]["max_ms"], reverse=True)[:PERF_ROWS]
+    lines = [f"{'span':34} {'n':>5} {'last':>8} {'avg':>8} {'max':>8}"]
+    for name, entry in rows:
+        lines.append(
+            f"{name[:34]:34} {entry['count']:>5} {entry['last_ms']:>8.1f} "
+            f"{entry['avg_ms']:>8.1f} {entry['max_ms']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def build_perf_overlay():
+    """Bảng hiệu năng nổi (Ctrl+Shift+P): thời gian các span gần đây, xuất được ra Chrome trace."""
+    summary_text = ft.Text("", size=11, font_family="monospace", color="#F9FAFB", selectable=True)
+    status_text = ft.Text("", size=11, color="#9CA3AF")
+
+    def export_trace(e):
+        path = os.path.join(DATA_DIR, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        count = tracing.export_chrome_trace(path)
+        status_text.value = f"Exported {count} events to {path}"
+        overlay.update()
+
+    overlay = ft.Container(
+        content=ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[
+                        ft.Text("Performance (ms)", size=13, weight=ft.FontWeight.W_600, color="#FFFFFF"),
+                        ft.TextButton("Export trace", on_click=export_trace),
+                    ],
+                    alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                ),
+                summary_text,
+                status_text,
+            ],
+            tight=True,
+            spacing=6,
+        ),
+        bgcolor="#E6111827",
+        border_radius=12,
+        padding=ft.padding.all(16),
+        right=16,
+        bottom=16,
+        width=520,
+        visible=False,
+    )
+
+    def refresh_loop():
+        while overlay.visible and overlay.page:
+            summary_text.value = format_perf_summary()
+            overlay.update()
+            time.sleep(PERF_REFRESH_SECONDS)
+
+    def toggle():
+        overlay.visible = not overlay.visible
+        if overlay.visible:
+            # Mở overlay thì bật tracing nếu chưa bật bằng EBOOK_TRACE
+            tracing.enable()
+            threading.Thread(target=refresh_loop, daemon=True, name="perf-overlay").start()
+        overlay.update()
+
+    return overlay, toggle
+
+
+def configure_page(page):
     page.title = "Modern Ebook Reader"
     page.bgcolor = "#FAFAFA"
     page.theme_mode = ft.ThemeMode.LIGHT
@@ -25,17 +121,41 @@ def main(page: ft.Page):
         use_material3=True
     )
 
+
+def open_services():
     os.makedirs(EBOOK_DIR, exist_ok=True)
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    data_manager = DataManager(os.path.join(DATA_DIR, "ebooks.json"))
-    main_content = MainContent(data_manager)
-    sidebar = Sidebar(data_manager, main_content)
+    # Thư viện lưu trong SQLite; ebooks.json cũ được chuyển sang ở lần chạy đầu
+    library_db = os.path.join(DATA_DIR, "library.db")
+    storage = migrate_json_to_sqlite(os.path.join(DATA_DIR, "ebooks.json"), library_db)
+    data_manager = DataManager(library_db, storage)
+    content_cache = ContentCache(os.path.join(DATA_DIR, "cache"))
+    cover_cache = CoverCache(os.path.join(DATA_DIR, "covers"))
+    search_index = SearchIndex(os.path.join(DATA_DIR, "search.db"), EBOOK_DIR)
+    return data_manager, content_cache, cover_cache, search_index
+
+
+def build_ui(page, services, task_runner, batcher=None, data_manager=None, importer=None):
+    """Dựng khung giao diện (chưa có dữ liệu thư viện); dùng chung cho bản đồng bộ, asyncio và web."""
+    shared_manager, content_cache, cover_cache, search_index = services
+    data_manager = data_manager if data_manager is not None else shared_manager
+    trace_page_updates(page)
+    # Dựng khung giao diện trước; dữ liệu thư viện được nạp ở nền sau khi trang hiện lên
+    main_content = MainContent(data_manager, content_cache, task_runner, search_index, cover_cache,
+                               load=False, ebook_dir=EBOOK_DIR)
+    sidebar = Sidebar(data_manager, main_content, task_runner, load=False, importer=importer)
+    main_content.batcher = batcher
+    sidebar.batcher = batcher
+    main_content.embed_covers = bool(page.web)
 
     # Tạo FilePicker
     file_picker = ft.FilePicker(on_result=lambda e: sidebar.handle_file_picked(e))
     page.overlay.append(file_picker)
 
+    perf_overlay, toggle_perf_overlay = build_perf_overlay()
+    page.overlay.append(perf_overlay)
+
     # Header với gradient và shadow
     header = ft.Container(
         content=ft.Row(
@@ -62,7 +182,7 @@ def main(page: ft.Page):
                         tight=True
                     ),
                     on_click=lambda e: file_picker.pick_files(
-                        allow_multiple=False, 
+                        allow_multiple=True,
                         allowed_extensions=["txt", "epub"]
                     ),
                     bgcolor="#FFFFFF",
@@ -73,6 +193,24 @@ def main(page: ft.Page):
                         padding=ft.padding.symmetric(horizontal=20, vertical=12)
                     ),
                 ),
+                ft.OutlinedButton(
+                    content=ft.Row(
+                        controls=[
+                            ft.Icon(ft.icons.DRIVE_FOLDER_UPLOAD_ROUNDED, size=20, color="#FFFFFF"),
+                            ft.Text("Import Folder", size=14, weight=ft.FontWeight.W_500, color="#FFFFFF")
+                        ],
+                        spacing=8,
+                        tight=True
+                    ),
+                    on_click=lambda e: file_picker.get_directory_path(
+                        dialog_title="Import a folder of books"
+                    ),
+                    style=ft.ButtonStyle(
+                        shape=ft.RoundedRectangleBorder(radius=12),
+                        padding=ft.padding.symmetric(horizontal=20, vertical=12),
+                        side=ft.BorderSide(1, "#FFFFFF"),
+                    ),
+                ),
             ],
             alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
             vertical_alignment=ft.CrossAxisAlignment.CENTER,
@@ -117,6 +255,178 @@ def main(page: ft.Page):
         )
     )
 
+    return main_content, sidebar, toggle_perf_overlay
+
+
+def on_library_loaded(data_manager, main_content, sidebar, warm=True, watcher=None):
+    main_content.update_grid()
+    sidebar.refresh()
+    if warm:
+        sidebar.index_books(data_manager.filenames("all"))
+        main_content.refresh_covers()
+        main_content.task_runner.submit("sorts", data_manager.prepare_sorts)
+        # Xoá hẳn các sách đã nằm trong thùng rác quá hạn giữ
+        main_content.compact_library()
+        if watcher is not None:
+            # Theo dõi thư mục sách sau khi thư viện đã nạp: đối chiếu một lần rồi chỉ xử lý sự kiện
+            watcher.start()
+
+
+def make_watcher(sidebar):
+    return LibraryWatcher(sidebar.importer, EBOOK_DIR, on_change=sidebar.on_files_synced)
+
+
+def is_perf_shortcut(e):
+    return e.ctrl and e.shift and e.key.upper() == "P"
+
+
+def main(page: ft.Page):
+    configure_page(page)
+    services = open_services()
+    data_manager = services[0]
+    task_runner = TaskRunner()
+    main_content, sidebar, toggle_perf_overlay = build_ui(page, services, task_runner)
+    watcher = make_watcher(sidebar)
+
+    def shutdown(e):
+        watcher.stop()
+        task_runner.shutdown()
+        data_manager.flush()
+
+    page.on_disconnect = shutdown
+
+    def on_keyboard(e: ft.KeyboardEvent):
+        if is_perf_shortcut(e):
+            toggle_perf_overlay()
+
+    page.on_keyboard_event = on_keyboard
+
+    task_runner.submit(
+        "library",
+        data_manager.preload,
+        on_done=lambda count: on_library_loaded(data_manager, main_content, sidebar, watcher=watcher),
+        on_error=lambda exc: print(f"Error loading library: {exc}"),
+    )
+
+
+async def main_async(page: ft.Page):
+    """Bản asyncio: việc chặn chạy qua asyncio.to_thread, cập nhật UI được gom một lần mỗi khung hình."""
+    configure_page(page)
+    loop = asyncio.get_running_loop()
+    # Mở SQLite, cache và chỉ mục tìm kiếm cũng là I/O: không chạy trên event loop
+    services = await asyncio.to_thread(open_services)
+    data_manager = services[0]
+    task_runner = AsyncTaskRunner(loop)
+    batcher = UpdateBatcher(page, loop)
+    main_content, sidebar, toggle_perf_overlay = build_ui(page, services, task_runner, batcher)
+    # Callback của watcher chạy trên luồng của nó; cập nhật UI đi qua batcher nên an toàn với event loop
+    watcher = make_watcher(sidebar)
+
+    async def shutdown(e):
+        watcher.stop()
+        task_runner.shutdown()
+        await asyncio.to_thread(data_manager.flush)
+
+    page.on_disconnect = shutdown
+
+    async def on_keyboard(e: ft.KeyboardEvent):
+        if is_perf_shortcut(e):
+            toggle_perf_overlay()
+
+    page.on_keyboard_event = on_keyboard
+
+    try:
+        await asyncio.to_thread(data_manager.preload)
+    except Exception as exc:
+        print(f"Error loading library: {exc}")
+        return
+    # Dựng lưới và toàn bộ danh sách sách ở sidebar tốn vài giây với thư viện lớn: không chạy trên event loop.
+    # Cập nhật UI vẫn đi qua batcher, việc nền qua AsyncTaskRunner, cả hai an toàn khi gọi từ luồng khác
+    await asyncio.to_thread(on_library_loaded, data_manager, main_content, sidebar, watcher=watcher)
+
+
+def open_shared_services():
+    services = open_services()
+    # Một BookImporter cho cả server: chỗ giữ tên file và khoá nội dung phải dùng chung giữa các phiên
+    return services + (BookImporter(services[0], EBOOK_DIR),)
+
+
+shared_services = SharedServices(open_shared_services)
+
+
+def make_shared_watcher(services, importer, pubsub):
+    """Watcher cho cả server: chỉ dùng dịch vụ dùng chung, không gắn với phiên nào.
+
+    Mọi phiên (kể cả phiên đã khởi động watcher) làm mới giao diện qua topic "library" của pubsub.
+    """
+    data_manager, _, cover_cache, search_index = services
+    cover_extractor = CoverExtractor(data_manager, cover_cache, EBOOK_DIR)
+
+    def on_change(result):
+        added, changed, removed = result
+        for file_name in removed:
+            search_index.remove_book(file_name)
+        pubsub.send_all_on_topic("library", removed)
+        if added or changed:
+            # Chạy ngay trên luồng watcher: không phụ thuộc task runner của một phiên có thể đã đóng
+            search_index.index_books(added + changed)
+            if cover_extractor.extract_missing():
+                pubsub.send_all_on_topic("library", None)
+
+    return LibraryWatcher(importer, EBOOK_DIR, on_change=on_change)
+
+
+def main_web(page: ft.Page):
+    """Một phiên của server web: thư viện, cache và chỉ mục dùng chung; phiên chỉ giữ giao diện và vị trí đọc."""
+    configure_page(page)
+    *services, importer = shared_services.get()
+    session_library = SessionLibrary(services[0])
+    task_runner = TaskRunner(max_workers=2)
+
+    def shutdown(e):
+        # Không đóng thư viện dùng chung: chỉ dừng việc nền của phiên này và lưu vị trí đọc của nó
+        page.pubsub.unsubscribe_all()
+        task_runner.shutdown()
+        session_library.flush()
+
+    page.on_disconnect = shutdown
+    main_content, sidebar, toggle_perf_overlay = build_ui(
+        page, services, task_runner, data_manager=session_library, importer=importer
+    )
+
+    def on_keyboard(e: ft.KeyboardEvent):
+        if is_perf_shortcut(e):
+            toggle_perf_overlay()
+
+    page.on_keyboard_event = on_keyboard
+
+    def on_library_changed(topic, removed):
+        # Phiên khác đã nhập sách hoặc trích xong ảnh bìa, hoặc watcher đã đồng bộ thư mục sách
+        if removed:
+            main_content.on_books_removed(removed)
+        main_content.update_grid()
+        sidebar.refresh()
+
+    page.pubsub.subscribe_topic("library", on_library_changed)
+    main_content.on_library_changed = lambda: page.pubsub.send_others_on_topic("library", None)
+
+    warm = shared_services.claim_warmup()
+    if warm:
+        # Một watcher cho cả server, khởi động ngay (không chờ phiên đầu tiên nạp xong, vì phiên có thể đóng sớm).
+        # pubsub hub là của cả ứng dụng, vẫn gửi được sau khi phiên này ngắt kết nối
+        make_shared_watcher(services, importer, page.pubsub).start()
+    task_runner.submit(
+        "library",
+        session_library.preload,
+        on_done=lambda count: on_library_loaded(session_library, main_content, sidebar, warm),
+        on_error=lambda exc: print(f"Error loading library: {exc}"),
+    )
+
 
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    if "--web" in sys.argv:
+        # python src/app.py --web: một tiến trình phục vụ nhiều phiên trình duyệt
+        ft.app(target=main_web, view=ft.AppView.WEB_BROWSER, port=WEB_PORT)
+    else:
+        # python src/app.py --async: chạy bằng event loop asyncio của Flet
+        ft.app(target=main_async if "--async" in sys.argv else main)
@@ -1,6 +1,15 @@
 import flet as ft
+import base64
 import os
+import zlib
+from src.utils.compaction import Compactor
+from src.utils.covers import CoverExtractor
 from src.utils.file_handler import FileHandler
+from src.utils.search_index import HIGHLIGHT_END, HIGHLIGHT_START, live_results
+from src.utils.task_runner import TaskRunner
+from src.utils.tracing import traced
+from src.utils.ui_batcher import request_update
+from src.utils.xhtml_converter import BOLD, CODE, HEADINGS, ITALIC, UNDERLINE, block_text
 
 # Modern color palette
 COLORS = {
@@ -32,12 +41,70 @@ GRADIENTS = [
     ["#06B6D4", COLORS["success"]],
 ]
 
+# Số trang nạp thêm mỗi lần cuộn tới mép và số trang tối đa giữ trong reader
+READER_PREFETCH_PAGES = 2
+READER_MAX_PAGES = 12
+# Ảnh lớn hơn ngưỡng này trong chương EPUB được thay bằng chú thích
+READER_MAX_IMAGE_BYTES = 2 * 1024 * 1024
+
+BLOCK_STYLES = {
+    "h1": {"size": 26, "weight": ft.FontWeight.W_700},
+    "h2": {"size": 22, "weight": ft.FontWeight.W_700},
+    "h3": {"size": 20, "weight": ft.FontWeight.W_600},
+    "h4": {"size": 18, "weight": ft.FontWeight.W_600},
+    "h5": {"size": 16, "weight": ft.FontWeight.W_600},
+    "h6": {"size": 16, "weight": ft.FontWeight.W_600},
+    "p": {"size": 16},
+    "li": {"size": 16},
+    "quote": {"size": 16, "italic": True},
+    "pre": {"size": 14},
+}
+# Số thẻ sách dựng thêm mỗi lần cuộn lưới tới cuối
+GRID_PAGE_SIZE = 48
+
 
 class MainContent:
-    def __init__(self, data_manager):
+    def __init__(self, data_manager, content_cache=None, task_runner=None, search_index=None,
+                 cover_cache=None, load=True, ebook_dir="ebooks"):
         self.data_manager = data_manager
+        self.ebook_dir = ebook_dir
+        self.content_cache = content_cache
+        self.search_index = search_index
+        self.cover_cache = cover_cache
+        self.cover_extractor = (
+            CoverExtractor(data_manager, cover_cache, ebook_dir) if cover_cache is not None else None
+        )
+        self.compactor = Compactor(data_manager, ebook_dir, content_cache, cover_cache, search_index)
+        # UpdateBatcher của bản async; None thì mỗi thay đổi được gửi ngay
+        self.batcher = None
+        # Bản web: trình duyệt không mở được đường dẫn file trên server, thumbnail được nhúng base64
+        self.embed_covers = False
+        # Bản web: báo cho các phiên khác khi thư viện dùng chung thay đổi
+        self.on_library_changed = None
+        # Sidebar đăng ký để cập nhật số đếm/danh sách khi lưới đưa sách vào thùng rác
+        self.on_books_changed = None
+        self.task_runner = task_runner if task_runner is not None else TaskRunner()
         self.selected_ebook = None
+        self.pager = None
+        self.reader_pages = None
+        self.epub = None
+        self.chapter_index = 0
+        self.chapter_body = None
+        self.chapter_picker = None
+        self.reader_column = None
+        self.reading_position = None
         self.content = ft.Text("Select a book to start reading", selectable=True, color=COLORS["gray_600"])
+        # Thẻ sách đã dựng, theo filename: (chữ ký dữ liệu, control)
+        self._cards = {}
+        # Sách có thumbnail đã bị eviction, đang chờ dựng lại vì thẻ của chúng vừa được vẽ
+        self._evicted_covers = set()
+        self._grid_books = []
+        self._grid_total = 0
+        self._grid_limit = GRID_PAGE_SIZE
+        self._grid_revision = None
+        # Cách sắp xếp và tác giả đang lọc của lưới (Sidebar đổi qua set_browse)
+        self.sort = "library"
+        self.author = None
         self.grid = ft.GridView(
             expand=True,
             runs_count=4,
@@ -45,14 +112,30 @@ class MainContent:
             child_aspect_ratio=0.75,
             spacing=24,
             run_spacing=24,
+            on_scroll=self._on_grid_scroll,
+            on_scroll_interval=100,
         )
+        self.empty_state = self._build_empty_state()
+        self.reader = ft.Container(expand=True, visible=False)
+        # Lưới và reader cùng nằm trên cây control, chỉ bật/tắt visible khi chuyển màn hình
         self.widget = ft.Container(
-            content=self._build_empty_state(),
+            content=ft.Column(
+                controls=[self.empty_state, self.grid, self.reader],
+                expand=True,
+                spacing=0,
+            ),
             bgcolor=COLORS["gray_50"],
             expand=True,
             padding=ft.padding.all(32),
         )
-        self.update_grid()
+        if load:
+            self.update_grid()
+        else:
+            # Khởi động nhanh: hiện khung trước, lưới được dựng khi thư viện nạp xong (update_grid)
+            self.empty_state.visible = False
+            self.grid.visible = False
+            self.reader.visible = True
+            self.reader.content = self._build_loading_state("Loading library...")
 
     def _build_empty_state(self):
         return ft.Column(
@@ -85,147 +168,319 @@ class MainContent:
     def get_widget(self):
         return self.widget
 
-    def update_grid(self):
-        self.grid.controls.clear()
-        ebooks = [e for e in self.data_manager.load_ebooks() if not e.get("is_deleted")]
-        
-        if not ebooks:
-            self.widget.content = self._build_empty_state()
-            self.widget.update()
+    def _card_signature(self, ebook):
+        return (
+            ebook.get("title"),
+            ebook.get("author"),
+            ebook.get("is_read", False),
+            ebook.get("is_favorite", False),
+            ebook.get("cover"),
+        )
+
+    def _cover_image(self, ebook):
+        # Lưới chỉ dùng thumbnail đã dựng sẵn, không bao giờ mở file EPUB khi vẽ
+        if self.cover_cache is None:
+            return None
+        key = ebook.get("cover")
+        path = self.cover_cache.get(key)
+        if path is None:
+            if key and self.cover_extractor is not None:
+                self._evicted_covers.add(ebook["filename"])
+            return None
+        if not self.embed_covers:
+            return ft.Image(src=os.path.abspath(path), width=200, height=280, fit=ft.ImageFit.COVER)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return ft.Image(src_base64=base64.b64encode(data).decode("ascii"), width=200, height=280,
+                        fit=ft.ImageFit.COVER)
+
+    def refresh_covers(self):
+        if self.cover_extractor is None:
             return
+        self.task_runner.submit("covers", self.cover_extractor.extract_missing, on_done=self._on_covers_ready)
 
-        for idx, ebook in enumerate(ebooks):
-            gradient = GRADIENTS[idx % len(GRADIENTS)]
-            is_read = ebook.get("is_read", False)
-            is_favorite = ebook.get("is_favorite", False)
-            
-            # Book cover with gradient
-            book_cover = ft.Container(
-                content=ft.Column(
-                    controls=[
-                        ft.Container(
-                            content=ft.Icon(
-                                name=ft.icons.MENU_BOOK_ROUNDED,
-                                size=48,
+    def _rebuild_covers(self):
+        # Gửi lại cả các sách của lô trước chưa xong: task mới trên cùng channel bỏ kết quả của lô cũ
+        if not self._evicted_covers:
+            return
+        requested = sorted(self._evicted_covers)
+        self.task_runner.submit(
+            "cover-rebuild",
+            self.cover_extractor.rebuild,
+            requested,
+            on_done=lambda updated: self._on_covers_rebuilt(requested, updated),
+        )
+
+    def _on_covers_rebuilt(self, requested, updated):
+        self._evicted_covers.difference_update(requested)
+        self._on_covers_ready(updated)
+
+    def notify_library_changed(self):
+        if self.on_library_changed is not None:
+            self.on_library_changed()
+
+    def delete_book(self, file_name):
+        # Xoá mềm: sách vào thùng rác, file chỉ bị xoá hẳn khi compaction chạy
+        if not self.data_manager.delete_ebook(file_name):
+            return
+        if self.search_index is not None:
+            # Sách trong thùng rác không còn xuất hiện trong tìm kiếm; khôi phục thì được index lại
+            self.task_runner.submit(f"unindex:{file_name}", self.search_index.remove_book, file_name)
+        if self.selected_ebook == file_name:
+            self.show_grid()
+        else:
+            self.update_grid()
+        self._books_changed()
+
+    def _books_changed(self):
+        self.notify_library_changed()
+        if self.on_books_changed is not None:
+            self.on_books_changed()
+
+    def compact_library(self, file_names=None):
+        # Dọn thùng rác ở nền: file_names=None xoá các sách quá hạn, nếu không thì xoá hẳn đúng các sách này
+        if file_names is None:
+            job = (self.compactor.run,)
+        else:
+            job = (self.compactor.purge, list(file_names))
+        self.task_runner.submit(
+            "compact",
+            *job,
+            on_done=self._on_compacted,
+            on_error=lambda exc: print(f"Error compacting library: {exc}"),
+        )
+
+    def _on_compacted(self, stats):
+        if not stats["records"]:
+            return
+        self.update_grid()
+        self._books_changed()
+
+    def _on_covers_ready(self, updated):
+        if not updated:
+            return
+        self.notify_library_changed()
+        for filename in updated:
+            self._cards.pop(filename, None)
+        if not self.reader.visible:
+            self.update_grid(force=True)
+
+    def _build_card(self, ebook):
+        gradient = GRADIENTS[zlib.crc32(ebook["filename"].encode("utf-8")) % len(GRADIENTS)]
+        is_read = ebook.get("is_read", False)
+        is_favorite = ebook.get("is_favorite", False)
+
+        cover_image = self._cover_image(ebook)
+
+        # Book cover: thumbnail ảnh bìa nếu có, nếu không thì gradient
+        cover_overlay = ft.Column(
+            controls=[
+                ft.Container(
+                    content=None if cover_image is not None else ft.Icon(
+                        name=ft.icons.MENU_BOOK_ROUNDED,
+                        size=48,
+                        color=COLORS["white"]
+                    ),
+                    alignment=ft.alignment.center,
+                    expand=True
+                ),
+                ft.Container(
+                    content=ft.Row(
+                        controls=[
+                            ft.Icon(
+                                name=ft.icons.FAVORITE if is_favorite else ft.icons.FAVORITE_BORDER,
+                                size=16,
                                 color=COLORS["white"]
                             ),
-                            alignment=ft.alignment.center,
-                            expand=True
-                        ),
-                        ft.Container(
-                            content=ft.Row(
-                                controls=[
-                                    ft.Icon(
-                                        name=ft.icons.FAVORITE if is_favorite else ft.icons.FAVORITE_BORDER,
-                                        size=16,
-                                        color=COLORS["white"]
-                                    ),
-                                    ft.Container(expand=True),
-                                    ft.Icon(
-                                        name=ft.icons.CHECK_CIRCLE if is_read else ft.icons.RADIO_BUTTON_UNCHECKED,
-                                        size=16,
-                                        color=COLORS["white"]
-                                    )
-                                ],
-                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN
-                            ),
-                            padding=ft.padding.all(12)
-                        )
-                    ],
-                    spacing=0
-                ),
-                gradient=ft.LinearGradient(
-                    begin=ft.alignment.top_left,
-                    end=ft.alignment.bottom_right,
-                    colors=gradient,
-                ),
-                border_radius=16,
-                width=200,
-                height=280,
-                shadow=ft.BoxShadow(
-                    blur_radius=20,
-                    color=gradient[0] + "40",
-                    offset=ft.Offset(0, 8),
-                    blur_style=ft.ShadowBlurStyle.OUTER
-                ),
-            )
+                            ft.Container(expand=True),
+                            ft.Icon(
+                                name=ft.icons.CHECK_CIRCLE if is_read else ft.icons.RADIO_BUTTON_UNCHECKED,
+                                size=16,
+                                color=COLORS["white"]
+                            )
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN
+                    ),
+                    padding=ft.padding.all(12)
+                )
+            ],
+            spacing=0
+        )
+        book_cover = ft.Container(
+            content=ft.Stack([
+                cover_image,
+                ft.Container(content=cover_overlay, left=0, top=0, right=0, bottom=0),
+            ]) if cover_image is not None else cover_overlay,
+            gradient=ft.LinearGradient(
+                begin=ft.alignment.top_left,
+                end=ft.alignment.bottom_right,
+                colors=gradient,
+            ),
+            clip_behavior=ft.ClipBehavior.ANTI_ALIAS,
+            border_radius=16,
+            width=200,
+            height=280,
+            shadow=ft.BoxShadow(
+                blur_radius=20,
+                color=gradient[0] + "40",
+                offset=ft.Offset(0, 8),
+                blur_style=ft.ShadowBlurStyle.OUTER
+            ),
+        )
 
-            # Book info
-            book_info = ft.Container(
-                content=ft.Column(
-                    controls=[
-                        ft.Text(
-                            ebook.get("title", ebook.get("filename", "").replace('.txt', '').replace('.epub', '')),
-                            size=16,
-                            weight=ft.FontWeight.W_600,
-                            color=COLORS["gray_800"],
-                            max_lines=2,
-                            overflow=ft.TextOverflow.ELLIPSIS,
-                            text_align=ft.TextAlign.CENTER
-                        ),
-                        ft.Text(
-                            ebook.get("author", "Unknown Author"),
-                            size=14,
-                            color=COLORS["gray_500"],
-                            text_align=ft.TextAlign.CENTER,
-                            max_lines=1,
-                            overflow=ft.TextOverflow.ELLIPSIS
+        # Book info
+        book_info = ft.Container(
+            content=ft.Column(
+                controls=[
+                    ft.Text(
+                        ebook.get("title", ebook.get("filename", "").replace('.txt', '').replace('.epub', '')),
+                        size=16,
+                        weight=ft.FontWeight.W_600,
+                        color=COLORS["gray_800"],
+                        max_lines=2,
+                        overflow=ft.TextOverflow.ELLIPSIS,
+                        text_align=ft.TextAlign.CENTER
+                    ),
+                    ft.Text(
+                        ebook.get("author", "Unknown Author"),
+                        size=14,
+                        color=COLORS["gray_500"],
+                        text_align=ft.TextAlign.CENTER,
+                        max_lines=1,
+                        overflow=ft.TextOverflow.ELLIPSIS
+                    ),
+                    ft.Container(
+                        content=ft.Row(
+                            controls=[
+                                ft.Container(
+                                    content=ft.Text(
+                                        "Completed" if is_read else "Reading",
+                                        size=12,
+                                        weight=ft.FontWeight.W_500,
+                                        color=COLORS["success"] if is_read else COLORS["primary"]
+                                    ),
+                                    bgcolor=COLORS["success"] + "20" if is_read else COLORS["primary"] + "20",
+                                    padding=ft.padding.symmetric(horizontal=8, vertical=4),
+                                    border_radius=8,
+                                ),
+                                ft.IconButton(
+                                    icon=ft.icons.DELETE_OUTLINE_ROUNDED,
+                                    icon_size=18,
+                                    icon_color=COLORS["gray_400"],
+                                    tooltip="Move to Trash",
+                                    on_click=(lambda filename: lambda e: self.delete_book(filename))(
+                                        ebook.get("filename")
+                                    ),
+                                ),
+                            ],
+                            alignment=ft.MainAxisAlignment.CENTER,
+                            vertical_alignment=ft.CrossAxisAlignment.CENTER,
                         ),
-                        ft.Container(
-                            content=ft.Row(
-                                controls=[
-                                    ft.Container(
-                                        content=ft.Text(
-                                            "Completed" if is_read else "Reading",
-                                            size=12,
-                                            weight=ft.FontWeight.W_500,
-                                            color=COLORS["success"] if is_read else COLORS["primary"]
-                                        ),
-                                        bgcolor=COLORS["success"] + "20" if is_read else COLORS["primary"] + "20",
-                                        padding=ft.padding.symmetric(horizontal=8, vertical=4),
-                                        border_radius=8,
-                                    )
-                                ],
-                                alignment=ft.MainAxisAlignment.CENTER
-                            ),
-                            margin=ft.margin.only(top=8)
-                        )
-                    ],
-                    spacing=6,
-                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                    tight=True
-                ),
-                padding=ft.padding.only(top=16)
-            )
+                        margin=ft.margin.only(top=8)
+                    )
+                ],
+                spacing=6,
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                tight=True
+            ),
+            padding=ft.padding.only(top=16)
+        )
 
-            # Complete card
-            card = ft.Container(
-                content=ft.Column(
-                    controls=[book_cover, book_info],
-                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                    spacing=0,
-                    tight=True
-                ),
-                bgcolor=COLORS["white"],
-                border_radius=20,
-                padding=ft.padding.all(16),
-                ink=True,
-                on_click=(lambda filename: lambda e: self.display_content(filename))(
-                    ebook.get("filename")
-                ),
-                animate=ft.Animation(200, ft.AnimationCurve.EASE_OUT),
-                on_hover=self._on_card_hover,
-                shadow=ft.BoxShadow(
-                    blur_radius=12,
-                    color=COLORS["gray_200"],
-                    offset=ft.Offset(0, 4),
-                    blur_style=ft.ShadowBlurStyle.OUTER
-                )
+        # Complete card
+        card = ft.Container(
+            content=ft.Column(
+                controls=[book_cover, book_info],
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                spacing=0,
+                tight=True
+            ),
+            bgcolor=COLORS["white"],
+            border_radius=20,
+            padding=ft.padding.all(16),
+            ink=True,
+            on_click=(lambda filename: lambda e: self.display_content(filename))(
+                ebook.get("filename")
+            ),
+            animate=ft.Animation(200, ft.AnimationCurve.EASE_OUT),
+            on_hover=self._on_card_hover,
+            shadow=ft.BoxShadow(
+                blur_radius=12,
+                color=COLORS["gray_200"],
+                offset=ft.Offset(0, 4),
+                blur_style=ft.ShadowBlurStyle.OUTER
             )
-            self.grid.controls.append(card)
+        )
+        return card
+
+    def _visible_cards(self):
+        cards = []
+        for ebook in self._grid_books:
+            filename = ebook["filename"]
+            signature = self._card_signature(ebook)
+            cached = self._cards.get(filename)
+            # Chỉ dựng lại thẻ khi dữ liệu hiển thị của sách thay đổi
+            if cached is None or cached[0] != signature:
+                cached = (signature, self._build_card(ebook))
+                self._cards[filename] = cached
+            cards.append(cached[1])
+        self._rebuild_covers()
+        return cards
+
+    def _query_grid(self):
+        # Chỉ lấy các sách đang hiện; DataManager giữ sẵn thứ tự sắp xếp nên lật trang là O(k)
+        self._grid_total = self.data_manager.query_count("all", self.sort, author=self.author)
+        self._grid_books = self.data_manager.query(
+            "all", self.sort, limit=self._grid_limit, author=self.author
+        )
+
+    def set_browse(self, sort="library", author=None):
+        if sort == self.sort and author == self.author:
+            return
+        self.sort = sort
+        self.author = author
+        self._grid_limit = GRID_PAGE_SIZE
+        if self.grid.page is not None:
+            self.grid.scroll_to(offset=0)
+        if not self.reader.visible:
+            self.update_grid(force=True)
 
-        self.widget.content = self.grid
-        self.widget.update()
+    @traced("main_content.update_grid", "ui")
+    def update_grid(self, force=False):
+        changed = self.reader.visible
+        revision = self.data_manager.revision
+        if force or revision != self._grid_revision:
+            self._grid_revision = revision
+            # Record gọn của DataManager, không chép cả thư viện ra dict mỗi lần dựng lưới
+            self._query_grid()
+            live = {e["filename"] for e in self._grid_books}
+            for filename in [f for f in self._cards if f not in live]:
+                del self._cards[filename]
+            cards = self._visible_cards()
+            if cards != self.grid.controls:
+                self.grid.controls = cards
+                changed = True
+
+        has_books = self._grid_total > 0
+        changed = changed or self.grid.visible != has_books
+        self.reader.visible = False
+        self.reader.content = None
+        self.empty_state.visible = not has_books
+        self.grid.visible = has_books
+        if changed:
+            request_update(self.batcher, self.widget)
+
+    def _on_grid_scroll(self, e):
+        # Nạp thêm một trang thẻ khi cuộn gần cuối lưới
+        if self._grid_limit >= self._grid_total:
+            return
+        if e.pixels >= e.max_scroll_extent - e.viewport_dimension:
+            self._grid_limit += GRID_PAGE_SIZE
+            self._query_grid()
+            self.grid.controls = self._visible_cards()
+            request_update(self.batcher, self.grid)
 
     def _on_card_hover(self, e):
         if e.data == "true":
@@ -244,20 +499,347 @@ class MainContent:
                 offset=ft.Offset(0, 4),
                 blur_style=ft.ShadowBlurStyle.OUTER
             )
-        e.control.update()
+        request_update(self.batcher, e.control)
 
-    def display_content(self, file_name):
-        content = FileHandler.read_file(os.path.join("ebooks", file_name))
-        
-        # Update last_read timestamp
-        ebooks = self.data_manager.load_ebooks()
-        for ebook in ebooks:
-            if ebook.get("filename") == file_name:
-                import datetime
-                ebook["last_read"] = datetime.datetime.now().isoformat()
+    def _close_reader(self):
+        self.reader_column = None
+        if self.pager is not None:
+            self.pager.close()
+            self.pager = None
+            self.reader_pages = None
+        if self.epub is not None:
+            self.epub.close()
+            self.epub = None
+            self.chapter_body = None
+            self.chapter_picker = None
+
+    @staticmethod
+    def _discard_book(opened):
+        kind, book, _ = opened
+        if kind in ("txt", "epub"):
+            book.close()
+
+    def _build_page_text(self, index, text=None):
+        return ft.Text(
+            self.pager.page(index) if text is None else text,
+            selectable=True,
+            size=16,
+            color=COLORS["gray_700"],
+            text_align=ft.TextAlign.JUSTIFY,
+            data=index,
+        )
+
+    @traced("main_content.build_paged_reader", "ui")
+    def _build_paged_reader(self, first_index, first_pages):
+        self.reader_pages = ft.ListView(
+            controls=[
+                self._build_page_text(first_index + i, text)
+                for i, text in enumerate(first_pages)
+            ],
+            expand=True,
+            spacing=0,
+            on_scroll=self._on_reader_scroll,
+            on_scroll_interval=100,
+        )
+        return self.reader_pages
+
+    def _remember_position(self, chapter, offset):
+        self.reading_position = (chapter, offset)
+        if self.selected_ebook is not None:
+            self.data_manager.set_position(self.selected_ebook, chapter, offset)
+
+    @staticmethod
+    def _top_control(controls, e):
+        # Ước lượng control đang ở đầu khung nhìn từ tỉ lệ cuộn
+        total = (e.max_scroll_extent or 0) + (e.viewport_dimension or 0)
+        fraction = e.pixels / total if total else 0
+        return controls[min(len(controls) - 1, max(0, int(fraction * len(controls))))]
+
+    def _on_reader_scroll(self, e):
+        if self.pager is None or not self.reader_pages.controls:
+            return
+        controls = self.reader_pages.controls
+        top_page = self._top_control(controls, e).data
+        self._remember_position(0, self.pager.page_range(top_page)[0])
+        changed = False
+        if e.pixels >= e.max_scroll_extent - e.viewport_dimension:
+            last = controls[-1].data
+            for index in range(last + 1, min(self.pager.page_count, last + 1 + READER_PREFETCH_PAGES)):
+                controls.append(self._build_page_text(index))
+                changed = True
+            # Bỏ bớt các trang phía trên để bộ nhớ không tăng theo độ dài sách
+            while changed and len(controls) > READER_MAX_PAGES:
+                controls.pop(0)
+        elif e.pixels <= e.viewport_dimension and controls[0].data > 0:
+            first = controls[0].data
+            for index in range(first - 1, max(-1, first - 1 - READER_PREFETCH_PAGES), -1):
+                controls.insert(0, self._build_page_text(index))
+                changed = True
+            while changed and len(controls) > READER_MAX_PAGES:
+                controls.pop()
+        if changed:
+            request_update(self.batcher, self.reader_pages)
+
+    @staticmethod
+    def _span_style(flags):
+        style = ft.TextStyle()
+        if flags & BOLD:
+            style.weight = ft.FontWeight.W_600
+        if flags & ITALIC:
+            style.italic = True
+        if flags & UNDERLINE:
+            style.decoration = ft.TextDecoration.UNDERLINE
+        if flags & CODE:
+            style.font_family = "monospace"
+            style.bgcolor = COLORS["gray_100"]
+        return style
+
+    def _build_span(self, span):
+        text, flags = span[0], span[1]
+        href = span[2] if len(span) > 2 else None
+        style = self._span_style(flags)
+        if href and "://" in href:
+            # Chỉ mở liên kết ra ngoài; liên kết nội bộ giữa các chương hiển thị như chữ thường
+            style.color = COLORS["primary"]
+            style.decoration = ft.TextDecoration.UNDERLINE
+            return ft.TextSpan(text, style=style, url=href)
+        return ft.TextSpan(text, style=style)
+
+    def _build_image(self, block):
+        try:
+            data = self.epub.read_item(block["src"])
+        except (KeyError, OSError):
+            data = None
+        if not data or len(data) > READER_MAX_IMAGE_BYTES:
+            return ft.Text(f"[{block['alt'] or 'Image'}]", size=13, italic=True, color=COLORS["gray_400"])
+        return ft.Image(
+            src_base64=base64.b64encode(data).decode("ascii"),
+            fit=ft.ImageFit.CONTAIN,
+            tooltip=block["alt"] or None,
+        )
+
+    @traced("main_content.build_blocks", "ui", size=len)
+    def _build_blocks(self, blocks):
+        # Mỗi block là một control có key để có thể cuộn thẳng tới vị trí đã lưu;
+        # data là offset ký tự của block trong chapter_text (các block chữ cách nhau "\n\n")
+        controls = []
+        offset = 0
+        for i, block in enumerate(blocks):
+            kind = block["kind"]
+            if kind == "img":
+                control = self._build_image(block)
+                control.key, control.data = f"para-{i}", offset
+                controls.append(control)
+                continue
+            text = block_text(block)
+            if not text:
+                continue
+            style = BLOCK_STYLES.get(kind, BLOCK_STYLES["p"])
+            control = ft.Text(
+                spans=[self._build_span(span) for span in block["spans"]],
+                selectable=True,
+                size=style["size"],
+                weight=style.get("weight"),
+                italic=style.get("italic"),
+                font_family="monospace" if kind == "pre" else None,
+                color=COLORS["gray_800"] if kind in HEADINGS else COLORS["gray_700"],
+                text_align=ft.TextAlign.JUSTIFY if kind in ("p", "quote") else ft.TextAlign.START,
+            )
+            if kind in ("li", "quote", "pre"):
+                control = ft.Container(
+                    content=control,
+                    padding=ft.padding.all(12) if kind == "pre" else ft.padding.only(left=20),
+                    bgcolor=COLORS["gray_50"] if kind == "pre" else None,
+                    border=ft.border.only(left=ft.BorderSide(3, COLORS["gray_200"])) if kind == "quote" else None,
+                )
+            control.key, control.data = f"para-{i}", offset
+            controls.append(control)
+            offset += len(text) + 2
+        return controls
+
+    def _paragraph_key(self, offset):
+        key = None
+        for control in self.chapter_body.controls:
+            if control.data > offset:
                 break
-        self.data_manager.save_ebooks(ebooks)
-        
+            key = control.key
+        return key
+
+    def _build_epub_reader(self, chapter_index, first_chapter, offset=0):
+        self.chapter_index = chapter_index
+        if not self.epub.chapters:
+            return ft.Text("This book has no readable chapters.", color=COLORS["gray_500"])
+
+        self.chapter_body = ft.Column(controls=self._build_blocks(first_chapter), spacing=12)
+        self.chapter_picker = ft.Dropdown(
+            options=[
+                ft.dropdown.Option(key=str(c.index), text=self.epub.chapter_title(c.index))
+                for c in self.epub.chapters
+            ],
+            value=str(chapter_index),
+            dense=True,
+            expand=True,
+            on_change=lambda e: self.show_chapter(int(e.control.value)),
+        )
+        chapter_nav = ft.Row(
+            controls=[
+                ft.IconButton(
+                    icon=ft.icons.CHEVRON_LEFT_ROUNDED,
+                    icon_color=COLORS["primary"],
+                    tooltip="Previous Chapter",
+                    on_click=lambda e: self.show_chapter(self.chapter_index - 1),
+                ),
+                self.chapter_picker,
+                ft.IconButton(
+                    icon=ft.icons.CHEVRON_RIGHT_ROUNDED,
+                    icon_color=COLORS["primary"],
+                    tooltip="Next Chapter",
+                    on_click=lambda e: self.show_chapter(self.chapter_index + 1),
+                ),
+            ],
+            vertical_alignment=ft.CrossAxisAlignment.CENTER,
+        )
+        return ft.Column(controls=[chapter_nav, self.chapter_body], spacing=16)
+
+    def show_chapter(self, index):
+        if self.epub is None or not 0 <= index < len(self.epub.chapters):
+            return
+        self.chapter_index = index
+        self.chapter_picker.value = str(index)
+        epub = self.epub
+        self.task_runner.submit(
+            "chapter",
+            epub.chapter_blocks,
+            index,
+            on_done=lambda blocks: self._show_chapter_blocks(epub, index, blocks),
+        )
+
+    @traced("main_content.show_chapter", "ui")
+    def _show_chapter_blocks(self, epub, index, blocks):
+        if self.epub is not epub or self.chapter_index != index:
+            return
+        self.chapter_body.controls = self._build_blocks(blocks)
+        self._remember_position(index, 0)
+        request_update(self.batcher, self.widget)
+        if self.reader_column is not None:
+            self.reader_column.scroll_to(offset=0)
+
+    def _on_chapter_scroll(self, e):
+        if self.epub is None or self.chapter_body is None or not self.chapter_body.controls:
+            return
+        top = self._top_control(self.chapter_body.controls, e)
+        self._remember_position(self.chapter_index, top.data)
+
+    def _on_bookmark(self, e):
+        if self.reading_position is not None and self.selected_ebook is not None:
+            self.data_manager.set_position(self.selected_ebook, *self.reading_position)
+        self.data_manager.flush()
+        e.control.icon = ft.icons.BOOKMARK_ROUNDED
+        e.control.icon_color = COLORS["primary"]
+        request_update(self.batcher, e.control)
+
+    def _open_book(self, file_path, position=None, fingerprint=None, encoding=None):
+        # Chạy trong TaskRunner: mở file và chuẩn bị nội dung hiển thị đầu tiên.
+        # position = (chương, offset) để mở thẳng tới một vị trí, ví dụ kết quả tìm kiếm
+        chapter, offset = position or (0, 0)
+        if file_path.endswith('.txt'):
+            pager = FileHandler.open_pager(file_path, encoding)
+            first = pager.page_for_offset(offset) if pager.page_count else 0
+            return "txt", pager, (first, pager.window(first, 1 + READER_PREFETCH_PAGES))
+        if file_path.endswith('.epub'):
+            epub = FileHandler.open_epub(file_path, self.content_cache, fingerprint)
+            if not epub.chapters:
+                return "epub", epub, (0, None, 0)
+            if not 0 <= chapter < len(epub.chapters):
+                chapter, offset = 0, 0
+            return "epub", epub, (chapter, epub.chapter_blocks(chapter), offset)
+        return "other", None, FileHandler.read_file(file_path)
+
+    def _build_loading_state(self, message="Opening book..."):
+        return ft.Column(
+            controls=[
+                ft.ProgressRing(width=32, height=32, stroke_width=3, color=COLORS["primary"]),
+                ft.Text(message, size=14, color=COLORS["gray_500"]),
+            ],
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            alignment=ft.MainAxisAlignment.CENTER,
+            spacing=16,
+        )
+
+    def on_books_removed(self, file_names):
+        # Sách đang mở đã bị xoá khỏi thư mục: quay về lưới thay vì giữ reader của một file không còn
+        if self.selected_ebook in file_names:
+            self.show_grid()
+
+    @traced("main_content.display_content", "ui")
+    def display_content(self, file_name, position=None):
+        if self.data_manager.record(file_name) is None:
+            # Bản ghi đã bị gỡ (file sách không còn), ví dụ khi bấm vào kết quả tìm kiếm cũ
+            self.update_grid(force=True)
+            return
+        self._close_reader()
+        self.selected_ebook = file_name
+
+        # Update last_read timestamp
+        self.data_manager.update_last_read(file_name)
+
+        if position is None:
+            # Mở lại tại vị trí đọc đã lưu
+            position = self.data_manager.get_position(file_name)
+        self.reading_position = position
+
+        self._show_reader(file_name, self._build_loading_state())
+        record = self.data_manager.get_ebook(file_name) or {}
+        self.task_runner.submit(
+            "open",
+            self._open_book,
+            os.path.join(self.ebook_dir, file_name),
+            position,
+            record.get("fingerprint"),
+            record.get("encoding"),
+            on_done=lambda opened: self._show_book(file_name, opened),
+            on_error=lambda exc: self._show_reader(
+                file_name,
+                ft.Text(f"Could not open this book: {exc}", color=COLORS["error"]),
+            ),
+            on_discard=self._discard_book,
+        )
+
+    @traced("main_content.show_book", "ui")
+    def _show_book(self, file_name, opened):
+        if self.selected_ebook != file_name:
+            self._discard_book(opened)
+            return
+        kind, book, first_content = opened
+        if kind == "txt":
+            self.pager = book
+            # Lưu bảng mã vừa đoán vào record để lần mở sau bỏ qua bước đoán
+            self.data_manager.set_encoding(file_name, book.encoding)
+            self.reading_position = (0, book.page_range(first_content[0])[0]) if book.page_count else None
+            self._show_reader(file_name, self._build_paged_reader(*first_content), paged=True)
+        elif kind == "epub":
+            self.epub = book
+            chapter, _, offset = first_content
+            self._show_reader(file_name, self._build_epub_reader(*first_content))
+            if offset and self.chapter_body is not None and self.reader_column is not None:
+                key = self._paragraph_key(offset)
+                if key is not None:
+                    self.reader_column.scroll_to(key=key)
+            self.reading_position = (chapter, offset)
+        else:
+            self._show_reader(
+                file_name,
+                ft.Text(
+                    first_content,
+                    selectable=True,
+                    size=16,
+                    color=COLORS["gray_700"],
+                    text_align=ft.TextAlign.JUSTIFY,
+                ),
+            )
+
+    @traced("main_content.show_reader", "ui")
+    def _show_reader(self, file_name, reader_body, paged=False):
         # Reader header
         reader_header = ft.Container(
             content=ft.Row(
@@ -293,7 +875,8 @@ class MainContent:
                             ft.IconButton(
                                 icon=ft.icons.BOOKMARK_BORDER_ROUNDED,
                                 icon_color=COLORS["gray_500"],
-                                tooltip="Bookmark"
+                                tooltip="Bookmark",
+                                on_click=self._on_bookmark
                             ),
                             ft.IconButton(
                                 icon=ft.icons.SETTINGS_ROUNDED,
@@ -313,42 +896,173 @@ class MainContent:
         )
 
         # Reader content
-        reader_content = ft.Container(
-            content=ft.Column(
-                controls=[
-                    ft.Container(
-                        content=ft.Text(
-                            content,
-                            selectable=True,
-                            size=16,
-                            color=COLORS["gray_700"],
-                            text_align=ft.TextAlign.JUSTIFY,
-                        ),
-                        padding=ft.padding.all(32),
-                        bgcolor=COLORS["white"],
-                        border_radius=16,
-                        margin=ft.margin.all(24),
-                        shadow=ft.BoxShadow(
-                            blur_radius=8,
-                            color=COLORS["gray_200"],
-                            offset=ft.Offset(0, 2),
-                            blur_style=ft.ShadowBlurStyle.OUTER
-                        )
-                    )
-                ],
+        reader_card = ft.Container(
+            content=reader_body,
+            padding=ft.padding.all(32),
+            bgcolor=COLORS["white"],
+            border_radius=16,
+            margin=ft.margin.all(24),
+            shadow=ft.BoxShadow(
+                blur_radius=8,
+                color=COLORS["gray_200"],
+                offset=ft.Offset(0, 2),
+                blur_style=ft.ShadowBlurStyle.OUTER
+            )
+        )
+        if paged:
+            # ListView tự cuộn và nạp trang theo nhu cầu
+            reader_card.expand = True
+            reader_column = ft.Column(controls=[reader_card], expand=True)
+        else:
+            reader_column = ft.Column(
+                controls=[reader_card],
                 scroll=ft.ScrollMode.AUTO,
-                expand=True
-            ),
+                expand=True,
+                on_scroll=self._on_chapter_scroll,
+                on_scroll_interval=250
+            )
+        self.reader_column = reader_column
+        reader_content = ft.Container(
+            content=reader_column,
             expand=True,
             bgcolor=COLORS["gray_50"]
         )
 
-        self.widget.content = ft.Column(
-            controls=[reader_header, reader_content],
+        self._show_panel(
+            ft.Column(
+                controls=[reader_header, reader_content],
+                spacing=0,
+                expand=True
+            )
+        )
+
+    def _show_panel(self, content):
+        # Hiển thị reader hoặc kết quả tìm kiếm thay cho lưới sách
+        self.reader.content = content
+        self.reader.visible = True
+        self.grid.visible = False
+        self.empty_state.visible = False
+        request_update(self.batcher, self.widget)
+
+    @traced("main_content.show_search_results", "ui")
+    def show_search_results(self, query):
+        if self.search_index is None or not query.strip():
+            return
+        self.selected_ebook = None
+        self.task_runner.cancel("open")
+        self._close_reader()
+        self._show_panel(self._build_search_view(query, self._build_loading_state()))
+        self.task_runner.submit(
+            "search",
+            lambda: live_results(self.search_index.search(query), self.data_manager),
+            on_done=lambda results: self._show_panel(
+                self._build_search_view(query, self._build_search_results(results))
+            ),
+        )
+
+    def _build_search_view(self, query, body):
+        header = ft.Container(
+            content=ft.Row(
+                controls=[
+                    ft.IconButton(
+                        icon=ft.icons.ARROW_BACK_ROUNDED,
+                        icon_color=COLORS["primary"],
+                        icon_size=24,
+                        on_click=lambda e: self.show_grid(),
+                        tooltip="Back to Library"
+                    ),
+                    ft.Column(
+                        controls=[
+                            ft.Text(
+                                f'Results for "{query}"',
+                                size=20,
+                                weight=ft.FontWeight.W_600,
+                                color=COLORS["gray_800"],
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS
+                            ),
+                            ft.Text(
+                                "Full-text search",
+                                size=14,
+                                color=COLORS["gray_500"]
+                            )
+                        ],
+                        spacing=2,
+                        expand=True
+                    ),
+                ],
+                vertical_alignment=ft.CrossAxisAlignment.CENTER
+            ),
+            bgcolor=COLORS["white"],
+            padding=ft.padding.symmetric(horizontal=24, vertical=16),
+            border=ft.border.only(bottom=ft.BorderSide(1, COLORS["gray_200"]))
+        )
+        return ft.Column(
+            controls=[header, ft.Container(content=body, expand=True, padding=ft.padding.all(24))],
             spacing=0,
             expand=True
         )
-        self.widget.update()
+
+    @staticmethod
+    def _snippet_spans(snippet):
+        spans = []
+        for i, part in enumerate(snippet.replace(HIGHLIGHT_END, HIGHLIGHT_START).split(HIGHLIGHT_START)):
+            if not part:
+                continue
+            if i % 2:
+                spans.append(ft.TextSpan(
+                    part,
+                    style=ft.TextStyle(weight=ft.FontWeight.W_600, color=COLORS["primary"]),
+                ))
+            else:
+                spans.append(ft.TextSpan(part))
+        return spans
+
+    def _build_search_results(self, results):
+        if not results:
+            return ft.Text("No passages match this search.", size=14, color=COLORS["gray_500"])
+
+        tiles = []
+        for result in results:
+            ebook = self.data_manager.get_ebook(result["filename"]) or {}
+            title = ebook.get("title", result["filename"])
+            if result["filename"].endswith('.epub'):
+                title = f"{title} · Chapter {result['chapter'] + 1}"
+            tiles.append(ft.Container(
+                content=ft.Column(
+                    controls=[
+                        ft.Text(
+                            title,
+                            size=14,
+                            weight=ft.FontWeight.W_600,
+                            color=COLORS["gray_800"],
+                            max_lines=1,
+                            overflow=ft.TextOverflow.ELLIPSIS
+                        ),
+                        ft.Text(
+                            spans=self._snippet_spans(" ".join(result["snippet"].split())),
+                            size=13,
+                            color=COLORS["gray_600"],
+                            max_lines=3,
+                            overflow=ft.TextOverflow.ELLIPSIS
+                        ),
+                    ],
+                    spacing=6,
+                    tight=True
+                ),
+                bgcolor=COLORS["white"],
+                border_radius=12,
+                padding=ft.padding.all(16),
+                ink=True,
+                on_click=(lambda r: lambda e: self.display_content(
+                    r["filename"], (r["chapter"], r["offset"])
+                ))(result),
+                border=ft.border.all(1, COLORS["gray_200"])
+            ))
+        return ft.ListView(controls=tiles, spacing=8, expand=True)
 
     def show_grid(self):
+        self.selected_ebook = None
+        self.task_runner.cancel("open")
+        self._close_reader()
         self.update_grid()
\ No newline at end of file
@@ -1,17 +1,63 @@
-import os
 import flet as ft
-from src.utils.file_handler import FileHandler
+from src.utils.importer import BookImporter
+from src.utils.tracing import traced
+from src.utils.ui_batcher import request_update
+
+# Số ô sách dựng thêm mỗi lần cuộn danh sách tới cuối
+LIST_PAGE_SIZE = 50
 
 
 class Sidebar:
-    def __init__(self, data_manager, main_content):
+    def __init__(self, data_manager, main_content, task_runner=None, load=True, importer=None):
         self.data_manager = data_manager
         self.main_content = main_content
-        self.ebook_list = ft.ListView(expand=True, spacing=4)
+        self.task_runner = task_runner if task_runner is not None else main_content.task_runner
+        # Bản web dùng chung một BookImporter để các phiên không giành cùng một tên file
+        self.importer = importer if importer is not None else BookImporter(data_manager, main_content.ebook_dir)
+        self.ebook_list = ft.ListView(expand=True, spacing=4, on_scroll=self._on_list_scroll, on_scroll_interval=100)
+        # Như lưới: chỉ dựng các ô đang hiện, thêm một trang khi cuộn gần cuối
+        self._list_limit = LIST_PAGE_SIZE
+        self._list_total = 0
+        self.import_progress = ft.ProgressBar(visible=False, color="#6366F1", bgcolor="#F3F4F6")
         self.selected_menu = "all"
+        self.batcher = None
+        self.sort_picker = ft.Dropdown(
+            value="library",
+            options=[ft.dropdown.Option(key, label) for key, label in self.SORT_OPTIONS],
+            dense=True,
+            text_size=13,
+            expand=True,
+            border_radius=12,
+            border_color="#E5E7EB",
+            on_change=self._on_browse_change,
+        )
+        # Facet tác giả: dựng lại danh sách khi thư viện đổi
+        self.author_picker = ft.Dropdown(
+            value=self.ALL_AUTHORS,
+            options=[ft.dropdown.Option(self.ALL_AUTHORS, "All authors")],
+            dense=True,
+            text_size=13,
+            expand=True,
+            border_radius=12,
+            border_color="#E5E7EB",
+            on_change=self._on_browse_change,
+        )
+        self._authors_revision = None
+        # Chỉ hiện khi đang xem thùng rác
+        self.empty_trash_button = ft.TextButton(
+            "Empty Trash",
+            icon=ft.icons.DELETE_SWEEP_ROUNDED,
+            visible=False,
+            on_click=lambda e: self._empty_trash(),
+        )
+        main_content.on_books_changed = self.refresh
+        # Control giữ nguyên giữa các lần đổi bộ lọc: menu theo key, ô sách theo filename
+        self._menu_tiles = {}
+        self._book_tiles = {}
+        self._tiles_revision = None
         self.widget = ft.Container(
             content=ft.Column(
-                controls=self._build_menu(),
+                controls=self._build_menu(load),
                 expand=True,
                 spacing=8,
             ),
@@ -19,37 +65,38 @@ class Sidebar:
             bgcolor="#FFFFFF",
             padding=ft.padding.all(20),
         )
-        self.update_ebook_list()
+        # load=False: số đếm và danh sách sách được điền sau bằng refresh()
+        if load:
+            self.update_ebook_list()
 
-    def _build_menu(self):
-        menu_items = [
-            {
-                "key": "all",
-                "icon": ft.icons.LIBRARY_BOOKS_ROUNDED,
-                "title": "All Books",
-                "count": self.data_manager.count_all()
-            },
-            {
-                "key": "recent",
-                "icon": ft.icons.HISTORY_ROUNDED,
-                "title": "Recently Read",
-                "count": self.data_manager.count_recently_read()
-            },
-            {
-                "key": "read",
-                "icon": ft.icons.CHECK_CIRCLE_ROUNDED,
-                "title": "Completed",
-                "count": self.data_manager.count_read()
-            },
-            {
-                "key": "favorite",
-                "icon": ft.icons.FAVORITE_ROUNDED,
-                "title": "Favorites",
-                "count": self.data_manager.count_favorite()
-            }
-        ]
+    SORT_OPTIONS = [
+        ("library", "Date added"),
+        ("title", "Title"),
+        ("author", "Author"),
+        ("last_read", "Last read"),
+    ]
+    ALL_AUTHORS = ""
 
+    MENU_ITEMS = [
+        ("all", ft.icons.LIBRARY_BOOKS_ROUNDED, "All Books"),
+        ("recent", ft.icons.HISTORY_ROUNDED, "Recently Read"),
+        ("read", ft.icons.CHECK_CIRCLE_ROUNDED, "Completed"),
+        ("favorite", ft.icons.FAVORITE_ROUNDED, "Favorites"),
+        ("deleted", ft.icons.DELETE_ROUNDED, "Trash"),
+    ]
+
+    def _build_menu(self, load=True):
+        counts = self.data_manager.counts() if load else {}
         controls = [
+            ft.TextField(
+                hint_text="Search in books",
+                prefix_icon=ft.icons.SEARCH_ROUNDED,
+                dense=True,
+                border_radius=12,
+                border_color="#E5E7EB",
+                text_size=14,
+                on_submit=lambda e: self.main_content.show_search_results(e.control.value),
+            ),
             ft.Container(
                 content=ft.Text(
                     "Library",
@@ -61,46 +108,35 @@ class Sidebar:
             )
         ]
 
-        for item in menu_items:
-            is_selected = self.selected_menu == item["key"]
-            
+        for key, icon, title in self.MENU_ITEMS:
+            icon_control = ft.Icon(name=icon, size=20)
+            title_control = ft.Text(title, size=14, expand=True)
+            count_text = ft.Text(str(counts.get(key, "–")), size=12, weight=ft.FontWeight.W_500)
+            badge = ft.Container(
+                content=count_text,
+                padding=ft.padding.symmetric(horizontal=8, vertical=4),
+                border_radius=12,
+            )
             menu_tile = ft.Container(
                 content=ft.Row(
-                    controls=[
-                        ft.Icon(
-                            name=item["icon"],
-                            color="#6366F1" if is_selected else "#6B7280",
-                            size=20
-                        ),
-                        ft.Text(
-                            item["title"],
-                            size=14,
-                            weight=ft.FontWeight.W_500 if is_selected else ft.FontWeight.W_400,
-                            color="#1F2937" if is_selected else "#6B7280",
-                            expand=True
-                        ),
-                        ft.Container(
-                            content=ft.Text(
-                                str(item["count"]),
-                                size=12,
-                                weight=ft.FontWeight.W_500,
-                                color="#FFFFFF" if is_selected else "#6B7280"
-                            ),
-                            bgcolor="#6366F1" if is_selected else "#F3F4F6",
-                            padding=ft.padding.symmetric(horizontal=8, vertical=4),
-                            border_radius=12,
-                        )
-                    ],
+                    controls=[icon_control, title_control, badge],
                     spacing=12,
                     vertical_alignment=ft.CrossAxisAlignment.CENTER,
                 ),
-                bgcolor="#F0F4FF" if is_selected else "transparent",
                 border_radius=12,
                 padding=ft.padding.symmetric(horizontal=16, vertical=12),
                 ink=True,
-                on_click=lambda e, key=item["key"]: self._on_menu_select(key),
+                on_click=lambda e, key=key: self._on_menu_select(key),
                 animate=ft.Animation(200, ft.AnimationCurve.EASE_OUT),
             )
+            self._menu_tiles[key] = {
+                "tile": menu_tile,
+                "icon": icon_control,
+                "title": title_control,
+                "badge": badge,
+                "count": count_text,
+            }
+            self._style_menu_tile(key)
             controls.append(menu_tile)
 
         controls.extend([
@@ -114,6 +150,9 @@ class Sidebar:
                 ),
                 margin=ft.margin.only(top=16, bottom=8)
             ),
+            ft.Row(controls=[self.sort_picker, self.author_picker], spacing=8),
+            self.empty_trash_button,
+            self.import_progress,
             ft.Container(
                 content=self.ebook_list,
                 expand=True
@@ -122,96 +161,202 @@ class Sidebar:
 
         return controls
 
+    def _style_menu_tile(self, key):
+        parts = self._menu_tiles[key]
+        is_selected = self.selected_menu == key
+        parts["icon"].color = "#6366F1" if is_selected else "#6B7280"
+        parts["title"].weight = ft.FontWeight.W_500 if is_selected else ft.FontWeight.W_400
+        parts["title"].color = "#1F2937" if is_selected else "#6B7280"
+        parts["count"].color = "#FFFFFF" if is_selected else "#6B7280"
+        parts["badge"].bgcolor = "#6366F1" if is_selected else "#F3F4F6"
+        parts["tile"].bgcolor = "#F0F4FF" if is_selected else "transparent"
+
+    def _update_counts(self):
+        counts = self.data_manager.counts()
+        for key, parts in self._menu_tiles.items():
+            parts["count"].value = str(counts[key])
+
     def _on_menu_select(self, menu):
+        previous = self.selected_menu
         self.selected_menu = menu
-        self.widget.content.controls = self._build_menu()
+        self.empty_trash_button.visible = menu == "deleted"
+        self._style_menu_tile(previous)
+        self._style_menu_tile(menu)
+        self._reset_list_page()
+        self.update_ebook_list()
+        request_update(self.batcher, self.widget)
+
+    @traced("sidebar.refresh", "ui")
+    def refresh(self):
+        # Gọi sau khi dữ liệu thư viện thay đổi: cập nhật số đếm và danh sách tại chỗ
+        self._update_counts()
         self.update_ebook_list()
-        self.widget.update()
+        request_update(self.batcher, self.widget)
 
     def get_widget(self):
         return self.widget
 
-    def update_ebook_list(self):
-        self.ebook_list.controls.clear()
-        ebooks = self.data_manager.load_ebooks()
-        
-        if self.selected_menu == "all":
-            filtered = [e for e in ebooks if not e.get("is_deleted")]
-        elif self.selected_menu == "recent":
-            import datetime
-            now = datetime.datetime.now()
-            filtered = []
-            for e in ebooks:
-                last_read = e.get("last_read")
-                if last_read and not e.get("is_deleted"):
-                    try:
-                        dt = datetime.datetime.fromisoformat(last_read)
-                        if (now - dt).days <= 7:
-                            filtered.append(e)
-                    except Exception:
-                        pass
-        elif self.selected_menu == "favorite":
-            filtered = [
-                e for e in ebooks if e.get("is_favorite") and not e.get("is_deleted")
-            ]
-        elif self.selected_menu == "read":
-            filtered = [
-                e for e in ebooks if e.get("is_read") and not e.get("is_deleted")
-            ]
-        else:
-            filtered = [e for e in ebooks if not e.get("is_deleted")]
-
-        for ebook in filtered:
-            book_tile = ft.Container(
-                content=ft.Column(
-                    controls=[
-                        ft.Text(
-                            ebook.get("title", ebook.get("filename")),
-                            size=14,
-                            weight=ft.FontWeight.W_500,
-                            color="#1F2937",
-                            max_lines=2,
-                            overflow=ft.TextOverflow.ELLIPSIS
-                        ),
-                        ft.Text(
-                            ebook.get("author", "Unknown Author"),
-                            size=12,
-                            color="#6B7280",
-                            max_lines=1,
-                            overflow=ft.TextOverflow.ELLIPSIS
-                        ),
-                        ft.Row(
-                            controls=[
-                                ft.Icon(
-                                    name=ft.icons.CHECK_CIRCLE if ebook.get("is_read") else ft.icons.RADIO_BUTTON_UNCHECKED,
-                                    color="#10B981" if ebook.get("is_read") else "#D1D5DB",
-                                    size=16
-                                ),
-                                ft.Text(
-                                    "Completed" if ebook.get("is_read") else "In Progress",
-                                    size=11,
-                                    color="#10B981" if ebook.get("is_read") else "#6B7280"
-                                )
-                            ],
-                            spacing=4,
-                            vertical_alignment=ft.CrossAxisAlignment.CENTER
-                        )
-                    ],
-                    spacing=4,
-                    tight=True
+    @staticmethod
+    def _tile_signature(ebook):
+        return ebook.get("title"), ebook.get("author"), ebook.get("is_read", False), ebook.get("is_deleted", False)
+
+    def _trash_actions(self, filename):
+        return ft.Row(
+            controls=[
+                ft.TextButton(
+                    "Restore",
+                    icon=ft.icons.RESTORE_FROM_TRASH_ROUNDED,
+                    on_click=lambda e: self._restore(filename),
                 ),
-                bgcolor="transparent",
-                border_radius=8,
-                padding=ft.padding.all(12),
-                ink=True,
-                on_click=(lambda name: lambda e: self.main_content.display_content(name))(
-                    ebook.get("filename")
+                ft.TextButton(
+                    "Delete forever",
+                    icon=ft.icons.DELETE_FOREVER_ROUNDED,
+                    style=ft.ButtonStyle(color="#EF4444"),
+                    on_click=lambda e: self._delete_forever([filename]),
                 ),
-                animate=ft.Animation(150, ft.AnimationCurve.EASE_OUT),
-                on_hover=self._on_book_hover,
-                border=ft.border.all(1, "#E5E7EB")
-            )
-            self.ebook_list.controls.append(book_tile)
+            ],
+            spacing=4,
+        )
+
+    def _build_book_tile(self, ebook):
+        is_deleted = ebook.get("is_deleted", False)
+        return ft.Container(
+            content=ft.Column(
+                controls=[
+                    ft.Text(
+                        ebook.get("title", ebook.get("filename")),
+                        size=14,
+                        weight=ft.FontWeight.W_500,
+                        color="#1F2937",
+                        max_lines=2,
+                        overflow=ft.TextOverflow.ELLIPSIS
+                    ),
+                    ft.Text(
+                        ebook.get("author", "Unknown Author"),
+                        size=12,
+                        color="#6B7280",
+                        max_lines=1,
+                        overflow=ft.TextOverflow.ELLIPSIS
+                    ),
+                    ft.Row(
+                        controls=[
+                            ft.Icon(
+                                name=ft.icons.CHECK_CIRCLE if ebook.get("is_read") else ft.icons.RADIO_BUTTON_UNCHECKED,
+                                color="#10B981" if ebook.get("is_read") else "#D1D5DB",
+                                size=16
+                            ),
+                            ft.Text(
+                                "Completed" if ebook.get("is_read") else "In Progress",
+                                size=11,
+                                color="#10B981" if ebook.get("is_read") else "#6B7280"
+                            )
+                        ],
+                        spacing=4,
+                        vertical_alignment=ft.CrossAxisAlignment.CENTER
+                    )
+                ] + ([self._trash_actions(ebook.get("filename"))] if is_deleted else []),
+                spacing=4,
+                tight=True
+            ),
+            bgcolor="transparent",
+            border_radius=8,
+            padding=ft.padding.all(12),
+            ink=not is_deleted,
+            # Sách trong thùng rác chỉ khôi phục hoặc xoá hẳn, không mở để đọc
+            on_click=None if is_deleted else (lambda name: lambda e: self.main_content.display_content(name))(
+                ebook.get("filename")
+            ),
+            animate=ft.Animation(150, ft.AnimationCurve.EASE_OUT),
+            on_hover=self._on_book_hover,
+            border=ft.border.all(1, "#E5E7EB")
+        )
+
+    def _sync_book_tiles(self):
+        # Chỉ dựng lại các ô có dữ liệu hiển thị thay đổi kể từ lần trước
+        revision = self.data_manager.revision
+        if revision == self._tiles_revision:
+            return
+        self._tiles_revision = revision
+        # Ô của sách đã bị gỡ hẳn khỏi thư viện hoặc vừa vào/ra thùng rác đều được dựng lại
+        for filename, (signature, _) in list(self._book_tiles.items()):
+            ebook = self.data_manager.record(filename)
+            if ebook is None or self._tile_signature(ebook) != signature:
+                del self._book_tiles[filename]
+
+    def _book_tile(self, filename):
+        cached = self._book_tiles.get(filename)
+        if cached is None:
+            ebook = self.data_manager.record(filename)
+            cached = (self._tile_signature(ebook), self._build_book_tile(ebook))
+            self._book_tiles[filename] = cached
+        return cached[1]
+
+    def _update_authors(self):
+        revision = self.data_manager.revision
+        if revision == self._authors_revision:
+            return
+        self._authors_revision = revision
+        authors = self.data_manager.facet_counts("author")
+        self.author_picker.options = [ft.dropdown.Option(self.ALL_AUTHORS, "All authors")] + [
+            ft.dropdown.Option(author, f"{author} ({count})") for author, count in authors
+        ]
+        if self.author_picker.value not in {author for author, _ in authors}:
+            # Tác giả đang lọc không còn sách nào: quay về tất cả
+            self.author_picker.value = self.ALL_AUTHORS
+            if self.main_content.author is not None:
+                self.main_content.set_browse(self.main_content.sort, None)
+
+    @traced("sidebar.update_ebook_list", "ui")
+    def update_ebook_list(self):
+        self._sync_book_tiles()
+        self._update_authors()
+        self._list_total = self.data_manager.query_count(
+            self.selected_menu, self.main_content.sort, author=self.main_content.author
+        )
+        records = self.data_manager.query(
+            self.selected_menu, self.main_content.sort, limit=self._list_limit, author=self.main_content.author
+        )
+        tiles = [self._book_tile(r.filename) for r in records]
+        if tiles != self.ebook_list.controls:
+            self.ebook_list.controls = tiles
+
+    def _reset_list_page(self):
+        self._list_limit = LIST_PAGE_SIZE
+        if self.ebook_list.page is not None:
+            self.ebook_list.scroll_to(offset=0)
+
+    def _on_list_scroll(self, e):
+        # Nạp thêm một trang ô sách khi cuộn gần cuối danh sách
+        if self._list_limit >= self._list_total:
+            return
+        if e.pixels >= e.max_scroll_extent - e.viewport_dimension:
+            self._list_limit += LIST_PAGE_SIZE
+            self.update_ebook_list()
+            request_update(self.batcher, self.ebook_list)
+
+    def _restore(self, filename):
+        if self.data_manager.restore_ebook(filename):
+            self.index_books([filename])
+            self.refresh()
+            self.main_content.update_grid()
+            self.main_content.notify_library_changed()
+
+    def _delete_forever(self, filenames):
+        if filenames:
+            self.main_content.compact_library(filenames)
+
+    def _empty_trash(self):
+        self._delete_forever(self.data_manager.filenames("deleted"))
+
+    def _on_browse_change(self, e):
+        # Sắp xếp và lọc tác giả áp dụng chung cho danh sách bên này và lưới sách
+        self.main_content.set_browse(
+            self.sort_picker.value or "library",
+            self.author_picker.value or None,
+        )
+        self._reset_list_page()
+        self.update_ebook_list()
+        request_update(self.batcher, self.widget)
 
     def _on_book_hover(self, e):
         if e.data == "true":
@@ -220,34 +365,76 @@ class Sidebar:
         else:
             e.control.bgcolor = "transparent"
             e.control.border = ft.border.all(1, "#E5E7EB")
-        e.control.update()
+        request_update(self.batcher, e.control)
 
     def handle_file_picked(self, e: ft.FilePickerResultEvent):
         if e.files:
-            file_path = e.files[0].path
-            file_name = os.path.basename(file_path)
-            dest_path = os.path.join("ebooks", file_name)
-
-            # Sao chép file
-            FileHandler.copy_file(file_path, dest_path)
-
-            # Cập nhật danh sách
-            ebooks = self.data_manager.load_ebooks()
-            if not any(e.get("filename") == file_name for e in ebooks):
-                ebooks.append(
-                    {
-                        "filename": file_name,
-                        "title": file_name.replace('.txt', '').replace('.epub', ''),
-                        "author": "Unknown Author",
-                        "is_read": False,
-                        "is_favorite": False,
-                        "is_deleted": False,
-                        "last_read": None,
-                    }
-                )
-                self.data_manager.save_ebooks(ebooks)
-                self.update_ebook_list()
-                self.main_content.update_grid()
-
-            # Hiển thị nội dung
-            self.main_content.display_content(file_name)
\ No newline at end of file
+            paths = [f.path for f in e.files]
+        elif e.path:
+            # Kết quả của get_directory_path: nhập cả thư mục
+            paths = [e.path]
+        else:
+            return
+        self._set_importing(True)
+        self.task_runner.submit(
+            f"import:{paths[0]}",
+            self.importer.import_paths,
+            paths,
+            on_progress=self._on_import_progress,
+            on_done=self._on_files_imported,
+            on_error=self._on_import_failed,
+        )
+
+    def _set_importing(self, importing):
+        self.import_progress.visible = importing
+        self.import_progress.value = 0 if importing else None
+        request_update(self.batcher, self.import_progress)
+
+    def _on_import_progress(self, done, total):
+        # Chỉ đẩy khoảng 100 lần cập nhật lên client dù nhập hàng nghìn file
+        if done == total or done % max(1, total // 100) == 0:
+            self.import_progress.value = done / total
+            request_update(self.batcher, self.import_progress)
+
+    def _on_files_imported(self, result):
+        added, file_names = result
+        self._set_importing(False)
+        if added:
+            self.refresh()
+            self.main_content.update_grid()
+            self.main_content.refresh_covers()
+            self.main_content.notify_library_changed()
+        self.index_books(file_names)
+
+        # Hiển thị nội dung khi chỉ nhập một cuốn
+        if len(file_names) == 1:
+            self.main_content.display_content(file_names[0])
+
+    def on_files_synced(self, result):
+        # LibraryWatcher: sách được chép vào/xoá khỏi thư mục sách bên ngoài ứng dụng, một lần mỗi lô
+        added, changed, removed = result
+        self.main_content.notify_library_changed()
+        search_index = self.main_content.search_index
+        if search_index is not None:
+            for file_name in removed:
+                search_index.remove_book(file_name)
+        self.refresh()
+        self.main_content.on_books_removed(removed)
+        self.main_content.update_grid()
+        if added or changed:
+            self.main_content.refresh_covers()
+            self.index_books(added + changed)
+
+    def index_books(self, file_names):
+        # Cập nhật chỉ mục tìm kiếm ở nền; sách không đổi sẽ được bỏ qua
+        search_index = self.main_content.search_index
+        if search_index is not None and file_names:
+            self.task_runner.submit(
+                f"index:{file_names[0]}",
+                search_index.index_books,
+                list(file_names),
+            )
+
+    def _on_import_failed(self, exc):
+        self._set_importing(False)
+        print(f"Error importing books: {exc}")
@@ -0,0 +1,71 @@
+import functools
+import unicodedata
+
+# Bảng chữ cái tiếng Việt theo thứ tự từ điển; f, j, w, z xen vào đúng chỗ của bảng Latin
+ALPHABET = (
+    "a", "ă", "â", "b", "c", "d", "đ", "e", "ê", "f", "g", "h", "i", "j", "k", "l", "m", "n",
+    "o", "ô", "ơ", "p", "q", "r", "s", "t", "u", "ư", "v", "w", "x", "y", "z",
+)
+# Dấu thanh xếp theo thứ tự ngang, huyền, hỏi, ngã, sắc, nặng (khoá phụ, chỉ dùng khi phần chữ trùng)
+TONES = {"\u0300": "1", "\u0309": "2", "\u0303": "3", "\u0301": "4", "\u0323": "5"}
+# Dấu mũ, dấu trăng và dấu móc thuộc về chữ cái (ă, â, ê, ô, ơ, ư), không phải dấu thanh
+_LETTER_MARKS = ("\u0306", "\u0302", "\u031b")
+# Chữ cái được đổi sang vùng Private Use: đứng sau số và dấu câu, giữ đúng thứ tự bảng chữ cái
+_LETTER_BASE = 0xE000
+_PRIMARY = {letter: chr(_LETTER_BASE + rank) for rank, letter in enumerate(ALPHABET)}
+# Từ chỉ gồm ASCII (số, từ không dấu) không cần tách dấu: đổi chữ cái bằng str.translate
+_ASCII_TABLE = str.maketrans({letter: mapped for letter, mapped in _PRIMARY.items() if letter.isascii()})
+# Ngăn cách các phần của khoá; nhỏ hơn mọi ký tự in được nên chuỗi ngắn hơn đứng trước
+SEPARATOR = "\x00"
+
+
+@functools.lru_cache(maxsize=8192)
+def sort_key(text):
+    """Khoá so sánh chuỗi theo thứ tự từ điển tiếng Việt: "an" < "ăn" < "ân" < "anh", "ma" < "mà" < "má".
+
+    Trả về một chuỗi (so sánh và lưu gọn hơn tuple): phần chữ cái, SEPARATOR, rồi dấu thanh của từng chữ.
+    """
+    if not text:
+        return ""
+    # Tên sách lặp lại rất nhiều từ: khoá được tính và cache theo từng từ
+    words = [_word_key(word) for word in text.casefold().split()]
+    return " ".join(primary for primary, _ in words) + SEPARATOR + "".join(tones for _, tones in words)
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_key(word):
+    if word.isascii():
+        return word.translate(_ASCII_TABLE), "0" * len(word)
+    primary = []
+    tones = []
+    letter = None
+    tone = "0"
+    for char in unicodedata.normalize("NFD", word):
+        if char in _LETTER_MARKS and letter is not None:
+            letter += char
+            continue
+        if char in TONES and letter is not None:
+            tone = TONES[char]
+            continue
+        if unicodedata.combining(char):
+            # Dấu lạ (hoặc dấu đứng đầu từ): bỏ qua
+            continue
+        if letter is not None:
+            primary.append(_primary(letter))
+            tones.append(tone)
+        letter = char
+        tone = "0"
+    if letter is not None:
+        primary.append(_primary(letter))
+        tones.append(tone)
+    return "".join(primary), "".join(tones)
+
+
+def _primary(letter):
+    if len(letter) == 1:
+        return _PRIMARY.get(letter, letter)
+    mapped = _PRIMARY.get(unicodedata.normalize("NFC", letter))
+    if mapped is not None:
+        return mapped
+    # Chữ Latin có dấu mũ/móc không thuộc tiếng Việt: xếp như chữ gốc
+    return _PRIMARY.get(letter[0], letter[0])
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+from src.utils.importer import OBJECTS_DIR, SUPPORTED_EXTENSIONS
+
+# Sách nằm trong thùng rác chừng này ngày thì bị xoá hẳn
+TRASH_RETENTION_DAYS = 30
+# Blob mới ghi có thể đang chờ BookImporter tạo hard link: chưa được coi là mồ côi
+OBJECT_GRACE_SECONDS = 3600
+
+# Mỗi lúc chỉ một lượt compaction trong tiến trình (các phiên web dùng chung thư viện)
+_compact_lock = threading.Lock()
+
+
+class Compactor:
+    """Dọn thùng rác ở nền: xoá hẳn bản ghi, file sách, cache nội dung, ảnh bìa và chỉ mục tìm kiếm,
+    rồi ghi lại storage cho gọn để kích thước và thời gian nạp thư viện chỉ tỉ lệ với sách còn dùng.
+    """
+
+    def __init__(self, data_manager, ebook_dir="ebooks", content_cache=None, cover_cache=None, search_index=None,
+                 retention_days=TRASH_RETENTION_DAYS):
+        self.data_manager = data_manager
+        self.ebook_dir = ebook_dir
+        self.content_cache = content_cache
+        self.cover_cache = cover_cache
+        self.search_index = search_index
+        self.retention_days = retention_days
+
+    def run(self):
+        """Xoá hẳn các sách quá hạn trong thùng rác; trả về thống kê (dict)."""
+        return self.purge(self.data_manager.expired_deleted(self.retention_days))
+
+    def purge(self, filenames):
+        """Xoá hẳn các sách đã nằm trong thùng rác (chỉ sách có is_deleted)."""
+        with _compact_lock:
+            # Một lần lấy cả thùng rác thay vì hỏi DataManager từng sách
+            trash = {r.filename: r for r in self.data_manager.records("deleted")}
+            victims = [
+                (filename, trash[filename].fingerprint, trash[filename].cover)
+                for filename in dict.fromkeys(filenames)
+                if filename in trash
+            ]
+            stats = {"records": 0, "files": 0, "objects": 0, "bytes": 0}
+            if not victims:
+                return stats
+            # Gỡ bản ghi trước rồi mới xoá file, để watcher thư mục không phải gỡ lại lần nữa
+            stats["records"] = self.data_manager.remove_ebooks([f for f, _, _ in victims])
+            live = self.data_manager.records("all") + self.data_manager.records("deleted")
+            fingerprints = {r.fingerprint for r in live if r.fingerprint}
+            covers = {r.cover for r in live if r.cover}
+            for filename, fingerprint, cover in victims:
+                stats["bytes"] += self._remove_file(os.path.join(self.ebook_dir, filename), stats, "files")
+                if self.search_index is not None:
+                    self.search_index.remove_book(filename)
+                # Nội dung/ảnh bìa trùng với một sách còn lại thì giữ
+                if fingerprint and fingerprint not in fingerprints and self.content_cache is not None:
+                    stats["bytes"] += self.content_cache.discard(fingerprint)
+                if cover and cover not in covers and self.cover_cache is not None:
+                    stats["bytes"] += self.cover_cache.discard(cover)
+            self._purge_objects(fingerprints, stats)
+            self.data_manager.compact()
+            return stats
+
+    @staticmethod
+    def _remove_file(path, stats, counter):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        stats[counter] += 1
+        return size
+
+    def _purge_objects(self, fingerprints, stats):
+        # Blob trong kho .objects không còn sách nào trỏ tới (không còn hard link, không còn bản ghi)
+        objects_dir = os.path.join(self.ebook_dir, OBJECTS_DIR)
+        try:
+            entries = list(os.scandir(objects_dir))
+        except OSError:
+            return
+        now = time.time()
+        for entry in entries:
+            fingerprint, ext = os.path.splitext(entry.name)
+            # File tạm .tmp của một lượt nhập đang chạy cũng bị bỏ qua ở đây
+            if ext.lower() not in SUPPORTED_EXTENSIONS or fingerprint in fingerprints:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if st.st_nlink > 1 or now - st.st_mtime < OBJECT_GRACE_SECONDS:
+                continue
+            stats["bytes"] += self._remove_file(entry.path, stats, "objects")
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+# Tăng khi định dạng nội dung đã xử lý thay đổi để bỏ qua cache cũ
+PARSER_VERSION = 2
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+HOT_ENTRIES = 64
+HASH_CHUNK = 1024 * 1024
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _hash_lock:
+        digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _hash_lock:
+            _hash_memo[memo_key] = digest
+    return digest
+
+
+class ContentCache:
+    """Cache nội dung đã xử lý trên đĩa (nén zlib), khoá theo hash nội dung + PARSER_VERSION."""
+
+    def __init__(self, cache_dir, max_bytes=MAX_CACHE_BYTES, hot_entries=HOT_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()
+        self._entries = None
+        self._total = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key_for(self, path, fingerprint=None):
+        return f"{fingerprint or file_hash(path)}-v{PARSER_VERSION}"
+
+    def _path(self, key, name):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{name}.z")
+
+    def _scan(self):
+        # Dựng bảng kích thước các entry một lần, sau đó được cập nhật dần
+        if self._entries is not None:
+            return
+        self._entries = {}
+        self._total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".z"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    self._entries[path] = (st.st_mtime_ns, st.st_size)
+                    self._total += st.st_size
+
+    def get(self, key, name):
+        with self._lock:
+            data = self._hot.get((key, name))
+            if data is not None:
+                self._hot.move_to_end((key, name))
+                return data
+        path = self._path(key, name)
+        # Eviction ở luồng khác có thể xoá file bất cứ lúc nào: đọc, utime và stat đều coi như cache miss nếu lỗi
+        try:
+            with open(path, "rb") as f:
+                data = zlib.decompress(f.read())
+            os.utime(path)
+            mtime_ns = os.stat(path).st_mtime_ns
+        except (OSError, zlib.error):
+            return None
+        with self._lock:
+            if self._entries is not None and path in self._entries:
+                self._entries[path] = (mtime_ns, self._entries[path][1])
+            self._remember(key, name, data)
+        return data
+
+    def put(self, key, name, data):
+        path = self._path(key, name)
+        payload = zlib.compress(data, 6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, name, data)
+            self._scan()
+            old = self._entries.get(path)
+            if old is not None:
+                self._total -= old[1]
+            self._entries[path] = (os.stat(path).st_mtime_ns, len(payload))
+            self._total += len(payload)
+            self._evict()
+
+    def get_json(self, key, name):
+        data = self.get(key, name)
+        return json.loads(data) if data is not None else None
+
+    def put_json(self, key, name, value):
+        self.put(key, name, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def discard(self, fingerprint):
+        """Xoá mọi entry của một nội dung (mọi PARSER_VERSION); trả về số byte đã giải phóng."""
+        prefix = f"{fingerprint}-v"
+        directory = os.path.join(self.cache_dir, fingerprint[:2])
+        freed = 0
+        try:
+            names = [n for n in os.listdir(directory) if n.startswith(prefix)]
+        except OSError:
+            names = []
+        with self._lock:
+            for key_name in [k for k in self._hot if k[0].startswith(prefix)]:
+                del self._hot[key_name]
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue
+                freed += size
+                if self._entries is not None and path in self._entries:
+                    self._total -= self._entries.pop(path)[1]
+        return freed
+
+    def _remember(self, key, name, data):
+        self._hot[(key, name)] = data
+        self._hot.move_to_end((key, name))
+        while len(self._hot) > self.hot_entries:
+            self._hot.popitem(last=False)
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        for path, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del self._entries[path]
+            self._total -= size
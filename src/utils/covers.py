@@ -0,0 +1,217 @@
+import hashlib
+import importlib.util
+import io
+import os
+import tempfile
+import threading
+
+# Kích thước thumbnail cố định của thẻ sách trong lưới
+THUMB_SIZES = {"grid": (200, 280)}
+THUMB_QUALITY = 85
+MAX_COVER_BYTES = 16 * 1024 * 1024
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+COVER_CHUNKSIZE = 8
+# Giá trị "cover" trong record khi sách không có ảnh bìa, để không phải mở lại mỗi lần
+NO_COVER = ""
+
+# Mỗi lúc chỉ một lượt trích ảnh bìa trong tiến trình; các phiên web đến sau chờ rồi thấy _missing() đã rỗng
+_extract_lock = threading.Lock()
+
+
+def pillow_available():
+    # Pillow là phụ thuộc tuỳ chọn: không có thì lưới giữ nền gradient
+    return importlib.util.find_spec("PIL") is not None
+
+
+def find_cover_href(book):
+    """Tìm ảnh bìa trong manifest: properties="cover-image" (EPUB3), rồi <meta name="cover"> (EPUB2)."""
+    images = {i: item for i, item in book.manifest.items() if item["media_type"].startswith("image/")}
+    for item in images.values():
+        if "cover-image" in item["properties"]:
+            return item["href"]
+    cover_id = book.metadata.get("cover")
+    if cover_id in images:
+        return images[cover_id]["href"]
+    for item_id, item in images.items():
+        if "cover" in item_id.lower() or "cover" in os.path.basename(item["href"]).lower():
+            return item["href"]
+    return None
+
+
+def make_thumbnails(data, cover_dir):
+    from PIL import Image
+
+    key = hashlib.sha256(data).hexdigest()
+    cache = CoverCache(cover_dir)
+    if all(os.path.exists(cache.path_for(key, size)) for size in THUMB_SIZES):
+        return key
+    with Image.open(io.BytesIO(data)) as image:
+        largest = max(THUMB_SIZES.values())
+        # Với JPEG, draft() giải mã thẳng ở độ phân giải nhỏ hơn thay vì cả ảnh gốc
+        image.draft("RGB", largest)
+        image = image.convert("RGB")
+        for size_name, size in THUMB_SIZES.items():
+            thumb = image.copy()
+            thumb.thumbnail(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumb.save(buffer, "JPEG", quality=THUMB_QUALITY, optimize=True)
+            cache.put(key, size_name, buffer.getvalue())
+    return key
+
+
+def extract_cover(epub_path, cover_dir):
+    # Hàm cấp module để chạy trong ProcessPoolExecutor; trả về khoá nội dung của ảnh bìa hoặc NO_COVER
+    from src.utils.epub_book import EpubBook
+
+    try:
+        with EpubBook(epub_path) as book:
+            href = find_cover_href(book)
+            if href is None:
+                return NO_COVER
+            data = book.read_item(href)
+        if not data or len(data) > MAX_COVER_BYTES:
+            return NO_COVER
+        return make_thumbnails(data, cover_dir)
+    except KeyError:
+        # Manifest trỏ tới ảnh không có trong zip
+        return NO_COVER
+    except Exception as e:
+        print(f"Error extracting cover from {epub_path}: {e}")
+        return NO_COVER
+
+
+class CoverCache:
+    """Thumbnail ảnh bìa trên đĩa, đánh địa chỉ theo SHA-256 của ảnh gốc; xoá file dùng lâu nhất khi vượt dung lượng."""
+
+    def __init__(self, cover_dir, max_bytes=MAX_CACHE_BYTES):
+        self.cover_dir = cover_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cover_dir, exist_ok=True)
+
+    def path_for(self, key, size_name="grid"):
+        return os.path.join(self.cover_dir, key[:2], f"{key}-{size_name}.jpg")
+
+    def get(self, key, size_name="grid"):
+        if not key:
+            return None
+        path = self.path_for(key, size_name)
+        try:
+            # Cập nhật mtime để eviction giữ lại các ảnh bìa vừa được hiển thị
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, size_name, data):
+        path = self.path_for(key, size_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def discard(self, key):
+        """Xoá thumbnail của một ảnh bìa; trả về số byte đã giải phóng."""
+        freed = 0
+        if not key:
+            return freed
+        for size_name in THUMB_SIZES:
+            path = self.path_for(key, size_name)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            freed += size
+        return freed
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cover_dir):
+                for name in files:
+                    if not name.endswith(".jpg"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, path))
+                    total += st.st_size
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
+
+
+class CoverExtractor:
+    def __init__(self, data_manager, cover_cache, ebook_dir="ebooks", workers=None):
+        self.data_manager = data_manager
+        self.cover_cache = cover_cache
+        self.ebook_dir = ebook_dir
+        self.workers = workers
+
+    def _missing(self):
+        # Chỉ các EPUB chưa từng được trích ảnh bìa: không stat/utime thumbnail của cả thư viện mỗi lượt.
+        # Thumbnail bị eviction được dựng lại khi thẻ của sách sắp hiện (rebuild)
+        return [
+            ebook.filename for ebook in self.data_manager.records("all")
+            if ebook.filename.lower().endswith(".epub") and ebook.get("cover") is None
+        ]
+
+    def _evicted(self, filenames):
+        evicted = []
+        for filename in filenames:
+            ebook = self.data_manager.record(filename)
+            key = ebook.get("cover") if ebook is not None else None
+            if key and not os.path.exists(self.cover_cache.path_for(key)):
+                evicted.append(filename)
+        return evicted
+
+    def _extract_all(self, paths):
+        cover_dir = self.cover_cache.cover_dir
+        if len(paths) == 1:
+            return [extract_cover(paths[0], cover_dir)]
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(extract_cover, paths, [cover_dir] * len(paths), chunksize=COVER_CHUNKSIZE))
+        except (BrokenProcessPool, OSError):
+            return [extract_cover(p, cover_dir) for p in paths]
+
+    def extract_missing(self):
+        """Trích ảnh bìa cho các EPUB chưa có thumbnail; trả về danh sách filename đã cập nhật."""
+        return self._extract(self._missing)
+
+    def rebuild(self, filenames):
+        """Dựng lại thumbnail đã bị eviction của các sách sắp hiển thị; trả về danh sách filename đã cập nhật."""
+        return self._extract(lambda: self._evicted(filenames))
+
+    def _extract(self, select):
+        if not pillow_available():
+            return []
+        with _extract_lock:
+            missing = select()
+            if not missing:
+                return []
+            paths = [os.path.join(self.ebook_dir, f) for f in missing]
+            keys = self._extract_all(paths)
+            updated = []
+            for filename, key in zip(missing, keys):
+                # Thumbnail được dựng lại sau eviction giữ nguyên khoá nhưng thẻ vẫn cần vẽ lại
+                if self.data_manager.set_cover(filename, key) or key:
+                    updated.append(filename)
+            self.cover_cache.evict()
+            return updated
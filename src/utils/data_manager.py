@@ -1,75 +1,702 @@
-import json
-import os
+import bisect
+import datetime
+import functools
+import itertools
+import operator
+import threading
+import time
+from array import array
+
+from src.utils.collation import SEPARATOR, sort_key
+from src.utils.journal import Journal
+from src.utils.records import DELETED, FAVORITE, READ, Record, to_epoch
+from src.utils.storage import open_storage
+from src.utils.tracing import span, traced
+
+# Thay đổi được gom lại và ghi xuống storage sau khoảng trễ này (giây)
+FLUSH_DELAY = 2.0
+JOURNAL_SUFFIX = ".journal"
+# Giá trị ban đầu của _stamp: khác mọi stamp của storage (kể cả None khi file JSON chưa tồn tại),
+# để lần truy cập đầu luôn nạp thư viện và phát lại journal
+_UNLOADED = object()
+
+# Bảng dịch byte cờ -> 1 nếu sách thuộc view, 0 nếu không
+_VIEW_TABLES = {
+    view: bytes(int(bool(test(flags))) for flags in range(256))
+    for view, test in (
+        ("all", lambda f: not f & DELETED),
+        ("read", lambda f: f & READ and not f & DELETED),
+        ("favorite", lambda f: f & FAVORITE and not f & DELETED),
+        ("deleted", lambda f: f & DELETED),
+    )
+}
+_BIT_TABLES = {bit: bytes(int(bool(flags & bit)) for flags in range(256)) for bit in (READ, FAVORITE)}
+
+
+
+def _entry_filename(entry):
+    # Sách mà một mục journal ("add" hoặc "update") thay đổi
+    if entry.get("op") == "add":
+        return entry.get("ebook", {}).get("filename")
+    return entry.get("filename")
+
+
+# Các kiểu sắp xếp của query(); "library" là thứ tự thêm vào thư viện
+SORTS = ("library", "title", "author", "last_read")
+# Field có chỉ mục facet: giá trị -> vị trí các sách chưa xoá mang giá trị đó
+FACETS = ("author", "language")
+# Số kết quả query() được giữ lại cho tới lần thay đổi thư viện kế tiếp
+QUERY_CACHE_SIZE = 32
+# last_read sắp giảm dần: khoá là (_NEVER_READ - epoch), sách chưa đọc mang _NEVER_READ nên đứng cuối
+_NEVER_READ = 10 ** 13 - 1
+
+
+def _title_key(record):
+    return sort_key(record.title or record.filename)
+
+
+def _order_key(sort, record):
+    # Khoá duy nhất cho mỗi sách (luôn kết thúc bằng filename) để bisect tìm đúng phần tử khi gỡ ra
+    if sort == "title":
+        key = _title_key(record)
+    elif sort == "author":
+        # Sách không rõ tác giả xếp cuối, trong cùng tác giả xếp theo tên sách
+        key = ("0" + sort_key(record.author) if record.author else "1") + SEPARATOR + _title_key(record)
+    else:
+        read = _NEVER_READ - record.last_read if record.last_read is not None else _NEVER_READ
+        key = f"{read:013d}"
+    return key + SEPARATOR + record.filename
+
+
+def _build_order(sort, records):
+    with span("data_manager.sort", "data") as current:
+        pairs = sorted((_order_key(sort, r), r.pos) for r in records)
+        current.set(sort=sort, size=len(pairs))
+    return [key for key, _ in pairs], array("q", [pos for _, pos in pairs])
+
+
+def synchronized(fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return fn(self, *args, **kwargs)
+
+    return wrapper
 
 
 class DataManager:
-    def __init__(self, json_file):
+    def __init__(self, json_file, storage=None, journal=None):
         self.json_file = json_file
+        self.storage = storage if storage is not None else open_storage(json_file)
+        self.journal = journal if journal is not None else Journal(json_file + JOURNAL_SUFFIX)
+        # Tăng sau mỗi thay đổi để UI biết khi nào cần dựng lại
+        self._revision = 0
+        # Bản sao trong bộ nhớ của thư viện, chỉ đọc lại khi storage báo có thay đổi
+        self._stamp = _UNLOADED
+        # Bản ghi gọn (Record) theo thứ tự thư viện, kèm hai cột song song: filename và byte cờ.
+        # Lọc theo view là một lần bytearray.translate + itertools.compress, đều chạy trong C
+        self._records = []
+        self._names = []
+        self._flags = bytearray()
+        self._by_filename = {}
+        self._by_fingerprint = {}
+        # last_read (epoch) của các sách chưa xoá đã từng đọc, luôn được sắp xếp, kèm vị trí sách tương ứng
+        self._recent_ts = array("q")
+        self._recent_pos = array("q")
+        # Thứ tự sắp xếp dựng lúc cần lần đầu rồi cập nhật từng sách: sort -> (khoá đã sắp, vị trí tương ứng)
+        self._orders = {}
+        # Chỉ mục facet: field -> giá trị -> set vị trí (chỉ sách chưa xoá)
+        self._facets = {field: {} for field in FACETS}
+        # Kết quả query() (danh sách vị trí) của revision hiện tại, để lật trang chỉ còn là cắt lát
+        self._queries = {}
+        self._queries_revision = None
+        # Thay đổi đã ghi vào journal nhưng chưa xuống storage: filename -> các field đã đổi
+        self._pending = {}
+        # Một khoá cho cả chỉ mục lẫn journal: nhiều phiên web và timer flush dùng chung một DataManager
+        self._lock = threading.RLock()
+        self._flush_timer = None
+        self._recovered = False
 
-    def load_ebooks(self):
-        if os.path.exists(self.json_file):
+    @traced("data_manager.preload", "data")
+    @synchronized
+    def preload(self):
+        """Đọc thư viện vào bộ nhớ; gọi từ luồng nền lúc khởi động để UI không phải chờ."""
+        self._ensure_loaded()
+        return self.count_all()
+
+    @property
+    @synchronized
+    def revision(self):
+        self._ensure_loaded()
+        return self._revision
+
+    def _ensure_loaded(self):
+        stamp = self.storage.stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            with span("data_manager.reload", "data") as current:
+                self._build_index(self.storage.load())
+                current.set(size=len(self._records))
+            if not self._recovered:
+                self._recovered = True
+                self._recover()
+            with self._lock:
+                pending = {f: dict(c) for f, c in self._pending.items()}
+            # Storage được đọc lại: áp lại các thay đổi chưa kịp ghi xuống
+            for filename, changes in pending.items():
+                if self._apply(filename, changes) is None and "filename" in changes:
+                    # Sách mới thêm, chưa có trong storage
+                    self._insert(changes)
+
+    def _recover(self):
+        # Phát lại journal còn sót từ lần chạy trước (ứng dụng bị tắt trước khi kịp flush)
+        entries = self.journal.replay()
+        if not entries:
+            return
+        with self._lock:
+            for entry in entries:
+                if entry.get("op") == "add":
+                    ebook = entry["ebook"]
+                    self._insert(ebook)
+                    self._pending.setdefault(ebook["filename"], {}).update(ebook)
+                elif entry.get("op") == "update":
+                    filename = entry["filename"]
+                    if self._apply(filename, entry["changes"]) is not None:
+                        self._pending.setdefault(filename, {}).update(entry["changes"])
+            self._revision += 1
+            self.flush()
+
+    def _build_index(self, ebooks):
+        records = []
+        seen = set()
+        for ebook in ebooks:
+            filename = ebook.get("filename")
+            if filename is None or filename in seen:
+                continue
+            seen.add(filename)
+            records.append(Record.from_dict(ebook))
+        self._reindex(records)
+
+    def _reindex(self, records):
+        self._revision += 1
+        self._records = []
+        self._names = []
+        self._flags = bytearray()
+        self._by_filename = {}
+        self._by_fingerprint = {}
+        self._orders = {}
+        self._facets = {field: {} for field in FACETS}
+        recent = []
+        for record in records:
+            filename = record.filename
+            record.pos = len(self._records)
+            self._records.append(record)
+            self._names.append(filename)
+            self._flags.append(record.flags)
+            self._by_filename[filename] = record
+            if record.fingerprint:
+                self._by_fingerprint.setdefault(record.fingerprint, filename)
+            if not record.flags & DELETED:
+                self._facet_add(record)
+                if record.last_read is not None:
+                    recent.append((record.last_read, record.pos))
+        recent.sort()
+        self._recent_ts = array("q", [ts for ts, _ in recent])
+        self._recent_pos = array("q", [pos for _, pos in recent])
+
+    def _unindex(self, record):
+        filename = record.filename
+        if self._by_fingerprint.get(record.fingerprint) == filename:
+            del self._by_fingerprint[record.fingerprint]
+        for sort, (keys, positions) in self._orders.items():
+            i = bisect.bisect_left(keys, _order_key(sort, record))
+            del keys[i]
+            del positions[i]
+        if not record.flags & DELETED:
+            self._facet_remove(record)
+        if not record.flags & DELETED and record.last_read is not None:
+            i = bisect.bisect_left(self._recent_ts, record.last_read)
+            while i < len(self._recent_ts) and self._recent_ts[i] == record.last_read:
+                if self._recent_pos[i] == record.pos:
+                    del self._recent_ts[i]
+                    del self._recent_pos[i]
+                    break
+                i += 1
+
+    def _index(self, record):
+        filename = record.filename
+        if record.fingerprint:
+            self._by_fingerprint.setdefault(record.fingerprint, filename)
+        self._flags[record.pos] = record.flags
+        for sort, (keys, positions) in self._orders.items():
+            key = _order_key(sort, record)
+            i = bisect.bisect_left(keys, key)
+            keys.insert(i, key)
+            positions.insert(i, record.pos)
+        if not record.flags & DELETED:
+            self._facet_add(record)
+        if not record.flags & DELETED and record.last_read is not None:
+            i = bisect.bisect_right(self._recent_ts, record.last_read)
+            self._recent_ts.insert(i, record.last_read)
+            self._recent_pos.insert(i, record.pos)
+
+    def _facet_add(self, record):
+        for field in FACETS:
+            value = getattr(record, field)
+            if value:
+                self._facets[field].setdefault(value, set()).add(record.pos)
+
+    def _facet_remove(self, record):
+        for field in FACETS:
+            value = getattr(record, field)
+            positions = self._facets[field].get(value)
+            if positions is not None:
+                positions.discard(record.pos)
+                if not positions:
+                    del self._facets[field][value]
+
+    def _apply(self, filename, changes):
+        record = self._by_filename.get(filename)
+        if record is None:
+            return None
+        self._unindex(record)
+        record.update(changes)
+        self._index(record)
+        return record
+
+    def _insert(self, ebook):
+        filename = ebook.get("filename")
+        if filename is None or filename in self._by_filename:
+            return None
+        record = Record.from_dict(ebook)
+        record.pos = len(self._records)
+        self._records.append(record)
+        self._names.append(filename)
+        self._flags.append(record.flags)
+        self._by_filename[filename] = record
+        self._index(record)
+        return record
+
+    def _update(self, filename, **changes):
+        self._ensure_loaded()
+        ebook = self._apply(filename, changes)
+        if ebook is None:
+            return None
+        self._revision += 1
+        self._log({"op": "update", "filename": filename, "changes": changes}, filename, changes)
+        return ebook
+
+    def _log(self, entry, filename, changes):
+        # Ghi vào journal ngay, gộp thay đổi trong bộ nhớ và hẹn giờ ghi xuống storage
+        with self._lock:
             try:
-                with open(self.json_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                return []
-        return []
+                self.journal.append(entry)
+            except OSError as e:
+                print(f"Error writing journal: {e}")
+            self._pending.setdefault(filename, {}).update(changes)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
 
-    def save_ebooks(self, ebooks):
+    def _write(self, operation):
         try:
-            with open(self.json_file, "w", encoding="utf-8") as f:
-                json.dump(ebooks, f, indent=2, ensure_ascii=False)
+            operation()
         except Exception as e:
             print(f"Error saving ebooks: {e}")
+            return False
+        finally:
+            self._stamp = self.storage.stamp()
+        return True
+
+    @synchronized
+    def close(self):
+        self.flush()
+        self.journal.close()
+        self.storage.close()
+
+    @traced("data_manager.load_ebooks", "data", size=len)
+    @synchronized
+    def load_ebooks(self):
+        self._ensure_loaded()
+        return [r.to_dict() for r in self._records]
+
+    @traced("data_manager.save_ebooks", "data")
+    @synchronized
+    def save_ebooks(self, ebooks):
+        ebooks = [dict(e) for e in ebooks]
+        with self._lock:
+            self._build_index(ebooks)
+            self._cancel_flush()
+            self._pending = {}
+            if self._write(lambda: self.storage.save(self._records)):
+                self.journal.clear()
+
+    @synchronized
+    def get_ebook(self, filename):
+        self._ensure_loaded()
+        record = self._by_filename.get(filename)
+        return record.to_dict() if record is not None else None
+
+    @synchronized
+    def record(self, filename):
+        """Bản ghi gọn (chỉ đọc, không chép) của một sách; dùng cho UI thay vì get_ebook."""
+        self._ensure_loaded()
+        return self._by_filename.get(filename)
+
+    def add_ebook(self, ebook):
+        return self.add_ebooks([ebook]) == 1
 
+    @traced("data_manager.add_ebooks", "data")
+    @synchronized
+    def add_ebooks(self, ebooks):
+        # Cả lô được ghi xuống storage bằng một lần flush
+        self._ensure_loaded()
+        added = []
+        for ebook in ebooks:
+            record = self._insert(ebook)
+            if record is not None:
+                ebook = record.to_dict()
+                self._log({"op": "add", "ebook": ebook}, record.filename, ebook)
+                added.append(record)
+        if added:
+            self._revision += 1
+        return len(added)
+
+    @traced("data_manager.remove_ebooks", "data")
+    @synchronized
+    def remove_ebooks(self, filenames):
+        """Gỡ hẳn các bản ghi khỏi thư viện (file sách đã không còn); trả về số bản ghi đã gỡ."""
+        self._ensure_loaded()
+        removed = {f for f in filenames if f in self._by_filename}
+        if not removed:
+            return 0
+        # Ghi các thay đổi đang chờ trước, để journal không còn mục "add" làm sống lại sách vừa gỡ
+        flushed = self.flush()
+        gone = {self._by_filename[f].pos for f in removed}
+        kept = [r for r in self._records if r.pos not in gone]
+        # Vị trí dồn lên sau khi gỡ: giữ các thứ tự sắp xếp đã dựng thay vì sắp lại từ đầu
+        moved = {}
+        for new_pos, record in enumerate(kept):
+            moved[record.pos] = new_pos
+        orders = {
+            sort: (
+                [key for key, pos in zip(keys, positions) if pos not in gone],
+                array("q", [moved[pos] for pos in positions if pos not in gone]),
+            )
+            for sort, (keys, positions) in self._orders.items()
+        }
+        self._reindex(kept)
+        self._orders = orders
+        self._write(lambda: self.storage.delete_many(sorted(removed), self._records))
+        if not flushed:
+            self._forget(removed)
+        return len(removed)
+
+    def _forget(self, filenames):
+        # flush lỗi nên journal vẫn còn các mục của những sách vừa gỡ: bỏ chúng đi để replay không làm sách sống lại
+        self._pending = {f: c for f, c in self._pending.items() if f not in filenames}
+        try:
+            self.journal.rewrite(e for e in self.journal.replay() if _entry_filename(e) not in filenames)
+        except OSError as e:
+            print(f"Error writing journal: {e}")
+
+    @synchronized
+    def delete_ebook(self, filename):
+        """Chuyển sách vào thùng rác; file và dữ liệu phụ chỉ bị xoá khi compaction chạy sau hạn giữ."""
+        return self._update(filename, is_deleted=True, deleted_at=datetime.datetime.now().isoformat()) is not None
+
+    @synchronized
+    def restore_ebook(self, filename):
+        return self._update(filename, is_deleted=False, deleted_at=None) is not None
+
+    @synchronized
+    def expired_deleted(self, days):
+        """Các sách trong thùng rác quá days ngày.
+
+        Sách xoá từ bản cũ (không có deleted_at) được ghi deleted_at là lúc này: hạn giữ bắt đầu tính từ đây.
+        """
+        self._ensure_loaded()
+        cutoff = time.time() - days * 86400
+        now = datetime.datetime.now().isoformat()
+        expired = []
+        for record in self.records("deleted"):
+            deleted_at = to_epoch(record.get("deleted_at"))
+            if deleted_at is None:
+                self._update(record.filename, deleted_at=now)
+            elif deleted_at <= cutoff:
+                expired.append(record.filename)
+        return expired
+
+    @traced("data_manager.compact", "data")
+    @synchronized
+    def compact(self):
+        """Ghi lại storage ở dạng gọn sau khi đã gỡ bản ghi (JSON không thụt lề, SQLite VACUUM)."""
+        self._ensure_loaded()
+        self.flush()
+        return self._write(lambda: self.storage.compact(self._records))
+
+    @synchronized
+    def update_ebook(self, filename, **changes):
+        """Cập nhật metadata của một sách (ví dụ khi file trong thư mục sách bị thay nội dung)."""
+        return self._update(filename, **changes) is not None
+
+    def _recent_cutoff(self, days):
+        # Giữ nguyên ngữ nghĩa cũ: (now - last_read).days <= days
+        now = datetime.datetime.now()
+        return (now - datetime.timedelta(days=days + 1)).timestamp()
+
+    def _recent_filenames(self, days):
+        # Quét một đoạn liên tục của mảng đã sắp xếp, trả về theo thứ tự thư viện
+        i = bisect.bisect_right(self._recent_ts, self._recent_cutoff(days))
+        return [self._names[pos] for pos in sorted(self._recent_pos[i:])]
+
+    def _mask(self, view):
+        return self._flags.translate(_VIEW_TABLES.get(view, _VIEW_TABLES["all"]))
+
+    def _view_mask(self, view, days):
+        if view != "recent":
+            return self._mask(view)
+        mask = bytearray(len(self._records))
+        i = bisect.bisect_right(self._recent_ts, self._recent_cutoff(days))
+        for pos in self._recent_pos[i:]:
+            mask[pos] = 1
+        return mask
+
+    def _order(self, sort):
+        # Thứ tự sắp xếp của cả thư viện (kể cả sách đã xoá; view lọc sau), dựng một lần
+        order = self._orders.get(sort)
+        if order is None:
+            order = _build_order(sort, self._records)
+            self._orders[sort] = order
+        return order[1]
+
+    def prepare_sorts(self, sorts=SORTS[1:]):
+        """Dựng trước các thứ tự sắp xếp ở luồng nền để lần đổi cách sắp đầu tiên không phải chờ.
+
+        Khoá chỉ bị giữ lúc chụp danh sách sách và lúc gắn kết quả; nếu thư viện đổi giữa chừng thì bỏ.
+        """
+        for sort in sorts:
+            with self._lock:
+                self._ensure_loaded()
+                if sort in self._orders:
+                    continue
+                revision = self._revision
+                records = list(self._records)
+            order = _build_order(sort, records)
+            with self._lock:
+                if self._revision == revision and sort not in self._orders:
+                    self._orders[sort] = order
+
+    def _select(self, view, sort, author, language, days):
+        if self._queries_revision != self._revision or len(self._queries) >= QUERY_CACHE_SIZE:
+            self._queries = {}
+            self._queries_revision = self._revision
+        query = (view, sort, author, language, days)
+        positions = self._queries.get(query)
+        if positions is not None:
+            return positions
+        mask = self._view_mask(view, days)
+        # Chỉ mục facet không chứa sách đã xoá: thùng rác luôn hiện đủ, đúng những gì "Empty Trash" sẽ xoá
+        facets = [
+            self._facets[field].get(value, ())
+            for field, value in (("author", author), ("language", language))
+            if value is not None and view != "deleted"
+        ]
+        if facets:
+            # Có facet: chỉ duyệt các sách của facet nhỏ nhất rồi sắp riêng nhóm đó
+            smallest = min(facets, key=len)
+            positions = [p for p in smallest if mask[p] and all(p in other for other in facets)]
+            if sort == "library":
+                positions.sort()
+            else:
+                positions.sort(key=lambda p: _order_key(sort, self._records[p]))
+        elif sort == "library":
+            positions = list(itertools.compress(range(len(self._records)), mask))
+        else:
+            order = self._order(sort)
+            # Đảo mask theo thứ tự đã sắp bằng itemgetter (chạy trong C) rồi lọc một lượt
+            picked = operator.itemgetter(*order)(mask) if len(order) > 1 else tuple(mask[p] for p in order)
+            positions = list(itertools.compress(order, picked))
+        self._queries[query] = positions
+        return positions
+
+    @synchronized
+    def query(self, view="all", sort="library", offset=0, limit=None, author=None, language=None, days=7):
+        """Một trang Record của view, sắp theo sort và lọc theo facet (author, language; thùng rác bỏ qua facet).
+
+        Lần đầu của mỗi truy vấn sau một thay đổi là O(n) trong C; các trang tiếp theo chỉ là cắt lát O(k).
+        """
+        self._ensure_loaded()
+        positions = self._select(view, sort if sort in SORTS else "library", author, language, days)
+        end = None if limit is None else offset + limit
+        return [self._records[p] for p in positions[offset:end]]
+
+    @synchronized
+    def query_count(self, view="all", sort="library", author=None, language=None, days=7):
+        self._ensure_loaded()
+        return len(self._select(view, sort if sort in SORTS else "library", author, language, days))
+
+    @synchronized
+    def facet_counts(self, field, view="all", days=7):
+        """Số sách theo từng giá trị của một facet trong view, theo thứ tự từ điển tiếng Việt.
+
+        field là author/language, hoặc is_read/is_favorite (đếm trên cột cờ).
+        """
+        self._ensure_loaded()
+        mask = self._view_mask(view, days)
+        if field in ("is_read", "is_favorite"):
+            bit = READ if field == "is_read" else FAVORITE
+            flagged = bytes(itertools.compress(self._flags, mask)).translate(_BIT_TABLES[bit]).count(1)
+            return [(True, flagged), (False, mask.count(1) - flagged)]
+        counts = []
+        for value, positions in self._facets[field].items():
+            # Chỉ mục facet chỉ chứa sách chưa xoá: view "all" không cần duyệt mask
+            count = len(positions) if view == "all" else sum(mask[p] for p in positions)
+            if count:
+                counts.append((value, count))
+        counts.sort(key=lambda item: (sort_key(item[0]), item[0]))
+        return counts
+
+    @synchronized
+    def filenames(self, view="all", days=7):
+        self._ensure_loaded()
+        if view == "recent":
+            return self._recent_filenames(days)
+        return list(itertools.compress(self._names, self._mask(view)))
+
+    @synchronized
+    def records(self, view="all", days=7):
+        """Các Record của một view theo thứ tự thư viện, không chép ra dict."""
+        return [self._by_filename[n] for n in self.filenames(view, days)]
+
+    @traced("data_manager.list_ebooks", "data", size=len)
+    @synchronized
+    def list_ebooks(self, view="all", days=7):
+        return [self._by_filename[n].to_dict() for n in self.filenames(view, days)]
+
+    @traced("data_manager.counts", "data")
+    @synchronized
+    def counts(self, days=7):
+        return {
+            "all": self.count_all(),
+            "recent": self.count_recently_read(days),
+            "read": self.count_read(),
+            "favorite": self.count_favorite(),
+            "deleted": self.count_deleted(),
+        }
+
+    @synchronized
     def count_all(self):
-        return len([e for e in self.load_ebooks() if not e.get("is_deleted", False)])
+        self._ensure_loaded()
+        return self._mask("all").count(1)
 
+    @synchronized
     def count_read(self):
-        return len([
-            e for e in self.load_ebooks()
-            if e.get("is_read", False) and not e.get("is_deleted", False)
-        ])
+        self._ensure_loaded()
+        return self._mask("read").count(1)
 
+    @synchronized
     def count_deleted(self):
-        return len([e for e in self.load_ebooks() if e.get("is_deleted", False)])
+        self._ensure_loaded()
+        return self._mask("deleted").count(1)
 
+    @synchronized
     def count_favorite(self):
-        return len([
-            e for e in self.load_ebooks()
-            if e.get("is_favorite", False) and not e.get("is_deleted", False)
-        ])
+        self._ensure_loaded()
+        return self._mask("favorite").count(1)
 
+    @synchronized
     def count_recently_read(self, days=7):
-        import datetime
-        now = datetime.datetime.now()
-        count = 0
-        for e in self.load_ebooks():
-            last_read = e.get("last_read")
-            if last_read and not e.get("is_deleted", False):
-                try:
-                    dt = datetime.datetime.fromisoformat(last_read)
-                    if (now - dt).days <= days:
-                        count += 1
-                except Exception:
-                    pass
-        return count
+        self._ensure_loaded()
+        cutoff = self._recent_cutoff(days)
+        return len(self._recent_ts) - bisect.bisect_right(self._recent_ts, cutoff)
 
+    @synchronized
     def mark_as_read(self, filename):
-        ebooks = self.load_ebooks()
-        for ebook in ebooks:
-            if ebook.get("filename") == filename:
-                ebook["is_read"] = True
-                import datetime
-                ebook["last_read"] = datetime.datetime.now().isoformat()
-                break
-        self.save_ebooks(ebooks)
+        self._update(
+            filename,
+            is_read=True,
+            last_read=datetime.datetime.now().isoformat(),
+        )
 
+    @synchronized
+    def update_last_read(self, filename):
+        self._update(filename, last_read=datetime.datetime.now().isoformat())
+
+    @synchronized
+    def find_by_fingerprint(self, fingerprint):
+        self._ensure_loaded()
+        return self._by_fingerprint.get(fingerprint)
+
+    @synchronized
+    def set_fingerprint(self, filename, fingerprint):
+        self._ensure_loaded()
+        ebook = self._by_filename.get(filename)
+        if ebook is not None and ebook.get("fingerprint") != fingerprint:
+            self._update(filename, fingerprint=fingerprint)
+
+    @synchronized
+    def set_encoding(self, filename, encoding):
+        # Bảng mã đoán được của file TXT, để lần mở sau không phải đoán lại
+        self._ensure_loaded()
+        ebook = self._by_filename.get(filename)
+        if ebook is not None and ebook.get("encoding") != encoding:
+            self._update(filename, encoding=encoding)
+
+    @synchronized
+    def set_cover(self, filename, cover):
+        # cover là khoá thumbnail trong CoverCache, "" nếu sách không có ảnh bìa
+        self._ensure_loaded()
+        ebook = self._by_filename.get(filename)
+        if ebook is None or ebook.get("cover") == cover:
+            return False
+        self._update(filename, cover=cover)
+        return True
+
+    @synchronized
+    def get_position(self, filename):
+        self._ensure_loaded()
+        record = self._by_filename.get(filename)
+        return record.position if record is not None else None
+
+    @synchronized
+    def set_position(self, filename, chapter, offset):
+        # Cuộn trang chỉ nối thêm vào journal; storage được ghi một lần khi flush
+        self._ensure_loaded()
+        record = self._by_filename.get(filename)
+        position = [int(chapter), int(offset)]
+        if record is None or record.position == tuple(position):
+            return
+        record.position = tuple(position)
+        self._log({"op": "update", "filename": filename, "changes": {"position": position}},
+                  filename, {"position": position})
+
+    def _cancel_flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    @traced("data_manager.flush", "data")
+    @synchronized
+    def flush(self):
+        """Ghi mọi thay đổi đang chờ xuống storage (ghi nguyên tử) rồi xoá journal; False nếu ghi lỗi."""
+        with self._lock:
+            self._cancel_flush()
+            if not self._pending:
+                return True
+            changed = [self._by_filename[f] for f in self._pending if f in self._by_filename]
+            if not self._write(lambda: self.storage.upsert_many(changed, self._records)):
+                return False
+            self._pending = {}
+            self.journal.clear()
+            return True
+
+    @synchronized
     def toggle_favorite(self, filename):
-        ebooks = self.load_ebooks()
-        for ebook in ebooks:
-            if ebook.get("filename") == filename:
-                ebook["is_favorite"] = not ebook.get("is_favorite", False)
-                break
-        self.save_ebooks(ebooks)
-        return ebooks
\ No newline at end of file
+        """Đảo cờ yêu thích; trả về Record đã cập nhật (None nếu không có sách), không chép cả thư viện."""
+        self._ensure_loaded()
+        record = self._by_filename.get(filename)
+        if record is None:
+            return None
+        return self._update(filename, is_favorite=not record.flags & FAVORITE)
@@ -0,0 +1,212 @@
+import posixpath
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, namedtuple
+from urllib.parse import unquote
+
+from src.utils.tracing import span
+from src.utils.xhtml_converter import blocks_to_text, convert
+
+CHAPTER_CACHE_SIZE = 8
+
+Chapter = namedtuple("Chapter", "index href title")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _attr(element, name):
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _children(element, name):
+    return [child for child in element if _local(child.tag) == name]
+
+
+def _resolve(base_dir, href):
+    href = unquote(href.split("#", 1)[0])
+    return posixpath.normpath(posixpath.join(base_dir, href)) if base_dir else posixpath.normpath(href)
+
+
+class EpubBook:
+    """Đọc EPUB trực tiếp từ zip: chỉ OPF/spine/TOC được đọc khi mở, từng chương được giải nén khi cần."""
+
+    def __init__(self, path, cache=None, fingerprint=None):
+        self.path = path
+        self._zip = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.content_cache = cache
+        # fingerprint lưu trong thư viện giúp khỏi phải hash lại cả file để tìm cache
+        self.cache_key = cache.key_for(path, fingerprint) if cache is not None else None
+        self.base_dir = ""
+        self.metadata = {}
+        self.manifest = {}
+        self.chapters = []
+
+        package = cache.get_json(self.cache_key, "package") if cache is not None else None
+        if package is not None:
+            self._restore_package(package)
+        else:
+            self._load_package()
+            if cache is not None:
+                cache.put_json(self.cache_key, "package", self._package_state())
+
+    def _read(self, name):
+        with self._lock:
+            # Zip chỉ được mở khi thật sự cần đọc một mục trong sách
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.path)
+            return self._zip.read(name)
+
+    def _package_state(self):
+        return {
+            "base_dir": self.base_dir,
+            "metadata": self.metadata,
+            "manifest": self.manifest,
+            "chapters": [[c.href, c.title] for c in self.chapters],
+        }
+
+    def _restore_package(self, package):
+        self.base_dir = package["base_dir"]
+        self.metadata = package["metadata"]
+        self.manifest = package["manifest"]
+        self.chapters = [Chapter(i, href, title) for i, (href, title) in enumerate(package["chapters"])]
+
+    def _load_package(self):
+        container = ET.fromstring(self._read("META-INF/container.xml"))
+        rootfile = next(el for el in container.iter() if _local(el.tag) == "rootfile")
+        opf_path = rootfile.get("full-path")
+        self.base_dir = posixpath.dirname(opf_path)
+        package = ET.fromstring(self._read(opf_path))
+
+        for section in package:
+            name = _local(section.tag)
+            if name == "metadata":
+                self._load_metadata(section)
+            elif name == "manifest":
+                for item in _children(section, "item"):
+                    self.manifest[item.get("id")] = {
+                        "href": _resolve(self.base_dir, item.get("href", "")),
+                        "media_type": item.get("media-type", ""),
+                        "properties": (item.get("properties") or "").split(),
+                    }
+
+        spine = next((s for s in package if _local(s.tag) == "spine"), None)
+        titles = self._load_toc(spine)
+        if spine is None:
+            return
+        for itemref in _children(spine, "itemref"):
+            item = self.manifest.get(itemref.get("idref"))
+            if item is None or itemref.get("linear") == "no":
+                continue
+            index = len(self.chapters)
+            self.chapters.append(Chapter(index, item["href"], titles.get(item["href"])))
+
+    def _load_metadata(self, metadata):
+        for element in metadata:
+            name = _local(element.tag)
+            text = (element.text or "").strip()
+            if name in ("title", "creator", "language") and text and name not in self.metadata:
+                self.metadata[name] = text
+            elif name == "meta" and element.get("name") == "cover":
+                self.metadata["cover"] = element.get("content")
+
+    def _load_toc(self, spine):
+        # Ưu tiên nav của EPUB3, sau đó tới toc.ncx của EPUB2
+        for item in self.manifest.values():
+            if "nav" in item["properties"]:
+                titles = self._parse_nav(item["href"])
+                if titles:
+                    return titles
+        toc_id = spine.get("toc") if spine is not None else None
+        item = self.manifest.get(toc_id) if toc_id else None
+        if item is None:
+            item = next(
+                (i for i in self.manifest.values() if i["media_type"] == "application/x-dtbncx+xml"),
+                None,
+            )
+        return self._parse_ncx(item["href"]) if item is not None else {}
+
+    def _parse_nav(self, href):
+        try:
+            root = ET.fromstring(self._read(href))
+        except (KeyError, ET.ParseError):
+            return {}
+        nav_dir = posixpath.dirname(href)
+        titles = {}
+        for nav in root.iter():
+            if _local(nav.tag) != "nav" or _attr(nav, "type") not in (None, "toc"):
+                continue
+            for link in nav.iter():
+                if _local(link.tag) == "a" and link.get("href"):
+                    target = _resolve(nav_dir, link.get("href"))
+                    titles.setdefault(target, " ".join("".join(link.itertext()).split()))
+            break
+        return titles
+
+    def _parse_ncx(self, href):
+        try:
+            root = ET.fromstring(self._read(href))
+        except (KeyError, ET.ParseError):
+            return {}
+        ncx_dir = posixpath.dirname(href)
+        titles = {}
+        for point in root.iter():
+            if _local(point.tag) != "navPoint":
+                continue
+            label = next((el for el in point.iter() if _local(el.tag) == "text"), None)
+            content = next((el for el in point if _local(el.tag) == "content"), None)
+            if label is not None and content is not None and content.get("src"):
+                target = _resolve(ncx_dir, content.get("src"))
+                titles.setdefault(target, " ".join((label.text or "").split()))
+        return titles
+
+    def chapter_title(self, index):
+        return self.chapters[index].title or f"Chapter {index + 1}"
+
+    def chapter_blocks(self, index):
+        """Danh sách block/span của một chương (xem xhtml_converter), có cache LRU và cache đĩa."""
+        with self._lock:
+            blocks = self._cache.get(index)
+            if blocks is not None:
+                self._cache.move_to_end(index)
+                return blocks
+        blocks = None
+        if self.content_cache is not None:
+            blocks = self.content_cache.get_json(self.cache_key, f"blocks-{index}")
+        if blocks is None:
+            href = self.chapters[index].href
+            data = self._read(href)
+            with span("epub.convert_chapter", "io", size=len(data)):
+                blocks = convert(data, posixpath.dirname(href))
+            if self.content_cache is not None:
+                self.content_cache.put_json(self.cache_key, f"blocks-{index}", blocks)
+        with self._lock:
+            self._cache[index] = blocks
+            while len(self._cache) > CHAPTER_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return blocks
+
+    def chapter_text(self, index):
+        return blocks_to_text(self.chapter_blocks(index))
+
+    def read_item(self, href):
+        return self._read(href)
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
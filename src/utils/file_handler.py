@@ -1,7 +1,8 @@
 import shutil
 
-from ebooklib import ITEM_DOCUMENT
-from ebooklib import epub
+from src.utils.text_encoding import read_text
+from src.utils.text_pager import TextPager
+from src.utils.tracing import traced
 
 
 class FileHandler:
@@ -10,15 +11,32 @@ class FileHandler:
         shutil.copy(src_path, dest_path)
 
     @staticmethod
-    def read_file(file_path):
+    @traced("file_handler.open_pager", "io")
+    def open_pager(file_path, encoding=None):
+        return TextPager(file_path, encoding)
+
+    @staticmethod
+    @traced("file_handler.open_epub", "io")
+    def open_epub(file_path, cache=None, fingerprint=None):
+        from src.utils.epub_book import EpubBook
+
+        return EpubBook(file_path, cache, fingerprint)
+
+    @staticmethod
+    @traced("file_handler.read_file", "io", size=len)
+    def read_file(file_path, encoding=None):
         if file_path.endswith('.txt'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()  # Sửa lỗi cú pháp
+            # Tự nhận UTF-8/UTF-16 (có hoặc không BOM), Windows-1258, TCVN3, VNI
+            return read_text(file_path, encoding)
         elif file_path.endswith('.epub'):
+            # ebooklib (kéo theo lxml) chỉ được import khi thật sự cần đọc EPUB theo cách này
+            from ebooklib import ITEM_DOCUMENT
+            from ebooklib import epub
+
             book = epub.read_epub(file_path)
-            content = ""
-            for item in book.get_items_of_type(ITEM_DOCUMENT):
-                content += item.get_content().decode('utf-8') + "\n"
-            return content
+            return "\n".join(
+                item.get_content().decode('utf-8')
+                for item in book.get_items_of_type(ITEM_DOCUMENT)
+            ) + "\n"
         else:
             return "Định dạng file không được hỗ trợ."
\ No newline at end of file
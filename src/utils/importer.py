@@ -0,0 +1,306 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.content_cache import file_hash
+from src.utils.file_handler import FileHandler
+from src.utils.text_encoding import detect_file_encoding
+
+SUPPORTED_EXTENSIONS = (".txt", ".epub")
+COPY_WORKERS = 4
+METADATA_CHUNKSIZE = 16
+# Kho nội dung trong thư mục sách: mỗi nội dung một file <fingerprint><đuôi>, sách là hard link tới đó
+OBJECTS_DIR = ".objects"
+
+
+def collect_book_paths(paths):
+    books = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                # Bỏ qua thư mục ẩn, trong đó có kho .objects khi nhập lại chính thư mục ebooks
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                books.extend(
+                    os.path.join(root, name)
+                    for name in sorted(files)
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS)
+                )
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            books.append(path)
+    return books
+
+
+def title_from_filename(file_name):
+    return file_name.replace('.txt', '').replace('.epub', '')
+
+
+def extract_metadata(file_path):
+    # Hàm cấp module để có thể chạy trong ProcessPoolExecutor
+    metadata = {}
+    if file_path.lower().endswith(".txt"):
+        try:
+            metadata = {"encoding": detect_file_encoding(file_path)}
+        except OSError:
+            metadata = {}
+    elif file_path.lower().endswith(".epub"):
+        from src.utils.epub_book import EpubBook
+
+        try:
+            with EpubBook(file_path) as book:
+                metadata = {
+                    "title": book.metadata.get("title"),
+                    "author": book.metadata.get("creator"),
+                    "language": book.metadata.get("language"),
+                }
+        except Exception:
+            metadata = {}
+    return {k: v for k, v in metadata.items() if v}
+
+
+def numbered_name(file_name, number):
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem} ({number}){ext}"
+
+
+def new_record(file_name, metadata=None, fingerprint=None):
+    metadata = metadata or {}
+    record = {
+        "filename": file_name,
+        "title": metadata.get("title") or title_from_filename(file_name),
+        "author": metadata.get("author") or "Unknown Author",
+        "is_read": False,
+        "is_favorite": False,
+        "is_deleted": False,
+        "last_read": None,
+    }
+    if metadata.get("language"):
+        record["language"] = metadata["language"]
+    if metadata.get("encoding"):
+        record["encoding"] = metadata["encoding"]
+    if fingerprint:
+        record["fingerprint"] = fingerprint
+    return record
+
+
+class BookImporter:
+    def __init__(self, data_manager, ebook_dir="ebooks", copy_workers=COPY_WORKERS, metadata_workers=None):
+        self.data_manager = data_manager
+        self.ebook_dir = ebook_dir
+        self.copy_workers = copy_workers
+        self.metadata_workers = metadata_workers
+        self._lock = threading.Lock()
+        # Mỗi lúc một lượt nhập/đồng bộ: nhập từ UI và watcher thư mục không giành tên file của nhau
+        self._import_lock = threading.RLock()
+        # Trong một lần nhập: fingerprint -> filename và các tên đã được giữ chỗ
+        self._claimed = {}
+        self._reserved = set()
+
+    def _object_path(self, fingerprint, src_path):
+        ext = os.path.splitext(src_path)[1].lower()
+        return os.path.join(self.ebook_dir, OBJECTS_DIR, fingerprint + ext)
+
+    def _name_taken(self, file_name, fingerprint, src_path):
+        if file_name in self._reserved or self.data_manager.get_ebook(file_name) is not None:
+            return True
+        dest_path = os.path.join(self.ebook_dir, file_name)
+        if not os.path.exists(dest_path) or os.path.abspath(dest_path) == os.path.abspath(src_path):
+            return False
+        # File lạ trùng tên (chưa có trong thư viện): chỉ dùng lại tên nếu cùng nội dung
+        return file_hash(dest_path) != fingerprint
+
+    def _claim(self, src_path, fingerprint):
+        # Trả về (filename, có phải sách mới); phải gọi khi giữ self._lock
+        existing = self._claimed.get(fingerprint) or self.data_manager.find_by_fingerprint(fingerprint)
+        if existing is not None:
+            return existing, False
+        file_name = os.path.basename(src_path)
+        number = 2
+        candidate = file_name
+        while self._name_taken(candidate, fingerprint, src_path):
+            candidate = numbered_name(file_name, number)
+            number += 1
+        self._claimed[fingerprint] = candidate
+        self._reserved.add(candidate)
+        return candidate, True
+
+    def _store(self, src_path, fingerprint, dest_path):
+        object_path = self._object_path(fingerprint, src_path)
+        if os.path.abspath(src_path) == os.path.abspath(dest_path):
+            # Sách đã nằm sẵn trong thư mục ebooks: chỉ cần ghi nhận vào kho nội dung
+            if not os.path.exists(object_path):
+                try:
+                    os.link(dest_path, object_path)
+                except OSError:
+                    pass
+            return
+        if not os.path.exists(object_path):
+            tmp_path = f"{object_path}.{threading.get_ident()}.tmp"
+            FileHandler.copy_file(src_path, tmp_path)
+            os.replace(tmp_path, object_path)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(object_path, dest_path)
+        except OSError:
+            # Hệ thống file không hỗ trợ hard link (FAT, ổ mạng...): sao chép
+            FileHandler.copy_file(object_path, dest_path)
+
+    def _copy(self, src_path):
+        # Hash đọc file theo từng khối; sách trùng nội dung không bị sao chép lại
+        fingerprint = file_hash(src_path)
+        with self._lock:
+            file_name, is_new = self._claim(src_path, fingerprint)
+        dest_path = os.path.join(self.ebook_dir, file_name)
+        if is_new:
+            self._store(src_path, fingerprint, dest_path)
+        return file_name, dest_path, fingerprint, is_new
+
+    def _backfill_fingerprints(self):
+        # Sách nhập trước khi có fingerprint: tính một lần để phát hiện trùng lặp.
+        # Cả sách trong thùng rác: nhập lại đúng nội dung đó thì lấy sách ra khỏi thùng rác
+        for ebook in self.data_manager.records("all") + self.data_manager.records("deleted"):
+            if ebook.get("fingerprint"):
+                continue
+            path = os.path.join(self.ebook_dir, ebook["filename"])
+            try:
+                self.data_manager.set_fingerprint(ebook["filename"], file_hash(path))
+            except OSError:
+                continue
+
+    def _extract_all(self, dest_paths):
+        # Metadata EPUB và bảng mã của file TXT
+        books = [p for p in dest_paths if p.lower().endswith((".epub", ".txt"))]
+        if not books:
+            return {}
+        if len(books) == 1:
+            return {books[0]: extract_metadata(books[0])}
+        # multiprocessing chỉ được nạp khi có nhiều sách cần trích xuất
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.metadata_workers) as pool:
+                results = pool.map(extract_metadata, books, chunksize=METADATA_CHUNKSIZE)
+                return dict(zip(books, results))
+        except (BrokenProcessPool, OSError):
+            # Môi trường không cho tạo tiến trình con: trích xuất ngay trong luồng hiện tại
+            return {p: extract_metadata(p) for p in books}
+
+    def import_paths(self, paths, on_progress=None):
+        """Sao chép và đăng ký nhiều sách; trả về (số sách mới hoặc lấy lại từ thùng rác, các filename đã xử lý)."""
+        with self._import_lock:
+            added, restored, imported = self._import_paths(paths, on_progress)
+        return added + len(restored), list(dict.fromkeys(file_name for _, file_name, _ in imported))
+
+    def _restore_trashed(self, file_names):
+        # Nội dung trùng một sách trong thùng rác: nhập lại nghĩa là lấy sách đó ra khỏi thùng rác
+        restored = []
+        for file_name in dict.fromkeys(file_names):
+            record = self.data_manager.record(file_name)
+            if record is not None and record.get("is_deleted") and self.data_manager.restore_ebook(file_name):
+                restored.append(file_name)
+        return restored
+
+    def _import_paths(self, paths, on_progress=None):
+        # Trả về (số bản ghi mới, filename lấy lại từ thùng rác, [(đường dẫn nguồn, filename, có phải sách mới)])
+        sources = collect_book_paths(paths)
+        total = len(sources)
+        copied = []
+        os.makedirs(os.path.join(self.ebook_dir, OBJECTS_DIR), exist_ok=True)
+        self._backfill_fingerprints()
+        self._claimed = {}
+        self._reserved = set()
+        with ThreadPoolExecutor(max_workers=self.copy_workers) as pool:
+            for done, result in enumerate(pool.map(self._copy, sources), 1):
+                copied.append(result)
+                if on_progress is not None:
+                    on_progress(done, total)
+
+        fresh = [(file_name, dest_path, fp) for file_name, dest_path, fp, is_new in copied if is_new]
+        metadata = self._extract_all([dest_path for _, dest_path, _ in fresh])
+        records = [
+            new_record(file_name, metadata.get(dest_path), fingerprint)
+            for file_name, dest_path, fingerprint in fresh
+        ]
+        added = self.data_manager.add_ebooks(records)
+        restored = self._restore_trashed(file_name for file_name, _, _, is_new in copied if not is_new)
+        imported = [
+            (src_path, file_name, is_new)
+            for src_path, (file_name, _, _, is_new) in zip(sources, copied)
+        ]
+        return added, restored, imported
+
+    def _drop_duplicate(self, path, file_name):
+        # File chép vào thư mục sách trùng nội dung với sách file_name đã có: xoá một lần thay vì
+        # để nó nằm ngoài thư viện và bị kiểm tra lại ở mỗi lần khởi động. Chỉ xoá khi bản kia còn trên đĩa
+        existing = os.path.join(self.ebook_dir, file_name)
+        if not os.path.isfile(existing):
+            return False
+        try:
+            if os.path.samefile(path, existing):
+                return False
+            os.remove(path)
+        except OSError as e:
+            print(f"Error removing duplicate {path}: {e}")
+            return False
+        return True
+
+    def _refresh(self, file_name):
+        # File đã có trong thư viện được ghi lại: chỉ cập nhật khi nội dung thật sự khác
+        path = os.path.join(self.ebook_dir, file_name)
+        record = self.data_manager.record(file_name)
+        fingerprint = file_hash(path)
+        old = record.fingerprint
+        if fingerprint == old:
+            return False
+        if old:
+            stale = self._object_path(old, path)
+            # Ghi đè tại chỗ lên hard link thì bản trong kho cũng đã mang nội dung mới: bỏ khỏi kho
+            try:
+                if os.path.samefile(stale, path):
+                    os.remove(stale)
+            except OSError:
+                pass
+        self._store(path, fingerprint, path)
+        metadata = extract_metadata(path)
+        changes = {"fingerprint": fingerprint, "encoding": metadata.get("encoding"), "cover": None}
+        changes.update({k: metadata[k] for k in ("title", "author", "language") if k in metadata})
+        self.data_manager.update_ebook(file_name, **changes)
+        return True
+
+    def sync_files(self, file_names):
+        """Đồng bộ các file trong thư mục sách (do watcher báo) với thư viện.
+
+        Trả về (filename mới thêm, filename có nội dung đổi, filename đã gỡ vì file không còn).
+        """
+        with self._import_lock:
+            new_paths = []
+            changed = []
+            removed = []
+            for file_name in file_names:
+                path = os.path.join(self.ebook_dir, file_name)
+                exists = os.path.isfile(path) and file_name.lower().endswith(SUPPORTED_EXTENSIONS)
+                registered = self.data_manager.record(file_name) is not None
+                if not exists:
+                    if registered:
+                        removed.append(file_name)
+                elif not registered:
+                    new_paths.append(path)
+                else:
+                    try:
+                        if self._refresh(file_name):
+                            changed.append(file_name)
+                    except OSError as e:
+                        print(f"Error syncing {file_name}: {e}")
+            if removed:
+                self.data_manager.remove_ebooks(removed)
+            added = []
+            if new_paths:
+                _, restored, imported = self._import_paths(new_paths)
+                for path, file_name, is_new in imported:
+                    if is_new:
+                        added.append(file_name)
+                    elif self._drop_duplicate(path, file_name):
+                        print(f"Removed {os.path.basename(path)} from the library folder: same content as {file_name}")
+                added.extend(f for f in restored if f not in added)
+            return added, changed, removed
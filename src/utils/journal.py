@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+
+
+class Journal:
+    """Nhật ký ghi-trước của thư viện: mỗi thay đổi là một dòng JSON được nối vào cuối file.
+
+    Thay đổi được ghi vào đây ngay lập tức (rẻ, chỉ append), còn storage chính chỉ được ghi
+    khi DataManager.flush(); nếu ứng dụng crash trước đó, replay() trả lại các thay đổi chưa lưu.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            # Đẩy xuống hệ điều hành ngay để crash của tiến trình không làm mất dòng này
+            self._file.flush()
+
+    def replay(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Dòng cuối bị cắt ngang khi crash: bỏ qua phần còn lại
+                    break
+        return entries
+
+    def rewrite(self, entries):
+        # Chỉ giữ lại các mục cho trước (ghi ra file tạm rồi thay thế, để crash giữa chừng không làm mất nhật ký)
+        lines = [json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries]
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if not lines:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        # Gọi sau khi storage chính đã lưu xong mọi thay đổi trong nhật ký
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
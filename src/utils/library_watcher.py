@@ -0,0 +1,251 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+from src.utils.importer import SUPPORTED_EXTENSIONS
+
+# Gom các sự kiện tới khi thư mục yên lặng chừng này (giây), để một lần chép cả loạt sách chỉ đồng bộ một lần
+QUIET_SECONDS = 1.0
+# Nhưng không hoãn quá lâu khi sự kiện tới liên tục (job đồng bộ chạy dài)
+MAX_DELAY = 10.0
+POLL_INTERVAL = 5.0
+# Đối chiếu mà thấy thiếu hơn tỉ lệ này số sách đã đăng ký thì coi là thư mục đang không đọc được
+# (ổ chưa mount, thư mục mạng mất kết nối) và không gỡ sách nào
+MAX_MISSING_FRACTION = 0.5
+# Luồng watcher thức dậy ít nhất mỗi khoảng này để kiểm tra stop()
+WAKE_SECONDS = 1.0
+
+# Hằng số của <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+# Không theo dõi IN_CREATE: hard link do BookImporter tạo chỉ sinh IN_CREATE, file được ghi thật luôn có
+# IN_CLOSE_WRITE hoặc IN_MOVED_TO
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct("iIII")
+# Phần tử đặc biệt trong kết quả wait() khi sự kiện bị mất (hàng đợi kernel tràn, thư mục bị xoá/đổi tên):
+# phải đối chiếu lại cả thư mục. Không trùng tên file nào vì is_book_name("") là False
+RESCAN = ""
+
+
+def is_book_name(name):
+    # Bỏ qua file/thư mục ẩn (kho .objects, file tạm .ebooks-*.tmp) và đuôi không hỗ trợ
+    return not name.startswith(".") and name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def list_books(directory):
+    # Không nuốt OSError: thư mục không đọc được khác hẳn thư mục rỗng
+    with os.scandir(directory) as entries:
+        return {e.name for e in entries if is_book_name(e.name) and e.is_file()}
+
+
+class InotifySource:
+    """Sự kiện của thư mục sách qua inotify (Linux), gọi thẳng libc bằng ctypes."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if self._wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def _rewatch(self, timeout):
+        # Watch cũ đã mất (thư mục bị xoá, đổi tên hoặc bị unmount): theo dõi lại đường dẫn khi nó có trở lại
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(self.directory), WATCH_MASK)
+        if wd < 0:
+            time.sleep(timeout)
+            return set()
+        self._wd = wd
+        return {RESCAN}
+
+    def wait(self, timeout):
+        """Chờ tối đa timeout giây; trả về tập tên file đã đổi (có RESCAN nếu phải đối chiếu lại)."""
+        if self._wd < 0:
+            return self._rewatch(timeout)
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_UNMOUNT) and self._wd >= 0:
+                # Thư mục đã đổi tên thì watch vẫn bám theo nó: gỡ đi để lần sau theo dõi lại đúng đường dẫn
+                self._libc.inotify_rm_watch(self._fd, self._wd)
+                self._wd = -1
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_UNMOUNT):
+                names.add(RESCAN)
+            elif not mask & IN_ISDIR and is_book_name(name):
+                names.add(name)
+        return names
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingSource:
+    """Dự phòng khi không có inotify: so sánh (size, mtime, inode) của các file sau mỗi POLL_INTERVAL.
+
+    Chỉ stat các mục của thư mục, không đọc nội dung file.
+    """
+
+    def __init__(self, directory, interval=POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        try:
+            self._snapshot = self._scan()
+        except OSError:
+            self._snapshot = None
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not is_book_name(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def wait(self, timeout):
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, delay))
+        self._next_scan = time.monotonic() + self.interval
+        try:
+            snapshot = self._scan()
+        except OSError as e:
+            # Thư mục tạm thời không đọc được: giữ ảnh chụp cũ thay vì báo mọi file đã bị xoá
+            print(f"Error scanning library folder: {e}")
+            return set()
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if previous is None or len(previous.keys() - snapshot.keys()) > len(previous) * MAX_MISSING_FRACTION:
+            # Lần đầu đọc được thư mục, hoặc phần lớn file biến mất cùng lúc (ổ bị tháo ra):
+            # để bước đối chiếu (có chặn gỡ hàng loạt) xử lý, chỉ giữ các file còn đó mà đã đổi
+            previous = previous or {}
+            return {RESCAN} | {name for name in snapshot if previous.get(name) != snapshot[name]}
+        return {
+            name for name in previous.keys() | snapshot.keys()
+            if previous.get(name) != snapshot.get(name)
+        }
+
+    def close(self):
+        pass
+
+
+def open_source(directory):
+    try:
+        return InotifySource(directory)
+    except (OSError, AttributeError) as e:
+        # Không phải Linux, hoặc hết giới hạn inotify của người dùng
+        print(f"Error starting inotify, falling back to polling: {e}")
+        return PollingSource(directory)
+
+
+class LibraryWatcher:
+    """Theo dõi thư mục sách ở luồng nền và đồng bộ thay đổi vào thư viện theo lô.
+
+    on_change((added, changed, removed)) được gọi một lần cho mỗi lô, từ luồng của watcher.
+    """
+
+    def __init__(self, importer, ebook_dir, on_change=None, quiet=QUIET_SECONDS, max_delay=MAX_DELAY,
+                 source_factory=open_source):
+        self.importer = importer
+        self.ebook_dir = ebook_dir
+        self.on_change = on_change
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self._source_factory = source_factory
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.ebook_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="library-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Luồng tự đóng nguồn sự kiện khi thấy cờ dừng (chậm nhất sau WAKE_SECONDS)
+        self._stop.set()
+
+    def _reconcile_names(self, changed=()):
+        # File thêm/xoá lúc ứng dụng không chạy (hoặc sự kiện bị mất): so tên trên đĩa với thư viện.
+        # changed: các file đã báo đổi trong cùng lô với yêu cầu đối chiếu, được gộp vào kết quả
+        try:
+            on_disk = list_books(self.ebook_dir)
+        except OSError as e:
+            print(f"Error listing library folder, skipping sync: {e}")
+            return set()
+        registered = set(self.importer.data_manager.filenames("all"))
+        registered.update(self.importer.data_manager.filenames("deleted"))
+        missing = registered - on_disk
+        if missing and len(missing) > len(registered) * MAX_MISSING_FRACTION:
+            print(f"Error syncing library folder: {len(missing)} of {len(registered)} books are missing from "
+                  f"{self.ebook_dir}; not removing them")
+            missing = set()
+            changed = on_disk.intersection(changed)
+        return (on_disk - registered) | missing | set(changed)
+
+    def _run(self):
+        source = self._source_factory(self.ebook_dir)
+        pending = self._reconcile_names()
+        first = last = time.monotonic() if pending else None
+        while not self._stop.is_set():
+            names = source.wait(min(self.quiet, WAKE_SECONDS) if pending else WAKE_SECONDS)
+            now = time.monotonic()
+            if RESCAN in names:
+                names = self._reconcile_names(names - {RESCAN})
+            if names:
+                pending |= names
+                first = first or now
+                last = now
+            if pending and (now - last >= self.quiet or now - first >= self.max_delay):
+                batch, pending = pending, set()
+                first = last = None
+                self.sync(batch)
+        source.close()
+
+    def sync(self, names):
+        try:
+            added, changed, removed = self.importer.sync_files(sorted(names))
+        except Exception as e:
+            print(f"Error syncing library folder: {e}")
+            return
+        if (added or changed or removed) and self.on_change is not None:
+            try:
+                self.on_change((added, changed, removed))
+            except Exception as e:
+                print(f"Error refreshing after sync: {e}")
@@ -0,0 +1,146 @@
+import datetime
+import sys
+
+# Cờ trạng thái của một sách, gom trong một byte (cột _flags của DataManager)
+READ = 1
+FAVORITE = 2
+DELETED = 4
+FLAG_FIELDS = (("is_read", READ), ("is_favorite", FAVORITE), ("is_deleted", DELETED))
+
+# Các field thường gặp có slot riêng; field lạ nằm trong extra
+_SLOT_FIELDS = ("title", "author", "fingerprint", "cover", "encoding", "language")
+# Giá trị lặp lại nhiều giữa các sách: dùng chung một đối tượng chuỗi
+_INTERNED = ("author", "encoding", "language")
+
+
+def to_epoch(last_read):
+    """Chuỗi ISO (định dạng cũ trong ebooks.json/SQLite) -> số giây epoch, None nếu không hợp lệ."""
+    if not last_read:
+        return None
+    if isinstance(last_read, (int, float)):
+        return int(last_read)
+    try:
+        return int(datetime.datetime.fromisoformat(last_read).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def from_epoch(seconds):
+    return datetime.datetime.fromtimestamp(seconds).isoformat() if seconds is not None else None
+
+
+class Record:
+    """Bản ghi sách gọn trong bộ nhớ: __slots__, cờ dạng bitset, last_read là epoch.
+
+    Đọc được như một dict chỉ đọc (record["title"], record.get(...), dict(record)) nên storage
+    và UI dùng trực tiếp mà không phải chép ra dict cho cả thư viện.
+    """
+
+    __slots__ = ("filename", "pos", "flags", "last_read", "position", "extra") + _SLOT_FIELDS
+
+    def __init__(self, filename):
+        self.filename = filename
+        # Vị trí trong thư viện (chỉ số của các cột song song trong DataManager)
+        self.pos = -1
+        self.flags = 0
+        self.last_read = None
+        self.position = None
+        self.extra = None
+        for field in _SLOT_FIELDS:
+            setattr(self, field, None)
+
+    @classmethod
+    def from_dict(cls, ebook):
+        record = cls(ebook["filename"])
+        record.update(ebook)
+        return record
+
+    def update(self, changes):
+        for key, value in changes.items():
+            if key == "filename":
+                continue
+            self._set(key, value)
+
+    def _set(self, key, value):
+        for field, bit in FLAG_FIELDS:
+            if key == field:
+                self.flags = self.flags | bit if value else self.flags & ~bit
+                return
+        if key == "last_read":
+            self.last_read = to_epoch(value)
+        elif key == "position":
+            self.position = (int(value[0]), int(value[1])) if value else None
+        elif key in _SLOT_FIELDS:
+            if key in _INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, key, value)
+        elif value is None:
+            # Field lạ đặt về None (ví dụ deleted_at khi khôi phục): bỏ hẳn khỏi bản ghi
+            if self.extra:
+                self.extra.pop(key, None)
+                if not self.extra:
+                    self.extra = None
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    # --- Giao diện mapping chỉ đọc ---
+
+    def keys(self):
+        keys = ["filename"]
+        for field in _SLOT_FIELDS:
+            if getattr(self, field) is not None:
+                keys.append(field)
+        keys += [field for field, _ in FLAG_FIELDS]
+        keys.append("last_read")
+        if self.position is not None:
+            keys.append("position")
+        if self.extra:
+            keys += list(self.extra)
+        return keys
+
+    def __getitem__(self, key):
+        for field, bit in FLAG_FIELDS:
+            if key == field:
+                return bool(self.flags & bit)
+        if key == "filename":
+            return self.filename
+        if key == "last_read":
+            return from_epoch(self.last_read)
+        if key == "position":
+            if self.position is None:
+                raise KeyError(key)
+            return list(self.position)
+        if key in _SLOT_FIELDS:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
@@ -0,0 +1,185 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from src.utils.text_encoding import encode_text
+from src.utils.text_pager import TextPager
+
+PASSAGE_CHARS = 1500
+SNIPPET_TOKENS = 16
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def normalize(text):
+    return unicodedata.normalize("NFC", text)
+
+
+def build_match_query(query):
+    """Chuyển truy vấn người dùng thành cú pháp FTS5: "cụm từ" giữ nguyên, từ lẻ được quote để tránh lỗi cú pháp."""
+    terms = []
+    for phrase, word in _QUERY_RE.findall(normalize(query)):
+        text = (phrase or word).replace('"', " ").strip()
+        if text:
+            terms.append(f'"{text}"')
+    return " ".join(terms)
+
+
+def iter_txt_passages(file_path, encoding=None):
+    # Mỗi đoạn gồm nhiều dòng liên tiếp; offset là vị trí byte của dòng đầu trong file
+    with TextPager(file_path, encoding) as pager:
+        start = 0
+        lines = []
+        size = 0
+        for index in range(pager.page_count):
+            # Mỗi trang bắt đầu lại từ offset thật: ước lượng trong trang không bị cộng dồn sai lệch
+            offset = pager.page_range(index)[0]
+            for line in pager.page(index).splitlines(keepends=True):
+                if not lines:
+                    start = offset
+                lines.append(line)
+                size += len(line)
+                offset += len(encode_text(line, pager.encoding, errors="replace"))
+                if size >= PASSAGE_CHARS:
+                    yield 0, start, "".join(lines)
+                    lines, size = [], 0
+        if lines:
+            yield 0, start, "".join(lines)
+
+
+def iter_epub_passages(file_path):
+    # Offset là vị trí ký tự trong văn bản của chương
+    from src.utils.epub_book import EpubBook
+
+    with EpubBook(file_path) as book:
+        for chapter in book.chapters:
+            text = book.chapter_text(chapter.index)
+            pos = 0
+            while pos < len(text):
+                end = text.find("\n\n", pos + PASSAGE_CHARS)
+                end = len(text) if end == -1 else end
+                yield chapter.index, pos, text[pos:end]
+                pos = end + 2
+
+
+def iter_passages(file_path):
+    if file_path.endswith(".txt"):
+        return iter_txt_passages(file_path)
+    if file_path.endswith(".epub"):
+        return iter_epub_passages(file_path)
+    return iter(())
+
+
+def live_results(results, data_manager):
+    """Bỏ các kết quả của sách đã gỡ khỏi thư viện hoặc đang nằm trong thùng rác."""
+    live = []
+    for result in results:
+        record = data_manager.record(result["filename"])
+        if record is not None and not record.get("is_deleted"):
+            live.append(result)
+    return live
+
+
+class SearchIndex:
+    """Chỉ mục toàn văn của thư viện trên SQLite FTS5 (xếp hạng BM25, tìm cụm từ, trích đoạn)."""
+
+    SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+            text,
+            filename UNINDEXED,
+            chapter UNINDEXED,
+            offset UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+        CREATE TABLE IF NOT EXISTS indexed_books (
+            filename TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER
+        );
+    """
+
+    def __init__(self, db_path, ebook_dir="ebooks"):
+        self.db_path = db_path
+        self.ebook_dir = ebook_dir
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def is_indexed(self, filename):
+        path = os.path.join(self.ebook_dir, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns FROM indexed_books WHERE filename = ?", (filename,)
+            ).fetchone()
+        return row == (st.st_size, st.st_mtime_ns)
+
+    def index_book(self, filename):
+        if self.is_indexed(filename):
+            return False
+        path = os.path.join(self.ebook_dir, filename)
+        st = os.stat(path)
+        # Đọc và tách đoạn cả cuốn trước khi lấy khoá, để search() không phải chờ việc parse sách
+        rows = [
+            (normalize(text), filename, chapter, offset)
+            for chapter, offset, text in iter_passages(path)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM passages WHERE filename = ?", (filename,))
+            self._conn.executemany(
+                "INSERT INTO passages (text, filename, chapter, offset) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed_books (filename, size, mtime_ns) VALUES (?, ?, ?)",
+                (filename, st.st_size, st.st_mtime_ns),
+            )
+        return True
+
+    def index_books(self, filenames):
+        indexed = 0
+        for filename in filenames:
+            try:
+                indexed += self.index_book(filename)
+            except Exception as e:
+                print(f"Error indexing {filename}: {e}")
+        return indexed
+
+    def remove_book(self, filename):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM passages WHERE filename = ?", (filename,))
+            self._conn.execute("DELETE FROM indexed_books WHERE filename = ?", (filename,))
+
+    def search(self, query, limit=20):
+        match = build_match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, chapter, offset, "
+                "snippet(passages, 0, ?, ?, '…', ?), bm25(passages) "
+                "FROM passages WHERE passages MATCH ? ORDER BY rank LIMIT ?",
+                (HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, match, limit),
+            ).fetchall()
+        return [
+            {
+                "filename": filename,
+                "chapter": int(chapter),
+                "offset": int(offset),
+                "snippet": snippet,
+                "score": -score,
+            }
+            for filename, chapter, offset, snippet, score in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
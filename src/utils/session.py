@@ -0,0 +1,61 @@
+import threading
+
+
+class SessionLibrary:
+    """Góc nhìn của một phiên web lên DataManager dùng chung.
+
+    Chỉ mục thư viện nằm ở DataManager (một bản cho cả tiến trình); vị trí đọc thuộc về phiên,
+    nên người này cuộn sách không làm nhảy trang của người khác. Vị trí chỉ được ghi vào thư viện
+    chung khi bookmark hoặc khi phiên kết thúc (flush), không phải mỗi lần cuộn.
+    """
+
+    def __init__(self, shared):
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._positions = {}
+
+    def __getattr__(self, name):
+        return getattr(self._shared, name)
+
+    def get_position(self, filename):
+        with self._lock:
+            position = self._positions.get(filename)
+        # Chưa đọc trong phiên này: bắt đầu từ vị trí đã lưu của thư viện
+        return position if position is not None else self._shared.get_position(filename)
+
+    def set_position(self, filename, chapter, offset):
+        with self._lock:
+            self._positions[filename] = (int(chapter), int(offset))
+
+    def flush(self):
+        """Bookmark hoặc phiên kết thúc: ghi vị trí đọc của phiên vào thư viện dùng chung (qua journal)."""
+        with self._lock:
+            positions = dict(self._positions)
+        for filename, (chapter, offset) in positions.items():
+            # DataManager bỏ qua vị trí không đổi, nên flush lặp lại không ghi thêm gì
+            self._shared.set_position(filename, chapter, offset)
+        self._shared.flush()
+
+
+class SharedServices:
+    """Thư viện, cache và chỉ mục dùng chung cho mọi phiên của server, mở một lần khi có phiên đầu tiên."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._services = None
+        self._warmed = False
+
+    def get(self):
+        with self._lock:
+            if self._services is None:
+                self._services = self._factory()
+            return self._services
+
+    def claim_warmup(self):
+        # Chỉ phiên đầu tiên chạy các việc nặng một lần (index tìm kiếm, trích ảnh bìa)
+        with self._lock:
+            if self._warmed:
+                return False
+            self._warmed = True
+            return True
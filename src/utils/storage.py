@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+
+from src.utils.tracing import traced
+
+FIELDS = ("filename", "title", "author", "is_read", "is_favorite", "is_deleted", "last_read")
+BOOL_FIELDS = ("is_read", "is_favorite", "is_deleted")
+
+
+def _file_mode(path):
+    # Quyền của file cũ; file mới thì theo umask như open() bình thường (mkstemp luôn tạo 0600)
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def open_storage(path):
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteStorage(path)
+    return JsonStorage(path)
+
+
+class JsonStorage:
+    def __init__(self, path):
+        self.path = path
+        # File có sẵn có thể còn định dạng thụt lề cũ; mọi lần save sau đó đều ghi dạng gọn
+        self._compacted = False
+
+    def stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @traced("storage.json.load", "storage", size=len)
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    ebooks = json.load(f)
+                    return ebooks if isinstance(ebooks, list) else []
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return []
+        return []
+
+    @traced("storage.json.save", "storage")
+    def save(self, ebooks):
+        # Ghi ra file tạm rồi rename để một lần crash không làm mất thư viện
+        directory = os.path.dirname(os.path.abspath(self.path))
+        mode = _file_mode(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix=".ebooks-", suffix=".tmp", dir=directory)
+        try:
+            os.chmod(tmp_path, mode)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                # ebooks có thể là Record của DataManager (mapping chỉ đọc): chuyển về dict khi ghi
+                # json.dumps dùng bộ mã hoá C, nhanh hơn nhiều so với json.dump ghi từng mảnh
+                f.write(json.dumps([dict(e) for e in ebooks], ensure_ascii=False, separators=(",", ":")))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._compacted = True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @traced("storage.json.upsert_many", "storage")
+    def upsert_many(self, changed, ebooks):
+        # JSON không cập nhật được từng dòng: ghi lại toàn bộ danh sách
+        self.save(ebooks)
+
+    @traced("storage.json.delete_many", "storage")
+    def delete_many(self, filenames, ebooks):
+        # ebooks là danh sách còn lại sau khi đã gỡ filenames
+        self.save(ebooks)
+
+    @traced("storage.json.compact", "storage")
+    def compact(self, ebooks):
+        # Ghi lại file gọn (không thụt lề); bỏ qua nếu tiến trình này đã ghi file rồi
+        if not self._compacted:
+            self.save(ebooks)
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ebooks (
+            id INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL UNIQUE,
+            title TEXT,
+            author TEXT,
+            is_read INTEGER NOT NULL DEFAULT 0,
+            is_favorite INTEGER NOT NULL DEFAULT 0,
+            is_deleted INTEGER NOT NULL DEFAULT 0,
+            last_read TEXT,
+            extra TEXT
+        );
+        -- Bộ đếm được tính trên chỉ mục trong bộ nhớ của DataManager: các index đếm cũ chỉ làm chậm UPDATE
+        DROP INDEX IF EXISTS idx_ebooks_read;
+        DROP INDEX IF EXISTS idx_ebooks_favorite;
+        DROP INDEX IF EXISTS idx_ebooks_last_read;
+    """
+
+    UPSERT = (
+        "INSERT INTO ebooks "
+        "(filename, title, author, is_read, is_favorite, is_deleted, last_read, extra) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(filename) DO UPDATE SET "
+        "title = excluded.title, author = excluded.author, "
+        "is_read = excluded.is_read, is_favorite = excluded.is_favorite, "
+        "is_deleted = excluded.is_deleted, last_read = excluded.last_read, "
+        "extra = excluded.extra"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _to_row(ebook):
+        extra = {k: v for k, v in ebook.items() if k not in FIELDS}
+        return (
+            ebook["filename"],
+            ebook.get("title"),
+            ebook.get("author"),
+            int(bool(ebook.get("is_read", False))),
+            int(bool(ebook.get("is_favorite", False))),
+            int(bool(ebook.get("is_deleted", False))),
+            ebook.get("last_read"),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    @staticmethod
+    def _from_row(row):
+        ebook = dict(zip(FIELDS, row[:-1]))
+        for field in ("title", "author"):
+            if ebook[field] is None:
+                del ebook[field]
+        for field in BOOL_FIELDS:
+            ebook[field] = bool(ebook[field])
+        if row[-1]:
+            ebook.update(json.loads(row[-1]))
+        return ebook
+
+    def stamp(self):
+        # data_version chỉ đổi khi một kết nối khác commit vào file
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @traced("storage.sqlite.load", "storage", size=len)
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, title, author, is_read, is_favorite, is_deleted, last_read, extra "
+                "FROM ebooks ORDER BY id"
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    @traced("storage.sqlite.save", "storage")
+    def save(self, ebooks):
+        rows = [self._to_row(e) for e in ebooks if e.get("filename") is not None]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ebooks")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO ebooks "
+                "(filename, title, author, is_read, is_favorite, is_deleted, last_read, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    @traced("storage.sqlite.upsert_many", "storage")
+    def upsert_many(self, changed, ebooks=None):
+        with self._lock, self._conn:
+            self._conn.executemany(self.UPSERT, [self._to_row(e) for e in changed])
+
+    @traced("storage.sqlite.delete_many", "storage")
+    def delete_many(self, filenames, ebooks=None):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM ebooks WHERE filename = ?", [(f,) for f in filenames])
+
+    @traced("storage.sqlite.compact", "storage")
+    def compact(self, ebooks=None):
+        # Trả lại cho hệ điều hành các trang đã trống sau khi xoá bản ghi, rồi thu gọn file WAL
+        with self._lock:
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM ebooks LIMIT 1").fetchone() is None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_file, db_file):
+    """Chuyển ebooks.json sang SQLite một lần; file JSON được giữ lại với đuôi .migrated."""
+    storage = SQLiteStorage(db_file)
+    if not os.path.exists(json_file) or not storage.is_empty():
+        return storage
+    storage.save(JsonStorage(json_file).load())
+    os.replace(json_file, json_file + ".migrated")
+    return storage
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 4
+
+
+class Task:
+    def __init__(self, channel):
+        self.channel = channel
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class TaskRunner:
+    """Chạy việc I/O và phân tích sách ngoài luồng xử lý sự kiện của Flet.
+
+    Mỗi task thuộc một channel (ví dụ "open"); task mới trên cùng channel huỷ task cũ,
+    kết quả của task đã bị huỷ không bao giờ được đưa lên UI.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ebook-task")
+        self._lock = threading.Lock()
+        self._current = {}
+
+    def submit(self, channel, fn, *args, on_done=None, on_error=None, on_discard=None, **kwargs):
+        task = Task(channel)
+        with self._lock:
+            previous = self._current.get(channel)
+            self._current[channel] = task
+        if previous is not None:
+            previous.cancel()
+        task.future = self._executor.submit(
+            self._run, task, fn, args, kwargs, on_done, on_error, on_discard
+        )
+        return task
+
+    def cancel(self, channel):
+        with self._lock:
+            task = self._current.pop(channel, None)
+        if task is not None:
+            task.cancel()
+
+    def _finish(self, task):
+        with self._lock:
+            if self._current.get(task.channel) is task:
+                del self._current[task.channel]
+
+    def _run(self, task, fn, args, kwargs, on_done, on_error, on_discard):
+        if task.cancelled:
+            return None
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._fail(task, e, on_error)
+            return None
+        return self._deliver(task, result, on_done, on_discard)
+
+    def _fail(self, task, e, on_error):
+        self._finish(task)
+        if task.cancelled:
+            return
+        if on_error is not None:
+            on_error(e)
+        else:
+            print(f"Error in background task '{task.channel}': {e}")
+
+    def _deliver(self, task, result, on_done, on_discard):
+        self._finish(task)
+        if task.cancelled:
+            # Kết quả đã cũ: trả lại tài nguyên (file, mmap...) thay vì hiển thị
+            if on_discard is not None:
+                on_discard(result)
+            return None
+        if on_done is not None:
+            try:
+                on_done(result)
+            except Exception as e:
+                print(f"Error handling result of '{task.channel}': {e}")
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            tasks = list(self._current.values())
+            self._current.clear()
+        for task in tasks:
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncTaskRunner(TaskRunner):
+    """TaskRunner cho bản asyncio: việc chặn chạy qua asyncio.to_thread, callback chạy trên event loop.
+
+    Task bị huỷ không huỷ coroutine đang chờ: kết quả vẫn được nhận về để on_discard giải phóng.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._lock = threading.Lock()
+        self._current = {}
+
+    def submit(self, channel, fn, *args, on_done=None, on_error=None, on_discard=None, **kwargs):
+        task = Task(channel)
+        with self._lock:
+            previous = self._current.get(channel)
+            self._current[channel] = task
+        if previous is not None:
+            previous.cancel()
+        asyncio.run_coroutine_threadsafe(
+            self._run_async(task, fn, args, kwargs, on_done, on_error, on_discard), self.loop
+        )
+        return task
+
+    async def _run_async(self, task, fn, args, kwargs, on_done, on_error, on_discard):
+        if task.cancelled:
+            return None
+        try:
+            result = await asyncio.to_thread(fn, *args, **kwargs)
+        except Exception as e:
+            self._fail(task, e, on_error)
+            return None
+        return self._deliver(task, result, on_done, on_discard)
+
+    def shutdown(self):
+        with self._lock:
+            tasks = list(self._current.values())
+            self._current.clear()
+        for task in tasks:
+            task.cancel()
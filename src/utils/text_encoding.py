@@ -0,0 +1,304 @@
+import codecs
+import functools
+import re
+import unicodedata
+
+# Đoạn đầu file dùng để đoán bảng mã
+SAMPLE_BYTES = 64 * 1024
+# Chấm điểm các bảng mã cũ chậm hơn nhiều so với thử UTF-8: chỉ dùng phần đầu của mẫu
+SCORE_BYTES = 8 * 1024
+DECODE_CHUNK = 256 * 1024
+
+# BOM dài hơn phải đứng trước (BOM UTF-32-LE bắt đầu bằng BOM UTF-16-LE)
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# Các bảng mã tiếng Việt cũ, thử lần lượt khi file không phải UTF-8/UTF-16
+LEGACY_ENCODINGS = ("cp1258", "tcvn3", "vni")
+# Bảng mã ghi dấu thanh bằng ký tự tổ hợp: phải chuẩn hoá NFC sau khi giải mã
+COMPOSING_ENCODINGS = ("cp1258", "vni")
+
+# TCVN3 (ABC): chữ có dấu nằm ở 0xA1-0xFE, byte còn lại giữ như Latin-1
+_TCVN3 = {
+    0xA1: "Ă", 0xA2: "Â", 0xA3: "Ê", 0xA4: "Ô", 0xA5: "Ơ", 0xA6: "Ư", 0xA7: "Đ",
+    0xA8: "ă", 0xA9: "â", 0xAA: "ê", 0xAB: "ô", 0xAC: "ơ", 0xAD: "ư", 0xAE: "đ",
+    0xB5: "à", 0xB6: "ả", 0xB7: "ã", 0xB8: "á", 0xB9: "ạ",
+    0xBB: "ằ", 0xBC: "ẳ", 0xBD: "ẵ", 0xBE: "ắ", 0xC6: "ặ",
+    0xC7: "ầ", 0xC8: "ẩ", 0xC9: "ẫ", 0xCA: "ấ", 0xCB: "ậ",
+    0xCC: "è", 0xCE: "ẻ", 0xCF: "ẽ", 0xD0: "é", 0xD1: "ẹ",
+    0xD2: "ề", 0xD3: "ể", 0xD4: "ễ", 0xD5: "ế", 0xD6: "ệ",
+    0xD7: "ì", 0xD8: "ỉ", 0xDC: "ĩ", 0xDD: "í", 0xDE: "ị",
+    0xDF: "ò", 0xE1: "ỏ", 0xE2: "õ", 0xE3: "ó", 0xE4: "ọ",
+    0xE5: "ồ", 0xE6: "ổ", 0xE7: "ỗ", 0xE8: "ố", 0xE9: "ộ",
+    0xEA: "ờ", 0xEB: "ở", 0xEC: "ỡ", 0xED: "ớ", 0xEE: "ợ",
+    0xEF: "ù", 0xF1: "ủ", 0xF2: "ũ", 0xF3: "ú", 0xF4: "ụ",
+    0xF5: "ừ", 0xF6: "ử", 0xF7: "ữ", 0xF8: "ứ", 0xF9: "ự",
+    0xFA: "ỳ", 0xFB: "ỷ", 0xFC: "ỹ", 0xFD: "ý", 0xFE: "ỵ",
+}
+
+# VNI Windows: chữ gốc ASCII + một byte dấu (ví dụ "Vieät" = "Việt"); giải mã ra dấu tổ hợp rồi NFC
+_VNI_UPPER = {
+    "Ù": "\u0301", "Ø": "\u0300", "Û": "\u0309", "Õ": "\u0303", "Ï": "\u0323",
+    "Â": "\u0302", "Á": "\u0302\u0301", "À": "\u0302\u0300", "Å": "\u0302\u0309",
+    "Ã": "\u0302\u0303", "Ä": "\u0302\u0323",
+    "Ê": "\u0306", "É": "\u0306\u0301", "È": "\u0306\u0300", "Ú": "\u0306\u0309",
+    "Ü": "\u0306\u0303", "Ë": "\u0306\u0323",
+    "Ô": "Ơ", "Ö": "Ư", "Ñ": "Đ",
+    "Í": "Í", "Ì": "Ì", "Æ": "Ỉ", "Ó": "Ĩ", "Ò": "Ị", "Î": "Ỵ",
+}
+_VNI = {}
+for _byte, _text in _VNI_UPPER.items():
+    _VNI[ord(_byte)] = _text
+    # Bản chữ thường của byte dấu cách bản chữ hoa 0x20
+    _VNI[ord(_byte) + 0x20] = _text.lower()
+
+
+def _decoding_map(mapping):
+    table = {i: chr(i) for i in range(256)}
+    table.update(mapping)
+    if all(len(text) == 1 for text in table.values()):
+        # Mỗi byte đúng một ký tự: bảng dạng chuỗi giải mã nhanh hơn dict nhiều lần
+        return "".join(table[i] for i in range(256))
+    return table
+
+
+def _encoding_map(decoding_map):
+    """Đảo bảng giải mã: mỗi ký tự (NFC) -> chuỗi byte ngắn nhất giải mã ra nó."""
+    if isinstance(decoding_map, str):
+        decoding_map = dict(enumerate(decoding_map))
+    singles = {b: unicodedata.normalize("NFC", text) for b, text in decoding_map.items()}
+    table = {}
+    for b, text in singles.items():
+        if len(text) == 1 and unicodedata.combining(text) == 0:
+            table.setdefault(text, bytes([b]))
+    for b1, base in singles.items():
+        if len(base) != 1 or unicodedata.combining(base) != 0:
+            continue
+        for b2, mark in singles.items():
+            if not unicodedata.combining(mark[0]):
+                continue
+            text = unicodedata.normalize("NFC", decoding_map[b1] + decoding_map[b2])
+            if len(text) == 1:
+                table.setdefault(text, bytes([b1, b2]))
+    return table
+
+
+class _CharmapCodec:
+    # Codec một byte dựa trên bảng map; bảng mã hoá chỉ dựng khi cần (dùng cho benchmark, chuyển đổi)
+    def __init__(self, name, mapping):
+        self.name = name
+        self.decoding_map = _decoding_map(mapping)
+        self._encoding_map = None
+
+    def decode(self, data, errors="strict"):
+        return codecs.charmap_decode(data, errors, self.decoding_map)
+
+    def encode(self, text, errors="strict"):
+        if self._encoding_map is None:
+            self._encoding_map = _encoding_map(self.decoding_map)
+        out = bytearray()
+        for ch in unicodedata.normalize("NFC", text):
+            encoded = self._encoding_map.get(ch)
+            if encoded is None:
+                if errors == "strict":
+                    raise UnicodeEncodeError(self.name, ch, 0, 1, "character not in table")
+                encoded = b"" if errors == "ignore" else b"?"
+            out += encoded
+        return bytes(out), len(text)
+
+    def codec_info(self):
+        codec = self
+
+        class IncrementalDecoder(codecs.IncrementalDecoder):
+            # Mỗi byte giải mã độc lập nên không cần giữ trạng thái giữa các chunk
+            def decode(self, data, final=False):
+                return codec.decode(data, self.errors)[0]
+
+        class IncrementalEncoder(codecs.IncrementalEncoder):
+            def encode(self, text, final=False):
+                return codec.encode(text, self.errors)[0]
+
+        return codecs.CodecInfo(
+            name=self.name,
+            encode=self.encode,
+            decode=self.decode,
+            incrementaldecoder=IncrementalDecoder,
+            incrementalencoder=IncrementalEncoder,
+        )
+
+
+_CODECS = {
+    "tcvn3": _CharmapCodec("tcvn3", _TCVN3),
+    "vni": _CharmapCodec("vni", _VNI),
+}
+
+
+def _search(name):
+    codec = _CODECS.get(name.replace("-", "").replace("_", ""))
+    return codec.codec_info() if codec is not None else None
+
+
+codecs.register(_search)
+
+
+@functools.lru_cache(maxsize=1024)
+def _encode_cp1258_char(ch, errors):
+    # cp1258 chỉ có sẵn chữ mang dấu mũ/móc/trăng; dấu thanh luôn là ký tự tổ hợp đứng sau
+    try:
+        return ch.encode("cp1258")
+    except UnicodeEncodeError:
+        pass
+    decomposed = unicodedata.normalize("NFD", ch)
+    base = "".join(c for c in decomposed if c not in _TONE_MARKS)
+    tones = "".join(c for c in decomposed if c in _TONE_MARKS)
+    return (unicodedata.normalize("NFC", base) + tones).encode("cp1258", errors)
+
+
+def _legacy_encode_cp1258(text, errors="strict"):
+    return b"".join(_encode_cp1258_char(ch, errors) for ch in unicodedata.normalize("NFC", text))
+
+
+def encode_text(text, encoding, errors="strict"):
+    """Mã hoá ngược lại (dùng để tạo dữ liệu thử); với cp1258 tách dấu thanh như Windows vẫn làm."""
+    if encoding == "cp1258":
+        return _legacy_encode_cp1258(text, errors)
+    return text.encode(encoding, errors)
+
+
+def decode_bytes(data, encoding, errors="replace"):
+    text = bytes(data).decode(encoding, errors)
+    if encoding in COMPOSING_ENCODINGS:
+        text = unicodedata.normalize("NFC", text)
+    return text
+
+
+def bom_length(data, encoding):
+    for bom, name in BOMS:
+        if name == encoding and data[:len(bom)] == bom:
+            return len(bom)
+    return 0
+
+
+# --- Đoán bảng mã ---
+
+_TONE_MARKS = "\u0300\u0301\u0303\u0309\u0323"
+_WORD = re.compile(r"\w+")
+# Những từ rất thường gặp; giải mã sai bảng mã gần như không bao giờ tạo ra chúng
+_COMMON_WORDS = frozenset(
+    "của và là có không người một những được trong cho này với đã các đến khi thì như "
+    "lại đi về cũng rằng nhưng đó sẽ năm ngày nhà con thế gì làm biết nhiều hơn vào mà để "
+    "từ bị chỉ vì nên còn theo đây lên ở ông bà tôi mình nói ra ta anh em chúng họ sau trên "
+    "dưới đầu việc mới đều rồi nữa hay thấy muốn phải cả chương sách".split()
+)
+
+
+def _is_vietnamese_letter(ch):
+    base = unicodedata.normalize("NFD", ch)
+    return ch in "đĐ" or (len(base) > 1 and base[0].lower() in "aeiouy"
+                          and all(c in _TONE_MARKS + "\u0302\u0306\u031b" for c in base[1:]))
+
+
+# Mọi chữ cái tiếng Việt có dấu (dựng sẵn) đều nằm trong khoảng U+00C0-U+1EF9
+_VIETNAMESE_LETTERS = frozenset(c for c in map(chr, range(0xC0, 0x1EFA)) if _is_vietnamese_letter(c))
+_vietnamese_letter = _VIETNAMESE_LETTERS.__contains__
+
+
+def _score(text):
+    """Điểm cho một cách giải mã: từ thông dụng tìm được, trừ ký tự vô lý (điều khiển, dấu lẻ, ký hiệu)."""
+    common = 0
+    valid = 0
+    for word in _WORD.findall(text.lower()):
+        if word in _COMMON_WORDS:
+            common += 1
+        if not word.isascii() and all(c.isascii() or _vietnamese_letter(c) for c in word):
+            tones = sum(c in _TONE_MARKS for c in unicodedata.normalize("NFD", word))
+            valid += tones <= 1
+    bad = 0
+    for ch in text:
+        if ch.isascii():
+            if ch < " " and ch not in "\t\n\r\f":
+                bad += 1
+        elif unicodedata.combining(ch) or unicodedata.category(ch)[0] in "CS" or not (
+            _vietnamese_letter(ch) or unicodedata.category(ch)[0] in "PZ"
+        ):
+            bad += 1
+    return common * 4 + valid - bad * 3
+
+
+def _utf16_without_bom(sample):
+    # Văn bản UTF-16 không BOM: chữ ASCII (phần lớn văn bản tiếng Việt) có byte 0 ở cùng một phía
+    if len(sample) < 4:
+        return None
+    even = sample[0::2].count(0)
+    odd = sample[1::2].count(0)
+    half = len(sample) // 2
+    if odd > half * 0.3 and even < half * 0.05:
+        candidate = "utf-16-le"
+    elif even > half * 0.3 and odd < half * 0.05:
+        candidate = "utf-16-be"
+    else:
+        return None
+    try:
+        codecs.getincrementaldecoder(candidate)("strict").decode(sample[:len(sample) & ~1])
+    except UnicodeDecodeError:
+        return None
+    return candidate
+
+
+def detect_encoding(sample):
+    """Đoán bảng mã từ đoạn đầu file: BOM, UTF-16 không BOM, UTF-8, rồi các bảng mã tiếng Việt cũ."""
+    for bom, name in BOMS:
+        if sample.startswith(bom):
+            return name
+    utf16 = _utf16_without_bom(sample)
+    if utf16 is not None:
+        return utf16
+    try:
+        # final=False: ký tự nhiều byte bị cắt ở cuối mẫu không làm hỏng phép thử
+        codecs.getincrementaldecoder("utf-8")("strict").decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    sample = sample[:SCORE_BYTES]
+    return max(LEGACY_ENCODINGS, key=lambda name: _score(decode_bytes(sample, name)))
+
+
+def detect_file_encoding(path, sample_bytes=SAMPLE_BYTES):
+    with open(path, "rb") as f:
+        return detect_encoding(f.read(sample_bytes))
+
+
+def iter_decoded(path, encoding=None, chunk_size=DECODE_CHUNK):
+    """Giải mã file theo từng chunk với bộ nhớ cố định; encoding=None thì tự đoán từ đoạn đầu."""
+    with open(path, "rb") as f:
+        head = f.read(chunk_size)
+        if encoding is None:
+            encoding = detect_encoding(head[:SAMPLE_BYTES])
+        decoder = codecs.getincrementaldecoder(encoding)("replace")
+        normalize = encoding in COMPOSING_ENCODINGS
+        pending = ""
+        data = head[bom_length(head, encoding):]
+        while True:
+            final = len(data) == 0
+            text = pending + decoder.decode(data, final=final)
+            pending = ""
+            if normalize and not final:
+                # Giữ lại chữ cuối cùng cùng các dấu tổ hợp theo sau để NFC không bị cắt ngang chunk
+                cut = len(text)
+                while cut > 0 and unicodedata.combining(text[cut - 1]):
+                    cut -= 1
+                cut = max(cut - 1, 0)
+                text, pending = text[:cut], text[cut:]
+            if text:
+                yield unicodedata.normalize("NFC", text) if normalize else text
+            if final:
+                return
+            data = f.read(chunk_size)
+
+
+def read_text(path, encoding=None):
+    return "".join(iter_decoded(path, encoding))
@@ -0,0 +1,142 @@
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+from src.utils.text_encoding import SAMPLE_BYTES, bom_length, decode_bytes, detect_encoding
+
+PAGE_BYTES = 16 * 1024
+INDEX_CACHE_SIZE = 32
+
+# Chỉ mục trang theo từng file: (path, size, mtime_ns) -> array các offset đầu trang
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _cache_key(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def _code_unit(encoding):
+    if encoding.startswith("utf-16"):
+        return 2
+    if encoding.startswith("utf-32"):
+        return 4
+    return 1
+
+
+def _find_newline(buf, newline, start, end, origin, unit):
+    # Với UTF-16/32 chỉ nhận dấu xuống dòng nằm đúng ranh giới code unit
+    pos = buf.find(newline, start, end)
+    while pos != -1 and (pos - origin) % unit:
+        pos = buf.find(newline, pos + 1, end)
+    return pos
+
+
+def _split_point(buf, pos, floor, encoding, origin, unit):
+    # Dòng quá dài: cắt giữa dòng nhưng không cắt giữa một ký tự
+    if unit > 1:
+        pos -= (pos - origin) % unit
+        if encoding.startswith("utf-16"):
+            # Không tách cặp surrogate (low surrogate 0xDC00-0xDFFF)
+            high = buf[pos + 1] if encoding.endswith("le") else buf[pos]
+            if 0xDC <= high <= 0xDF and pos - unit > floor:
+                pos -= unit
+        return pos
+    if encoding.startswith("utf-8"):
+        while pos > floor + 1 and (buf[pos] & 0xC0) == 0x80:
+            pos -= 1
+    return pos
+
+
+def build_page_index(buf, size, page_bytes=PAGE_BYTES, encoding="utf-8", start=0):
+    """Chia file thành các trang ~page_bytes, kết thúc ở cuối dòng khi có thể.
+
+    start bỏ qua BOM; với UTF-16/32 trang luôn bắt đầu ở ranh giới code unit.
+    """
+    unit = _code_unit(encoding)
+    newline = b"\n" if unit == 1 else "\n".encode(encoding)
+    offsets = array("Q", [start])
+    pos = start
+    while pos < size:
+        target = pos + page_bytes
+        if target >= size:
+            pos = size
+        else:
+            found = _find_newline(buf, newline, target, min(size, target + page_bytes), start, unit)
+            if found != -1:
+                pos = found + len(newline)
+            else:
+                pos = _split_point(buf, target, offsets[-1], encoding, start, unit)
+        offsets.append(pos)
+    return offsets
+
+
+def get_page_index(path, buf, size, page_bytes=PAGE_BYTES, encoding="utf-8", start=0):
+    key = _cache_key(path) + (page_bytes, encoding)
+    with _index_lock:
+        offsets = _index_cache.get(key)
+        if offsets is not None:
+            _index_cache.move_to_end(key)
+            return offsets
+    offsets = build_page_index(buf, size, page_bytes, encoding, start)
+    with _index_lock:
+        _index_cache[key] = offsets
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return offsets
+
+
+class TextPager:
+    def __init__(self, path, encoding=None, page_bytes=PAGE_BYTES):
+        # encoding=None: đoán từ đoạn đầu file (xem text_encoding.detect_encoding)
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size:
+            self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buf = b""
+        self.encoding = encoding or detect_encoding(self._buf[:SAMPLE_BYTES])
+        start = bom_length(self._buf[:4], self.encoding)
+        self._offsets = get_page_index(path, self._buf, self.size, page_bytes, self.encoding, start)
+
+    @property
+    def page_count(self):
+        return len(self._offsets) - 1
+
+    def page_range(self, index):
+        return self._offsets[index], self._offsets[index + 1]
+
+    def page_for_offset(self, offset):
+        lo, hi = 0, self.page_count - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._offsets[mid] <= offset:
+                lo = mid
+            else:
+                hi = mid - 1
+        return max(lo, 0)
+
+    def page(self, index):
+        if not 0 <= index < self.page_count:
+            return ""
+        start, end = self.page_range(index)
+        return decode_bytes(self._buf[start:end], self.encoding)
+
+    def window(self, first, count):
+        last = min(self.page_count, first + count)
+        return [self.page(i) for i in range(max(first, 0), last)]
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
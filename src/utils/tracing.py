@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Bật bằng biến môi trường EBOOK_TRACE=1 hoặc gọi enable() (ví dụ khi mở overlay hiệu năng)
+ENABLED = os.environ.get("EBOOK_TRACE", "") not in ("", "0")
+BUFFER_SIZE = 4096
+
+_events = deque(maxlen=BUFFER_SIZE)
+_pid = os.getpid()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        # deque.append là nguyên tử nên không cần khoá giữa các luồng
+        _events.append((self.name, self.category, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+    def set(self, **args):
+        # Ghi thêm thông tin biết được giữa chừng, ví dụ kích thước dữ liệu đã đọc
+        self.args.update(args)
+
+
+def span(name, category="app", **args):
+    """Đo một đoạn code: `with span("epub.parse", "io", size=n) as s: ...`; gần như miễn phí khi tắt."""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name=None, category="app", size=None):
+    """Decorator đo thời gian một hàm; size(result) (nếu có) được ghi thành kích thước payload."""
+
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(label, category, {}) as current:
+                result = fn(*args, **kwargs)
+                if size is not None and result is not None:
+                    try:
+                        current.args["size"] = size(result)
+                    except TypeError:
+                        pass
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def summary():
+    """Thống kê theo tên span trong ring buffer: số lần, trung bình, lớn nhất và lần gần nhất (ms)."""
+    stats = {}
+    for name, cat, _, dur, _, _ in list(_events):
+        entry = stats.get(name)
+        if entry is None:
+            entry = stats[name] = {"category": cat, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        ms = dur / 1e6
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        entry["last_ms"] = ms
+    for entry in stats.values():
+        entry["avg_ms"] = entry["total_ms"] / entry["count"]
+    return stats
+
+
+def export_chrome_trace(path):
+    """Ghi ring buffer ra định dạng Chrome trace (mở bằng chrome://tracing hoặc Perfetto)."""
+    events = [
+        {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": dur / 1000,
+            "pid": _pid,
+            "tid": tid,
+            "args": args,
+        }
+        for name, cat, start, dur, tid, args in list(_events)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+    return len(events)
@@ -0,0 +1,49 @@
+import threading
+
+FRAME_SECONDS = 1 / 60
+
+
+class UpdateBatcher:
+    """Gom mọi yêu cầu cập nhật control trong cùng một khung hình thành một lần page.update.
+
+    Hover hay cuộn liên tục chỉ gửi trạng thái cuối cùng của control xuống client.
+    An toàn khi gọi từ bất kỳ luồng nào; việc gửi diễn ra trên event loop của trang nếu có.
+    """
+
+    def __init__(self, page, loop=None, frame=FRAME_SECONDS):
+        self.page = page
+        self.loop = loop
+        self.frame = frame
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._scheduled = False
+
+    def request(self, control):
+        with self._lock:
+            self._dirty[id(control)] = control
+            if self._scheduled:
+                return
+            self._scheduled = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.call_later, self.frame, self.flush)
+        else:
+            timer = threading.Timer(self.frame, self.flush)
+            timer.daemon = True
+            timer.start()
+
+    def flush(self):
+        with self._lock:
+            controls = list(self._dirty.values())
+            self._dirty = {}
+            self._scheduled = False
+        controls = [c for c in controls if c.page]
+        if controls:
+            self.page.update(*controls)
+
+
+def request_update(batcher, control):
+    # Không có batcher (bản đồng bộ): cập nhật ngay như trước
+    if batcher is not None:
+        batcher.request(control)
+    elif control.page:
+        control.update()
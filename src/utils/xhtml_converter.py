@@ -0,0 +1,206 @@
+import posixpath
+import re
+import xml.parsers.expat
+from html.entities import name2codepoint
+from html.parser import HTMLParser
+from urllib.parse import unquote
+
+# Cờ kiểu chữ của một span, kết hợp bằng OR
+BOLD = 1
+ITALIC = 2
+UNDERLINE = 4
+CODE = 8
+
+FEED_CHUNK = 64 * 1024
+
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+BLOCK_KINDS = {
+    "p": "p", "div": "p", "section": "p", "article": "p", "body": "p",
+    "li": "li", "dt": "p", "dd": "p", "tr": "p", "td": "p", "th": "p", "figcaption": "p",
+    "blockquote": "quote", "pre": "pre",
+    "h1": "h1", "h2": "h2", "h3": "h3", "h4": "h4", "h5": "h5", "h6": "h6",
+}
+STYLE_TAGS = {
+    "b": BOLD, "strong": BOLD, "i": ITALIC, "em": ITALIC, "cite": ITALIC,
+    "u": UNDERLINE, "ins": UNDERLINE, "code": CODE, "kbd": CODE, "tt": CODE, "samp": CODE,
+}
+SKIP_TAGS = {"head", "script", "style", "title", "math"}
+
+_WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+
+
+def _local(name):
+    return name.rsplit("}", 1)[-1].rsplit(":", 1)[-1].lower()
+
+
+class SpanBuilder:
+    """Dựng mô hình block/span từ các sự kiện start/end/data của một parser bất kỳ.
+
+    Kết quả là danh sách block dạng JSON: {"kind": "p"|"h1".."h6"|"li"|"quote"|"pre",
+    "spans": [[text, flags] hoặc [text, flags, href], ...]} và {"kind": "img", "src", "alt"}.
+    """
+
+    def __init__(self, base_dir=""):
+        self.base_dir = base_dir
+        self.blocks = []
+        self._kinds = []
+        self._spans = []
+        self._flags = [0]
+        self._links = [None]
+        self._skip = 0
+        self._pre = 0
+
+    def _kind(self):
+        return self._kinds[-1] if self._kinds else "p"
+
+    def _flush(self):
+        spans = self._spans
+        self._spans = []
+        if not spans:
+            return
+        if self._kind() != "pre":
+            # Gộp khoảng trắng như trình duyệt, bỏ khoảng trắng ở hai đầu block
+            collapsed = []
+            after_space = True
+            for span in spans:
+                text = _WHITESPACE.sub(" ", span[0])
+                if after_space and text.startswith(" "):
+                    text = text[1:]
+                if not text:
+                    continue
+                after_space = text.endswith(" ")
+                collapsed.append([text] + span[1:])
+            if collapsed:
+                collapsed[-1][0] = collapsed[-1][0].rstrip(" ")
+                if not collapsed[-1][0]:
+                    collapsed.pop()
+            spans = collapsed
+        if spans and any(span[0].strip() for span in spans):
+            self.blocks.append({"kind": self._kind(), "spans": spans})
+
+    def start(self, tag, attrs):
+        tag = _local(tag)
+        if self._skip:
+            self._skip += 1
+            return
+        if tag in SKIP_TAGS:
+            self._skip = 1
+            return
+        if tag in BLOCK_KINDS:
+            self._flush()
+            self._kinds.append(BLOCK_KINDS[tag])
+            if tag == "pre":
+                self._pre += 1
+        elif tag == "br":
+            self.data("\n" if self._pre else " ")
+        elif tag == "img" or tag == "image":
+            self._flush()
+            src = attrs.get("src") or attrs.get("href") or attrs.get("xlink:href")
+            if src:
+                self.blocks.append({
+                    "kind": "img",
+                    "src": posixpath.normpath(posixpath.join(self.base_dir, unquote(src))),
+                    "alt": attrs.get("alt", ""),
+                })
+        self._flags.append(self._flags[-1] | STYLE_TAGS.get(tag, 0))
+        href = attrs.get("href") if tag == "a" else None
+        self._links.append(href or self._links[-1])
+
+    def end(self, tag):
+        tag = _local(tag)
+        if self._skip:
+            self._skip -= 1
+            return
+        if tag in BLOCK_KINDS:
+            self._flush()
+            if self._kinds:
+                self._kinds.pop()
+            if tag == "pre":
+                self._pre = max(0, self._pre - 1)
+        if len(self._flags) > 1:
+            self._flags.pop()
+            self._links.pop()
+
+    def data(self, text):
+        if self._skip or not text:
+            return
+        flags, href = self._flags[-1], self._links[-1]
+        last = self._spans[-1] if self._spans else None
+        if last is not None and last[1] == flags and (last[2] if len(last) > 2 else None) == href:
+            last[0] += text
+        else:
+            self._spans.append([text, flags, href] if href else [text, flags])
+
+    def close(self):
+        self._flush()
+        return self.blocks
+
+
+def _expat_blocks(chunks, base_dir):
+    builder = SpanBuilder(base_dir)
+    parser = xml.parsers.expat.ParserCreate()
+    # DTD ngoài không được nạp: các thực thể HTML như &nbsp; được báo qua SkippedEntityHandler
+    parser.UseForeignDTD(True)
+    parser.SetParamEntityParsing(xml.parsers.expat.XML_PARAM_ENTITY_PARSING_NEVER)
+    parser.buffer_text = True
+    parser.StartElementHandler = builder.start
+    parser.EndElementHandler = builder.end
+    parser.CharacterDataHandler = builder.data
+    parser.SkippedEntityHandler = lambda name, is_param: builder.data(
+        chr(name2codepoint[name]) if name in name2codepoint else ""
+    )
+    for chunk in chunks:
+        parser.Parse(chunk, False)
+    parser.Parse(b"", True)
+    return builder.close()
+
+
+class _HtmlDriver(HTMLParser):
+    def __init__(self, builder):
+        super().__init__(convert_charrefs=True)
+        self.builder = builder
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, {k: v or "" for k, v in attrs})
+        if tag in ("br", "img", "hr", "meta", "link", "input"):
+            self.builder.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.start(tag, {k: v or "" for k, v in attrs})
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+
+def _html_blocks(data, base_dir):
+    builder = SpanBuilder(base_dir)
+    driver = _HtmlDriver(builder)
+    text = data.decode("utf-8", errors="replace")
+    for start in range(0, len(text), FEED_CHUNK):
+        driver.feed(text[start:start + FEED_CHUNK])
+    driver.close()
+    return builder.close()
+
+
+def convert(data, base_dir=""):
+    """Chuyển XHTML (bytes) của một chương thành danh sách block; HTML lỗi cú pháp dùng HTMLParser."""
+    try:
+        return _expat_blocks(
+            (data[i:i + FEED_CHUNK] for i in range(0, len(data), FEED_CHUNK)), base_dir
+        )
+    except xml.parsers.expat.ExpatError:
+        return _html_blocks(data, base_dir)
+
+
+def block_text(block):
+    if block["kind"] == "img":
+        return ""
+    return "".join(span[0] for span in block["spans"])
+
+
+def blocks_to_text(blocks):
+    return "\n\n".join(text for text in (block_text(b) for b in blocks) if text)
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from src.utils.data_manager import DataManager
+from src.utils.importer import BookImporter, new_record
+
+
+class ImportTrashedTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.ebook_dir = os.path.join(self._tmp.name, "ebooks")
+        os.makedirs(self.ebook_dir)
+        self.manager = DataManager(os.path.join(self._tmp.name, "library.db"))
+        self.importer = BookImporter(self.manager, self.ebook_dir)
+
+    def tearDown(self):
+        self.manager.close()
+        self._tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_reimport_restores_legacy_trashed_book(self):
+        # Sách xoá từ bản cũ: nằm trong thùng rác và chưa có fingerprint
+        self.write(os.path.join(self.ebook_dir, "book.txt"), "Same content\n")
+        self.manager.add_ebooks([dict(new_record("book.txt"), is_deleted=True)])
+        source = self.write(os.path.join(self._tmp.name, "book.txt"), "Same content\n")
+        added, names = self.importer.import_paths([source])
+        self.assertEqual((added, names), (1, ["book.txt"]))
+        self.assertEqual(self.manager.filenames("all"), ["book.txt"])
+        self.assertEqual(self.manager.filenames("deleted"), [])
+        self.assertFalse(os.path.exists(os.path.join(self.ebook_dir, "book (2).txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
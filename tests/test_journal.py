@@ -0,0 +1,153 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from src.utils import data_manager
+from src.utils.data_manager import JOURNAL_SUFFIX, DataManager
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Tiến trình con ghi vài thay đổi rồi chết ngay (os._exit: không flush, không close)
+CRASH_SCRIPT = """
+import os, sys
+from src.utils.data_manager import DataManager
+manager = DataManager(sys.argv[1])
+manager.add_ebooks([{"filename": f"book-{i}.txt", "title": f"Book {i}"} for i in range(3)])
+manager.mark_as_read("book-1.txt")
+manager.toggle_favorite("book-2.txt")
+manager.set_position("book-0.txt", 2, 340)
+os._exit(0)
+"""
+
+
+def crash_after_mutations(path):
+    subprocess.run([sys.executable, "-c", CRASH_SCRIPT, path], cwd=ROOT, check=True)
+
+
+class JournalRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def assert_recovered(self, path):
+        manager = DataManager(path)
+        try:
+            self.assertEqual(manager.count_all(), 3)
+            self.assertEqual(manager.count_read(), 1)
+            self.assertEqual(manager.count_favorite(), 1)
+            self.assertEqual(manager.get_position("book-0.txt"), (2, 340))
+        finally:
+            manager.close()
+        # Journal đã được ghi xuống storage và xoá; mở lại lần nữa không cần journal
+        self.assertFalse(os.path.exists(path + JOURNAL_SUFFIX))
+        manager = DataManager(path)
+        try:
+            self.assertEqual(manager.count_all(), 3)
+            self.assertEqual(manager.count_read(), 1)
+        finally:
+            manager.close()
+
+    def test_crash_before_first_flush_json(self):
+        # File JSON chưa từng được tạo: journal vẫn phải được phát lại ở lần mở đầu tiên
+        path = os.path.join(self.tmp, "ebooks.json")
+        crash_after_mutations(path)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(path + JOURNAL_SUFFIX))
+        self.assert_recovered(path)
+        self.assertTrue(os.path.exists(path))
+
+    def test_crash_before_first_flush_sqlite(self):
+        path = os.path.join(self.tmp, "library.db")
+        crash_after_mutations(path)
+        self.assertTrue(os.path.exists(path + JOURNAL_SUFFIX))
+        self.assert_recovered(path)
+
+    def test_crash_after_earlier_save(self):
+        path = os.path.join(self.tmp, "ebooks.json")
+        manager = DataManager(path)
+        manager.save_ebooks([{"filename": "book-0.txt"}])
+        manager.close()
+        crash_after_mutations(path)
+        self.assert_recovered(path)
+
+    def test_torn_last_line_is_skipped(self):
+        path = os.path.join(self.tmp, "ebooks.json")
+        entries = [
+            {"op": "add", "ebook": {"filename": "a.txt"}},
+            {"op": "add", "ebook": {"filename": "b.txt"}},
+            {"op": "update", "filename": "a.txt", "changes": {"is_read": True}},
+        ]
+        with open(path + JOURNAL_SUFFIX, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            # Dòng cuối bị cắt ngang khi crash
+            f.write('{"op": "update", "filename": "b.txt", "cha')
+        manager = DataManager(path)
+        try:
+            self.assertEqual(manager.filenames(), ["a.txt", "b.txt"])
+            self.assertEqual(manager.count_read(), 1)
+        finally:
+            manager.close()
+        self.assertFalse(os.path.exists(path + JOURNAL_SUFFIX))
+
+    def test_timer_flush_races_with_mutations(self):
+        path = os.path.join(self.tmp, "library.db")
+        names = [f"book-{i}.txt" for i in range(200)]
+        manager = DataManager(path)
+        manager.save_ebooks([{"filename": name} for name in names])
+        delay = data_manager.FLUSH_DELAY
+        data_manager.FLUSH_DELAY = 0.001
+        try:
+            def worker(part):
+                for name in names[part::4]:
+                    manager.mark_as_read(name)
+                    manager.set_position(name, 1, len(name))
+
+            threads = [threading.Thread(target=worker, args=(part,)) for part in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            data_manager.FLUSH_DELAY = delay
+            manager.close()
+        manager = DataManager(path)
+        try:
+            self.assertEqual(manager.count_read(), len(names))
+            self.assertTrue(all(manager.get_position(name) == (1, len(name)) for name in names))
+        finally:
+            manager.close()
+
+    def test_removed_books_stay_removed_after_failed_flush(self):
+        path = os.path.join(self.tmp, "library.db")
+        manager = DataManager(path)
+        manager.add_ebooks([{"filename": name} for name in ("a.txt", "b.txt")])
+
+        def failing_upsert(changed, records):
+            raise OSError("disk full")
+
+        upsert_many = manager.storage.upsert_many
+        manager.storage.upsert_many = failing_upsert
+        try:
+            manager.remove_ebooks(["a.txt"])
+        finally:
+            manager.storage.upsert_many = upsert_many
+        manager._cancel_flush()
+        # Không close: lần mở sau phải phát lại journal mà không làm a.txt sống lại
+        reopened = DataManager(path)
+        try:
+            self.assertEqual(reopened.filenames(), ["b.txt"])
+        finally:
+            reopened.close()
+            manager.journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
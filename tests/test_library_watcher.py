@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.utils.data_manager import DataManager
+from src.utils.importer import BookImporter, new_record
+from src.utils.library_watcher import RESCAN, InotifySource, LibraryWatcher, PollingSource
+
+BOOKS = 4
+
+
+class ReconcileGuardTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.ebook_dir = os.path.join(self._tmp.name, "ebooks")
+        os.makedirs(self.ebook_dir)
+        records = []
+        for i in range(BOOKS):
+            with open(os.path.join(self.ebook_dir, f"book-{i}.txt"), "w", encoding="utf-8") as f:
+                f.write(f"Book {i}\n")
+            records.append(new_record(f"book-{i}.txt"))
+        self.manager = DataManager(os.path.join(self._tmp.name, "library.db"))
+        self.manager.save_ebooks(records)
+        self.watcher = LibraryWatcher(BookImporter(self.manager, self.ebook_dir), self.ebook_dir)
+
+    def tearDown(self):
+        self.manager.close()
+        self._tmp.cleanup()
+
+    def empty_folder(self):
+        for name in os.listdir(self.ebook_dir):
+            os.remove(os.path.join(self.ebook_dir, name))
+
+    def test_single_missing_book_is_removed(self):
+        os.remove(os.path.join(self.ebook_dir, "book-0.txt"))
+        self.watcher.sync(self.watcher._reconcile_names())
+        self.assertEqual(len(self.manager.filenames("all")), BOOKS - 1)
+
+    def test_empty_folder_keeps_library(self):
+        # Ổ chưa mount: thư mục vẫn còn nhưng rỗng
+        self.empty_folder()
+        self.assertEqual(self.watcher._reconcile_names(), set())
+        self.assertEqual(len(self.manager.filenames("all")), BOOKS)
+
+    def test_unreadable_folder_skips_sync(self):
+        shutil.rmtree(self.ebook_dir)
+        self.assertEqual(self.watcher._reconcile_names(), set())
+
+    def test_polling_mass_disappearance_rescans(self):
+        source = PollingSource(self.ebook_dir, interval=0)
+        self.empty_folder()
+        self.assertIn(RESCAN, source.wait(0))
+        shutil.rmtree(self.ebook_dir)
+        self.assertEqual(source.wait(0), set())
+
+    def test_rescan_keeps_changed_names(self):
+        os.remove(os.path.join(self.ebook_dir, "book-0.txt"))
+        self.assertEqual(self.watcher._reconcile_names({"book-1.txt"}), {"book-0.txt", "book-1.txt"})
+
+    def test_inotify_watches_recreated_folder(self):
+        try:
+            source = InotifySource(self.ebook_dir)
+        except (OSError, AttributeError):
+            self.skipTest("inotify is not available")
+        self.addCleanup(source.close)
+        os.rename(self.ebook_dir, self.ebook_dir + ".old")
+        self.assertIn(RESCAN, source.wait(1))
+        self.assertEqual(source.wait(0), set())
+        os.makedirs(self.ebook_dir)
+        self.assertIn(RESCAN, source.wait(0))
+        with open(os.path.join(self.ebook_dir, "new.txt"), "w", encoding="utf-8") as f:
+            f.write("New\n")
+        self.assertEqual(source.wait(1), {"new.txt"})
+
+
+if __name__ == "__main__":
+    unittest.main()
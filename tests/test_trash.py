@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from src.utils.data_manager import DataManager
+from src.utils.search_index import SearchIndex, live_results
+
+
+class TrashTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.manager = DataManager(os.path.join(self._tmp.name, "library.db"))
+        self.manager.add_ebooks([
+            {"filename": f"book-{i}.txt", "title": f"Book {i}", "author": "Odd" if i % 2 else "Even"}
+            for i in range(4)
+        ])
+
+    def tearDown(self):
+        self.manager.close()
+        self._tmp.cleanup()
+
+    def test_trash_ignores_author_filter(self):
+        self.manager.delete_ebook("book-1.txt")
+        self.manager.delete_ebook("book-2.txt")
+        trash = [r.filename for r in self.manager.query("deleted", author="Odd")]
+        self.assertEqual(trash, self.manager.filenames("deleted"))
+        self.assertEqual([r.filename for r in self.manager.query("all", author="Odd")], ["book-3.txt"])
+
+    def test_legacy_trash_gets_deleted_at(self):
+        # Bản ghi từ phiên bản trước: is_deleted nhưng chưa có deleted_at
+        self.manager.update_ebook("book-0.txt", is_deleted=True)
+        self.manager.delete_ebook("book-1.txt")
+        self.manager.update_ebook("book-1.txt", deleted_at="2000-01-01T00:00:00")
+        self.assertEqual(self.manager.expired_deleted(30), ["book-1.txt"])
+        self.assertIsNotNone(self.manager.record("book-0.txt").get("deleted_at"))
+        self.assertEqual(self.manager.expired_deleted(0), ["book-0.txt", "book-1.txt"])
+
+    def test_trashed_book_absent_from_search(self):
+        ebook_dir = os.path.join(self._tmp.name, "ebooks")
+        os.makedirs(ebook_dir)
+        for i in range(4):
+            with open(os.path.join(ebook_dir, f"book-{i}.txt"), "w", encoding="utf-8") as f:
+                f.write(f"lighthouse keeper {i}\n")
+        search_index = SearchIndex(os.path.join(self._tmp.name, "search.db"), ebook_dir)
+        self.addCleanup(search_index.close)
+        search_index.index_books(self.manager.filenames("all"))
+        # Sách vào thùng rác mà vẫn còn trong chỉ mục (ví dụ xoá từ bản cũ)
+        self.manager.delete_ebook("book-1.txt")
+        hits = live_results(search_index.search("lighthouse"), self.manager)
+        self.assertEqual(sorted(hit["filename"] for hit in hits), ["book-0.txt", "book-2.txt", "book-3.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()